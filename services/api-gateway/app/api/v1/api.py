@@ -2,13 +2,19 @@
 Основной API роутер для API Gateway Service
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket
 from fastapi.responses import Response
 from app.services.gateway_service import GatewayService
 from app.config import settings
 from app.services.auth_service import AuthService
 from app.services.monitoring_service import MonitoringService
-from app.schemas.gateway import GatewayStatsResponse, ServiceHealthResponse
+from app.services.composition_service import CompositionService
+from app.services.batch_service import BatchService
+from app.services.websocket_proxy import WebSocketProxy
+from app.services.routing_table import match_request, match_scope
+from app.schemas.gateway import GatewayStatsResponse, ServiceHealthResponse, BatchRequest, BatchSubResponse
 from app.routes import auth_router, users_router, pets_router
 
 # Создаем главный роутер для API Gateway
@@ -28,6 +34,24 @@ def get_auth_service(request: Request) -> AuthService:
 def get_monitoring_service(request: Request) -> MonitoringService:
     return request.app.state.monitoring_service
 
+def get_composition_service(request: Request) -> CompositionService:
+    return request.app.state.composition_service
+
+def get_batch_service(request: Request) -> BatchService:
+    return request.app.state.batch_service
+
+def get_websocket_proxy(websocket: WebSocket) -> WebSocketProxy:
+    return websocket.app.state.websocket_proxy
+
+
+def set_user_headers(request: Request):
+    """Идентификатор пользователя для доверенных внутренних сервисов (учитывается в GatewayService)"""
+    if hasattr(request.state, 'user_id') and request.state.user_id:
+        request.state.inject_user_headers = {
+            'X-User-Id': str(request.state.user_id),
+            'X-User-Role': str(getattr(request.state, 'user_role', '') or '')
+        }
+
 # Gateway management endpoints
 @api_router.get("/gateway/stats", response_model=GatewayStatsResponse, summary="Статистика API Gateway")
 async def get_gateway_stats(
@@ -45,6 +69,28 @@ async def get_gateway_stats(
         raise HTTPException(status_code=500, detail=f"Error getting gateway stats: {str(e)}")
 
 
+@api_router.get("/gateway/stats/window", summary="Статистика маршрутов за окно")
+async def get_gateway_stats_window(
+    minutes: int = Query(15, ge=1, le=settings.stats_retention_minutes),
+    gateway_service: GatewayService = Depends(get_gateway_service)
+):
+    """Статистика маршрутов за последние N минут (поминутные бакеты)"""
+    try:
+        routes_stats = await gateway_service.get_route_stats_window(minutes)
+        return {"minutes": minutes, "routes_stats": routes_stats}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting gateway stats: {str(e)}")
+
+
+@api_router.get("/gateway/auth/token-cache", summary="Статистика кэша JWT")
+async def get_token_cache_stats(
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """Попадания и промахи кэша проверенных токенов"""
+    return auth_service.get_token_cache_stats()
+
+
 @api_router.get("/gateway/services", summary="Список сервисов")
 async def get_services(
     gateway_service: GatewayService = Depends(get_gateway_service)
@@ -123,6 +169,36 @@ async def get_service_health(
         raise HTTPException(status_code=500, detail=f"Error getting service health: {str(e)}")
 
 
+@api_router.get("/gateway/circuit-breakers", summary="Состояние circuit breaker")
+async def get_circuit_breakers(
+    gateway_service: GatewayService = Depends(get_gateway_service)
+):
+    """Состояние circuit breaker по сервисам: окно вызовов, пробы, время до следующей попытки"""
+    try:
+        return gateway_service.get_circuit_breaker_stats()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting circuit breakers: {str(e)}")
+
+
+@api_router.get("/gateway/websockets", summary="Проксируемые WebSocket-соединения")
+async def get_websocket_stats(request: Request):
+    """Открытые WebSocket-соединения всего и по сервисам"""
+    return request.app.state.websocket_proxy.get_stats()
+
+
+@api_router.get("/gateway/concurrency", summary="Адаптивные лимиты сервисов")
+async def get_concurrency_limits(
+    gateway_service: GatewayService = Depends(get_gateway_service)
+):
+    """Текущий лимит одновременных запросов, запросы в полёте и глубина очереди по сервисам"""
+    try:
+        return gateway_service.get_concurrency_stats()
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting concurrency limits: {str(e)}")
+
+
 @api_router.put("/gateway/services/{service_name}/circuit-breaker/close", summary="Закрытие circuit breaker")
 async def close_circuit_breaker(
     service_name: str,
@@ -141,15 +217,25 @@ async def close_circuit_breaker(
 async def reload_configuration(
     gateway_service: GatewayService = Depends(get_gateway_service)
 ):
-    """Перезагрузка конфигурации API Gateway"""
+    """Перезагрузка конфигурации API Gateway (из источника конфигурации маршрутизации, если он задан)"""
     try:
-        await gateway_service.reload_configuration()
-        return {"message": "Configuration reloaded successfully"}
+        config = await gateway_service.reload_configuration()
+        return {"message": "Configuration reloaded successfully", **config}
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid configuration: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reloading configuration: {str(e)}")
 
 
+@api_router.get("/gateway/config/version", summary="Активная версия конфигурации")
+async def get_config_version(
+    gateway_service: GatewayService = Depends(get_gateway_service)
+):
+    """Версия активной таблицы маршрутизации, её источник и время применения"""
+    return gateway_service.get_config_info()
+
+
 @api_router.get("/gateway/performance", summary="Метрики производительности")
 async def get_performance_metrics(
     monitoring_service: MonitoringService = Depends(get_monitoring_service)
@@ -163,6 +249,30 @@ async def get_performance_metrics(
         raise HTTPException(status_code=500, detail=f"Error getting performance metrics: {str(e)}")
 
 
+@api_router.get("/gateway/health/history", summary="История проверок здоровья")
+async def get_health_history(
+    service_name: str = Query(None),
+    monitoring_service: MonitoringService = Depends(get_monitoring_service)
+):
+    """История health check: доступность, смены статуса (flapping) и тренд времени ответа"""
+    try:
+        return monitoring_service.get_health_history(service_name)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting health history: {str(e)}")
+
+
+@api_router.get("/gateway/system-metrics", summary="История системных метрик")
+async def get_system_metrics_history(
+    monitoring_service: MonitoringService = Depends(get_monitoring_service)
+):
+    """Снимки системных метрик из кольцевого буфера фонового сборщика"""
+    return {
+        "interval": monitoring_service.system_metrics.interval,
+        "samples": monitoring_service.system_metrics.history()
+    }
+
+
 # Authentication endpoints (proxy to User Service)
 @api_router.post("/auth/login", summary="Вход в систему")
 async def login(
@@ -227,7 +337,61 @@ async def logout(
         raise HTTPException(status_code=500, detail=f"Logout error: {str(e)}")
 
 
+# API composition
+@api_router.get("/compose/{name}", summary="Составной запрос к нескольким сервисам")
+async def compose(
+    name: str,
+    request: Request,
+    composition_service: CompositionService = Depends(get_composition_service)
+):
+    """Параллельное выполнение составного маршрута с частичными результатами"""
+    route = composition_service.get_route(name) if settings.enable_api_composition else None
+    if route is None:
+        raise HTTPException(status_code=404, detail=f"Composite route {name} not found")
+
+    try:
+        return await composition_service.compose(request, route)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Composition error: {str(e)}")
+
+
+# Batch API
+@api_router.post("/batch", response_model=List[BatchSubResponse], summary="Пакетный запрос")
+async def batch(
+    batch_request: BatchRequest,
+    request: Request,
+    batch_service: BatchService = Depends(get_batch_service)
+):
+    """Параллельное выполнение подзапросов; результаты в порядке запроса"""
+    if len(batch_request.requests) > settings.batch_max_requests:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many sub-requests (max {settings.batch_max_requests})"
+        )
+
+    try:
+        set_user_headers(request)
+        return await batch_service.execute(request, batch_request.requests)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch error: {str(e)}")
+
+
 # Generic routing endpoint
+@api_router.websocket("/{service}/{path:path}")
+async def route_websocket(
+    websocket: WebSocket,
+    service: str,
+    path: str,
+    websocket_proxy: WebSocketProxy = Depends(get_websocket_proxy)
+):
+    """Проксирование WebSocket к микросервису (аутентификация проверена при upgrade)"""
+    await websocket_proxy.proxy(websocket, match_scope(websocket.scope), path)
+
+
 @api_router.api_route("/{service}/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"])
 async def route_to_service(
     service: str,
@@ -242,29 +406,55 @@ async def route_to_service(
 
         # Проставим идентификатор пользователя в заголовки для доверенных внутренних сервисов
         # Это упростит аутентификацию downstream без повторной валидации JWT
-        if hasattr(request.state, 'user_id') and request.state.user_id:
-            request.headers.__dict__.setdefault('_list', [])
-            # Невозможно мутировать Headers напрямую в FastAPI, поэтому прокинем через state
-            # и учтём это в GatewayService.route_request
-            request.state.inject_user_headers = {
-                'X-User-Id': str(request.state.user_id),
-                'X-User-Role': str(getattr(request.state, 'user_role', '') or '')
-            }
-
-        result = await gateway_service.route_request(
-            request,
-            service,
-            full_path,
-            request.method
-        )
-
-        # Проксируем статус и тело ответа downstream сервиса
-        status_code = result.get("status_code", 200)
-        body_text = result.get("body", "")
-        headers = result.get("headers", {})
-        media_type = headers.get("content-type")
-
-        return Response(content=body_text, status_code=status_code, media_type=media_type)
+        set_user_headers(request)
+
+        # Маршрут уже разрешён в middleware (таблица маршрутизации)
+        route_match = match_request(request)
+        cache_ttl = route_match.cache_ttl if route_match else None
+
+        # Безопасные GET маршрутов с cache_ttl обслуживаются через кэш ответов
+        cache = gateway_service.response_cache
+        if cache.is_cacheable(request, cache_ttl):
+            return await gateway_service.cached_request(
+                request,
+                service,
+                full_path,
+                cache_ttl
+            )
+
+        # Потоковый режим: тела передаются чанками, без буферизации в памяти шлюза.
+        # GET маршрутов с coalesce идут буферизованно: один ответ сервиса отдаётся всем ожидающим;
+        # так же обрабатываются запросы с ?fields= — проекция требует разбора JSON целиком
+        if settings.enable_streaming_proxy and not gateway_service.should_buffer(request, route_match):
+            response = await gateway_service.stream_request(
+                request,
+                service,
+                full_path,
+                request.method
+            )
+        else:
+            result = await gateway_service.route_request(
+                request,
+                service,
+                full_path,
+                request.method
+            )
+
+            # Проксируем статус и тело ответа downstream сервиса
+            status_code = result.get("status_code", 200)
+            body = result.get("body", b"")
+            headers = result.get("headers", {})
+            media_type = headers.get("content-type")
+
+            response = Response(content=body, status_code=status_code, media_type=media_type)
+
+        # Изменяющие запросы сбрасывают закэшированные ответы пользователя для сервиса
+        if request.method not in ("GET", "HEAD", "OPTIONS") and cache_ttl:
+            await cache.invalidate(service, cache.get_user_scope(request))
+
+        return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Routing error: {str(e)}")
@@ -9,15 +9,29 @@ from pydantic_settings import BaseSettings
 from pydantic import BaseModel
 
 
+def _env_list(name: str) -> List[str]:
+    """Список значений из переменной окружения через запятую"""
+    return [value.strip() for value in os.getenv(name, "").split(",") if value.strip()]
+
+
 class ServiceConfig(BaseModel):
     """Конфигурация микросервиса"""
     name: str
     url: str
+    # Адреса экземпляров сервиса для балансировки (пусто — только url)
+    urls: List[str] = []
     enabled: bool = True
     timeout: int = 30
     retries: int = 3
     rate_limit: int = 1000
     health_check: str = "/health"
+    # Класс приоритета при перегрузке (0 — высший): низшие отбрасываются первыми
+    priority: int = 1
+    # Параметры пула соединений (None — используются глобальные upstream_*)
+    max_connections: Optional[int] = None
+    max_keepalive_connections: Optional[int] = None
+    keepalive_expiry: Optional[float] = None
+    http2: Optional[bool] = None
 
 
 class RouteConfig(BaseModel):
@@ -28,10 +42,30 @@ class RouteConfig(BaseModel):
     auth_required: bool = True
     rate_limit: Optional[int] = None
     cache_ttl: Optional[int] = None
+    coalesce: bool = False  # Объединять одинаковые GET в полёте (single-flight)
+    priority: Optional[int] = None  # Класс приоритета маршрута (None — приоритет сервиса)
     transform_request: bool = False
     transform_response: bool = False
 
 
+class CompositionPartConfig(BaseModel):
+    """Часть составного маршрута: один запрос к сервису"""
+    name: str
+    service: str
+    path: str  # Путь сервиса, допускает подстановку {user_id}
+    query: Dict[str, str] = {}
+    timeout: Optional[float] = None
+    required: bool = False  # Без этой части ответ не имеет смысла (502)
+    default: Any = None  # Значение части при ошибке
+
+
+class CompositeRouteConfig(BaseModel):
+    """Составной маршрут: параллельные запросы к сервисам под общим сроком"""
+    name: str
+    parts: List[CompositionPartConfig]
+    timeout: Optional[float] = None
+
+
 class Settings(BaseSettings):
     """Настройки приложения"""
 
@@ -72,6 +106,12 @@ class Settings(BaseSettings):
     jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "your-secret-key")
     jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
     jwt_expiration_hours: int = int(os.getenv("JWT_EXPIRATION_HOURS", "24"))
+    jwt_leeway_seconds: int = int(os.getenv("JWT_LEEWAY_SECONDS", "0"))  # Допуск рассинхронизации часов
+
+    # Кэш проверенных JWT
+    jwt_cache_max_size: int = int(os.getenv("JWT_CACHE_MAX_SIZE", "50000"))
+    jwt_cache_ttl: int = int(os.getenv("JWT_CACHE_TTL", "300"))
+    jwt_negative_cache_ttl: int = int(os.getenv("JWT_NEGATIVE_CACHE_TTL", "30"))
 
     # Настройки User Service для аутентификации
     user_service_url: str = os.getenv("USER_SERVICE_URL", "http://user-service:8000")
@@ -89,47 +129,61 @@ class Settings(BaseSettings):
         "user": ServiceConfig(
             name="user-service",
             url=os.getenv("USER_SERVICE_URL", "http://user-service:8000"),
-            rate_limit=int(os.getenv("USER_SERVICE_RATE_LIMIT", "1000"))
+            urls=_env_list("USER_SERVICE_URLS"),
+            rate_limit=int(os.getenv("USER_SERVICE_RATE_LIMIT", "1000")),
+            priority=int(os.getenv("USER_SERVICE_PRIORITY", "0"))
         ),
         "pet": ServiceConfig(
             name="pet-service",
             url=os.getenv("PET_SERVICE_URL", "http://pet-service:8000"),
+            urls=_env_list("PET_SERVICE_URLS"),
             rate_limit=int(os.getenv("PET_SERVICE_RATE_LIMIT", "1000"))
         ),
         "order": ServiceConfig(
             name="order-service",
             url=os.getenv("ORDER_SERVICE_URL", "http://order-service:8000"),
+            urls=_env_list("ORDER_SERVICE_URLS"),
             rate_limit=int(os.getenv("ORDER_SERVICE_RATE_LIMIT", "1000"))
         ),
         "location": ServiceConfig(
             name="location-service",
             url=os.getenv("LOCATION_SERVICE_URL", "http://location-service:8000"),
-            rate_limit=int(os.getenv("LOCATION_SERVICE_RATE_LIMIT", "1000"))
+            urls=_env_list("LOCATION_SERVICE_URLS"),
+            rate_limit=int(os.getenv("LOCATION_SERVICE_RATE_LIMIT", "1000")),
+            priority=int(os.getenv("LOCATION_SERVICE_PRIORITY", "0"))
         ),
         "payment": ServiceConfig(
             name="payment-service",
             url=os.getenv("PAYMENT_SERVICE_URL", "http://payment-service:8000"),
-            rate_limit=int(os.getenv("PAYMENT_SERVICE_RATE_LIMIT", "500"))
+            urls=_env_list("PAYMENT_SERVICE_URLS"),
+            rate_limit=int(os.getenv("PAYMENT_SERVICE_RATE_LIMIT", "500")),
+            priority=int(os.getenv("PAYMENT_SERVICE_PRIORITY", "0"))
         ),
         "chat": ServiceConfig(
             name="chat-service",
             url=os.getenv("CHAT_SERVICE_URL", "http://chat-service:8000"),
+            urls=_env_list("CHAT_SERVICE_URLS"),
             rate_limit=int(os.getenv("CHAT_SERVICE_RATE_LIMIT", "2000"))
         ),
         "media": ServiceConfig(
             name="media-service",
             url=os.getenv("MEDIA_SERVICE_URL", "http://media-service:8000"),
-            rate_limit=int(os.getenv("MEDIA_SERVICE_RATE_LIMIT", "1500"))
+            urls=_env_list("MEDIA_SERVICE_URLS"),
+            rate_limit=int(os.getenv("MEDIA_SERVICE_RATE_LIMIT", "1500")),
+            priority=int(os.getenv("MEDIA_SERVICE_PRIORITY", "2"))
         ),
         "notification": ServiceConfig(
             name="notification-service",
             url=os.getenv("NOTIFICATION_SERVICE_URL", "http://notification-service:8000"),
+            urls=_env_list("NOTIFICATION_SERVICE_URLS"),
             rate_limit=int(os.getenv("NOTIFICATION_SERVICE_RATE_LIMIT", "1000"))
         ),
         "analytics": ServiceConfig(
             name="analytics-service",
             url=os.getenv("ANALYTICS_SERVICE_URL", "http://analytics-service:8000"),
-            rate_limit=int(os.getenv("ANALYTICS_SERVICE_RATE_LIMIT", "500"))
+            urls=_env_list("ANALYTICS_SERVICE_URLS"),
+            rate_limit=int(os.getenv("ANALYTICS_SERVICE_RATE_LIMIT", "500")),
+            priority=int(os.getenv("ANALYTICS_SERVICE_PRIORITY", "2"))
         )
     }
 
@@ -139,8 +193,10 @@ class Settings(BaseSettings):
         "/user": RouteConfig(
             path="/user",
             service="user",
-            auth_required=False,
-            rate_limit=200
+            auth_required=True,
+            rate_limit=200,
+            cache_ttl=int(os.getenv("USER_ROUTE_CACHE_TTL", "30")),
+            coalesce=True
         ),
         "/auth": RouteConfig(
             path="/auth",
@@ -154,7 +210,8 @@ class Settings(BaseSettings):
             path="/pet",
             service="pet",
             auth_required=True,
-            rate_limit=500
+            rate_limit=500,
+            cache_ttl=int(os.getenv("PET_ROUTE_CACHE_TTL", "60"))
         ),
 
         # Order Service routes
@@ -194,7 +251,8 @@ class Settings(BaseSettings):
             path="/media",
             service="media",
             auth_required=True,
-            rate_limit=800
+            rate_limit=800,
+            coalesce=True
         ),
 
         # Notification Service routes
@@ -214,6 +272,21 @@ class Settings(BaseSettings):
         )
     }
 
+    # Высокоуровневые роуты шлюза (префикс под /api/{version} -> ключ сервиса)
+    service_path_aliases: Dict[str, str] = {
+        "/users": "user",
+        "/pets": "pet",
+        "/orders": "order",
+        "/payments": "payment",
+        "/notifications": "notification"
+    }
+
+    # Динамическая конфигурация маршрутизации (file | redis; пусто — только из настроек выше)
+    routing_config_source: str = os.getenv("ROUTING_CONFIG_SOURCE", "")
+    routing_config_path: str = os.getenv("ROUTING_CONFIG_PATH", "/etc/lapa/gateway-routing.json")
+    routing_config_redis_key: str = os.getenv("ROUTING_CONFIG_REDIS_KEY", "gateway:routing_config")
+    routing_config_poll_interval: float = float(os.getenv("ROUTING_CONFIG_POLL_INTERVAL", "10"))
+
     # Настройки rate limiting
     global_rate_limit: int = int(os.getenv("GLOBAL_RATE_LIMIT", "10000"))
     ip_rate_limit: int = int(os.getenv("IP_RATE_LIMIT", "1000"))
@@ -223,16 +296,65 @@ class Settings(BaseSettings):
     cache_enabled: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
     cache_ttl: int = int(os.getenv("CACHE_TTL", "300"))
     cache_max_size: int = int(os.getenv("CACHE_MAX_SIZE", "10000"))
+    cache_local_ttl: int = int(os.getenv("CACHE_LOCAL_TTL", "10"))
+
+    # Настройки пула соединений к микросервисам
+    upstream_max_connections: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    upstream_max_keepalive_connections: int = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    upstream_keepalive_expiry: float = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+    upstream_http2_enabled: bool = os.getenv("UPSTREAM_HTTP2_ENABLED", "false").lower() == "true"
+    upstream_connect_timeout: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+    upstream_pool_timeout: float = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "5"))
+    # Через сколько секунд закрывается клиент сервиса, заменённый при смене конфигурации
+    upstream_drain_timeout: float = float(os.getenv("UPSTREAM_DRAIN_TIMEOUT", "60"))
+
+    # Настройки балансировки между экземплярами сервисов
+    load_balancer_ewma_alpha: float = float(os.getenv("LOAD_BALANCER_EWMA_ALPHA", "0.3"))
+    load_balancer_max_failures: int = int(os.getenv("LOAD_BALANCER_MAX_FAILURES", "5"))
+    load_balancer_ejection_time: int = int(os.getenv("LOAD_BALANCER_EJECTION_TIME", "30"))
+
+    # Адаптивные лимиты одновременных запросов к сервисам и сброс нагрузки
+    adaptive_concurrency_enabled: bool = os.getenv("ADAPTIVE_CONCURRENCY_ENABLED", "true").lower() == "true"
+    concurrency_initial_limit: int = int(os.getenv("CONCURRENCY_INITIAL_LIMIT", "20"))
+    concurrency_min_limit: int = int(os.getenv("CONCURRENCY_MIN_LIMIT", "2"))
+    concurrency_max_limit: int = int(os.getenv("CONCURRENCY_MAX_LIMIT", "100"))
+    concurrency_latency_tolerance: float = float(os.getenv("CONCURRENCY_LATENCY_TOLERANCE", "2.0"))
+    concurrency_backoff_ratio: float = float(os.getenv("CONCURRENCY_BACKOFF_RATIO", "0.9"))
+    concurrency_backoff_interval: float = float(os.getenv("CONCURRENCY_BACKOFF_INTERVAL", "0.5"))
+    concurrency_rtt_window: int = int(os.getenv("CONCURRENCY_RTT_WINDOW", "500"))
+    concurrency_max_queue: int = int(os.getenv("CONCURRENCY_MAX_QUEUE", "200"))
+    concurrency_retry_after: int = int(os.getenv("CONCURRENCY_RETRY_AFTER", "1"))
+    # Срок ожидания в очереди по классу приоритета, секунды
+    concurrency_queue_timeouts: Dict[int, float] = {
+        0: float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_HIGH", "5")),
+        1: float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_NORMAL", "2")),
+        2: float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT_LOW", "0.5"))
+    }
 
     # Настройки circuit breaker
     circuit_breaker_enabled: bool = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
-    circuit_breaker_failure_threshold: int = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
     circuit_breaker_recovery_timeout: int = int(os.getenv("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", "60"))
+    circuit_breaker_window_seconds: int = int(os.getenv("CIRCUIT_BREAKER_WINDOW_SECONDS", "60"))
+    circuit_breaker_window_buckets: int = int(os.getenv("CIRCUIT_BREAKER_WINDOW_BUCKETS", "12"))
+    circuit_breaker_minimum_calls: int = int(os.getenv("CIRCUIT_BREAKER_MINIMUM_CALLS", "20"))
+    circuit_breaker_failure_rate_threshold: float = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD", "0.5"))
+    circuit_breaker_slow_call_duration: float = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_DURATION", "5"))
+    circuit_breaker_slow_call_rate_threshold: float = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_RATE_THRESHOLD", "0.8"))
+    circuit_breaker_half_open_max_probes: int = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_MAX_PROBES", "3"))
+    circuit_breaker_sync_channel: str = os.getenv("CIRCUIT_BREAKER_SYNC_CHANNEL", "gateway:circuit_breaker")
 
     # Настройки мониторинга
     monitoring_enabled: bool = os.getenv("MONITORING_ENABLED", "true").lower() == "true"
     metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
     health_check_interval: int = int(os.getenv("HEALTH_CHECK_INTERVAL", "30"))
+    health_check_timeout: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+    health_check_max_connections: int = int(os.getenv("HEALTH_CHECK_MAX_CONNECTIONS", "50"))
+    health_history_size: int = int(os.getenv("HEALTH_HISTORY_SIZE", "60"))
+    health_flapping_threshold: int = int(os.getenv("HEALTH_FLAPPING_THRESHOLD", "4"))
+    system_metrics_interval: float = float(os.getenv("SYSTEM_METRICS_INTERVAL", "5"))
+    system_metrics_history_size: int = int(os.getenv("SYSTEM_METRICS_HISTORY_SIZE", "120"))
+    stats_flush_interval: float = float(os.getenv("STATS_FLUSH_INTERVAL", "5"))
+    stats_retention_minutes: int = int(os.getenv("STATS_RETENTION_MINUTES", "1440"))
 
     # Настройки логирования
     log_requests: bool = os.getenv("LOG_REQUESTS", "true").lower() == "true"
@@ -257,9 +379,25 @@ class Settings(BaseSettings):
     enable_https_redirect: bool = os.getenv("ENABLE_HTTPS_REDIRECT", "false").lower() == "true"
     enable_request_id: bool = os.getenv("ENABLE_REQUEST_ID", "true").lower() == "true"
     max_request_size: int = int(os.getenv("MAX_REQUEST_SIZE", "10485760"))  # 10MB
+    enable_streaming_proxy: bool = os.getenv("ENABLE_STREAMING_PROXY", "true").lower() == "true"
+
+    # Проекция ответов (?fields=) и сжатие
+    fields_param: str = os.getenv("FIELDS_PARAM", "fields")
+    fields_max_paths: int = int(os.getenv("FIELDS_MAX_PATHS", "50"))
+    fields_max_depth: int = int(os.getenv("FIELDS_MAX_DEPTH", "5"))
+    compression_enabled: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    compression_min_size: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    compression_gzip_level: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    compression_brotli_quality: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
 
     # Настройки WebSocket
     enable_websocket_support: bool = os.getenv("ENABLE_WEBSOCKET_SUPPORT", "true").lower() == "true"
+    websocket_max_connections: int = int(os.getenv("WEBSOCKET_MAX_CONNECTIONS", "20000"))
+    websocket_connect_timeout: float = float(os.getenv("WEBSOCKET_CONNECT_TIMEOUT", "10"))
+    websocket_idle_timeout: float = float(os.getenv("WEBSOCKET_IDLE_TIMEOUT", "300"))
+    websocket_ping_interval: float = float(os.getenv("WEBSOCKET_PING_INTERVAL", "20"))
+    websocket_max_message_size: int = int(os.getenv("WEBSOCKET_MAX_MESSAGE_SIZE", "1048576"))  # 1MB
+    websocket_max_queue: int = int(os.getenv("WEBSOCKET_MAX_QUEUE", "32"))  # Кадров в буфере чтения сервиса
 
     # Настройки GraphQL
     enable_graphql_support: bool = os.getenv("ENABLE_GRAPHQL_SUPPORT", "false").lower() == "true"
@@ -267,6 +405,38 @@ class Settings(BaseSettings):
     # Настройки API composition
     enable_api_composition: bool = os.getenv("ENABLE_API_COMPOSITION", "true").lower() == "true"
     composition_timeout: int = int(os.getenv("COMPOSITION_TIMEOUT", "30"))
+    composition_part_timeout: float = float(os.getenv("COMPOSITION_PART_TIMEOUT", "5"))
+
+    # Настройки пакетного API (/api/v1/batch)
+    batch_max_requests: int = int(os.getenv("BATCH_MAX_REQUESTS", "50"))
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "10"))
+
+    # Составные маршруты (/api/v1/compose/{name})
+    composite_routes: Dict[str, CompositeRouteConfig] = {
+        # Главный экран мобильного приложения
+        "home": CompositeRouteConfig(
+            name="home",
+            timeout=float(os.getenv("HOME_COMPOSITION_TIMEOUT", "3")),
+            parts=[
+                CompositionPartConfig(name="profile", service="user", path="/api/v1/users/profile", required=True),
+                CompositionPartConfig(name="pets", service="pet", path="/api/v1/pets", default=[]),
+                CompositionPartConfig(
+                    name="active_orders",
+                    service="order",
+                    path="/api/v1/orders",
+                    query={"status": "in_progress"},
+                    default=[]
+                ),
+                CompositionPartConfig(
+                    name="unread_notifications",
+                    service="notification",
+                    path="/api/v1/notifications",
+                    query={"status": "delivered"},
+                    default=[]
+                ),
+            ]
+        )
+    }
 
     class Config:
         env_file = ".env"
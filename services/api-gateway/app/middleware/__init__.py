@@ -3,4 +3,6 @@ Middleware для API Gateway
 """
 
 from .auth import AuthMiddleware
-__all__ = ["AuthMiddleware"]
+from .compression import CompressionMiddleware
+from .rate_limit import RateLimitMiddleware
+__all__ = ["AuthMiddleware", "CompressionMiddleware", "RateLimitMiddleware"]
@@ -1,25 +1,34 @@
 """
 Middleware аутентификации для API Gateway
+
+Реализован как «чистое» ASGI middleware: не создаёт Request и дополнительных
+задач/потоков на запрос, поэтому не мешает потоковой передаче тел. Публичные
+пути пропускаются сразу, по одному значению scope["path"]. WebSocket
+проверяется один раз при upgrade: без валидного токена рукопожатие
+отклоняется (close 1008 до accept).
 """
 
 import logging
-from typing import Optional
+from typing import Optional, Dict, Any
+from urllib.parse import parse_qsl
 
-from fastapi import Request, HTTPException
+from fastapi import HTTPException
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Scope, Receive, Send
+from starlette.websockets import WebSocketClose
 
-from app.config import settings
 from app.services.auth_service import AuthService
+from app.services.routing_table import match_scope
 
 logger = logging.getLogger(__name__)
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
+class AuthMiddleware:
     """Middleware для аутентификации"""
 
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
         self.auth_service = AuthService()
         self.public_paths = {
             "/health",
@@ -29,23 +38,33 @@ class AuthMiddleware(BaseHTTPMiddleware):
             "/metrics"
         }
 
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Обработка запроса"""
+        if scope["type"] not in ("http", "websocket") or scope["path"] in self.public_paths:
+            await self.app(scope, receive, send)
+            return
+
+        error_response = await self._authenticate(scope)
+        if error_response is not None:
+            if scope["type"] == "websocket":
+                # Отказ в рукопожатии: сервер ответит клиенту 403
+                await WebSocketClose(code=1008)(scope, receive, send)
+            else:
+                await error_response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def _authenticate(self, scope: Scope) -> Optional[JSONResponse]:
+        """Проверка токена; при успехе данные пользователя попадают в request.state"""
         try:
-            # Пропускаем публичные пути
-            if request.url.path in self.public_paths:
-                return await call_next(request)
-
-            # Пропускаем пути аутентификации (login/register/refresh/logout)
-            if request.url.path.startswith("/api/v1/auth"):
-                return await call_next(request)
-
             # Проверка необходимости аутентификации для данного маршрута
-            if not self._requires_authentication(request.url.path):
-                return await call_next(request)
+            # (пути /api/v1/auth публичны согласно конфигурации маршрутов)
+            if not self._requires_authentication(scope):
+                return None
 
             # Извлечение токена
-            token = self._extract_token(request)
+            token = self._extract_token(scope)
             if not token:
                 return JSONResponse(
                     status_code=401,
@@ -56,13 +75,14 @@ class AuthMiddleware(BaseHTTPMiddleware):
             try:
                 payload = await self.auth_service.verify_token(token)
 
-                # Добавление информации о пользователе в request
-                request.state.user_id = payload.get("user_id") or payload.get("sub")
-                request.state.user_role = payload.get("role") or payload.get("roles", [None])[0]
-                request.state.user_roles = payload.get("roles", [])
-                request.state.token_payload = payload
+                # Добавление информации о пользователе в request.state
+                state = scope.setdefault("state", {})
+                state["user_id"] = payload.get("user_id") or payload.get("sub")
+                state["user_role"] = payload.get("role") or payload.get("roles", [None])[0]
+                state["user_roles"] = payload.get("roles", [])
+                state["token_payload"] = payload
 
-                return await call_next(request)
+                return None
 
             except HTTPException as e:
                 return JSONResponse(
@@ -83,44 +103,51 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 content={"error": "Authentication service error"}
             )
 
-    def _requires_authentication(self, path: str) -> bool:
+    def _requires_authentication(self, scope: Scope) -> bool:
         """Проверка необходимости аутентификации для пути"""
         try:
-            # Проверка настроек маршрутов
-            for route_path, route_config in settings.routes.items():
-                if path.startswith(route_path):
-                    return route_config.auth_required
-
-            # По умолчанию требуется аутентификация для API
-            if path.startswith("/api/v1"):
-                return True
-
-            return False
+            route_match = match_scope(scope)
+            return route_match.auth_required if route_match else False
 
         except Exception as e:
             logger.error(f"Error checking authentication requirement: {e}")
             return True
 
-    def _extract_token(self, request: Request) -> Optional[str]:
+    def _extract_token(self, scope: Scope) -> Optional[str]:
         """Извлечение токена из запроса"""
         try:
+            headers = self._get_headers(scope, (b"authorization", b"cookie"))
+
             # Проверка Authorization header
-            auth_header = request.headers.get("Authorization")
+            auth_header = headers.get(b"authorization")
             if auth_header and auth_header.startswith("Bearer "):
                 return auth_header[7:]  # Удаляем "Bearer " префикс
 
             # Проверка токена в query параметрах
-            token = request.query_params.get("token")
-            if token:
-                return token
+            query_string = scope.get("query_string", b"")
+            if b"token=" in query_string:
+                for name, value in parse_qsl(query_string.decode("latin-1")):
+                    if name == "token" and value:
+                        return value
 
             # Проверка токена в cookies
-            token = request.cookies.get("access_token")
-            if token:
-                return token
+            cookie_header = headers.get(b"cookie")
+            if cookie_header:
+                token = cookie_parser(cookie_header).get("access_token")
+                if token:
+                    return token
 
             return None
 
         except Exception as e:
             logger.error(f"Error extracting token: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def _get_headers(scope: Scope, names) -> Dict[bytes, Any]:
+        """Значения нужных заголовков из scope (имена в ASGI уже в нижнем регистре)"""
+        headers = {}
+        for name, value in scope.get("headers", ()):
+            if name in names and name not in headers:
+                headers[name] = value.decode("latin-1")
+        return headers
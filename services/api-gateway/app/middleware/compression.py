@@ -0,0 +1,168 @@
+"""
+Middleware сжатия ответов для API Gateway
+
+«Чистое» ASGI middleware: по Accept-Encoding выбирается brotli (если
+установлен пакет brotli) или gzip. Сжимаются ответы текстовых и JSON-типов
+размером от `compression_min_size` байт; потоковые ответы без Content-Length
+сжимаются по чанкам с flush, чтобы не задерживать передачу. Ответы, уже
+сжатые сервисом (Content-Encoding), передаются как есть.
+"""
+
+import logging
+import zlib
+from typing import Optional
+
+from prometheus_client import Counter
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Scope, Receive, Send
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость, без неё используется gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_BYTES = Counter(
+    "gateway_response_compression_bytes_total",
+    "Байты сжатых ответов до и после сжатия",
+    ["encoding", "stage"],
+)
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/problem+json",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+# Потоки событий не буферизуются и не сжимаются
+NON_COMPRESSIBLE_TYPES = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Кодировка ответа по Accept-Encoding клиента: br, gzip или None"""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Encoder:
+    """Потоковый кодировщик тела ответа"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, last: bool) -> bytes:
+        if self.encoding == "br":
+            output = self._compressor.process(data)
+            return output + (self._compressor.finish() if last else self._compressor.flush())
+
+        output = self._compressor.compress(data)
+        return output + (self._compressor.flush() if last else self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+class CompressionMiddleware:
+    """Middleware для сжатия ответов (gzip/brotli)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Обработка запроса"""
+        if scope["type"] != "http" or not settings.compression_enabled or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder: Optional[_Encoder] = None
+        decided = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, encoder, decided
+
+            if message["type"] == "http.response.start":
+                # Заголовки отправляются вместе с первым чанком тела, когда известно, сжимать ли
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if not decided:
+                decided = True
+                if self._should_compress(start_message, len(body), more_body):
+                    encoder = _Encoder(encoding)
+                    start_message["headers"] = list(start_message.get("headers", []))
+                    headers = MutableHeaders(raw=start_message["headers"])
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    headers["content-encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                await send(start_message)
+
+            if encoder is None:
+                await send(message)
+                return
+
+            compressed = encoder.encode(body, last=not more_body)
+            COMPRESSION_BYTES.labels(encoding, "original").inc(len(body))
+            COMPRESSION_BYTES.labels(encoding, "compressed").inc(len(compressed))
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _should_compress(start_message: Message, first_chunk_size: int, more_body: bool) -> bool:
+        """Сжимать ли ответ: статус с телом, подходящий тип, размер не меньше порога"""
+        status = start_message["status"]
+        if status < 200 or status in (204, 304):
+            return False
+
+        headers = Headers(raw=start_message.get("headers", []))
+        if "content-encoding" in headers:
+            return False
+
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith(NON_COMPRESSIBLE_TYPES) or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+
+        content_length = headers.get("content-length")
+        if content_length is not None:
+            try:
+                return int(content_length) >= settings.compression_min_size
+            except ValueError:
+                return False
+
+        # Размер потокового ответа заранее неизвестен
+        return more_body or first_chunk_size >= settings.compression_min_size
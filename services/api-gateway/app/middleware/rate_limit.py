@@ -0,0 +1,90 @@
+"""
+Middleware ограничения частоты запросов для API Gateway
+
+«Чистое» ASGI middleware поверх DistributedRateLimiter: глобальный лимит,
+лимиты IP и пользователя, сервиса и маршрута проверяются одним обращением к
+Redis. Ответы дополняются заголовками RateLimit-Limit/Remaining/Reset.
+
+Middleware стоит внутри AuthMiddleware, поэтому user_id и маршрут уже лежат
+в scope["state"].
+"""
+
+import logging
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Scope, Receive, Send
+
+from app.config import settings
+from app.services.rate_limiter import rate_limiter
+from app.services.routing_table import match_scope
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitMiddleware:
+    """Middleware для ограничения частоты запросов"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.limiter = rate_limiter
+        self.exempt_paths = {
+            "/health",
+            "/metrics"
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Обработка запроса"""
+        if (
+            scope["type"] != "http"
+            or not settings.enable_rate_limiting
+            or scope["path"] in self.exempt_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else "127.0.0.1"
+        state = scope.setdefault("state", {})
+
+        try:
+            buckets = self.limiter.build_buckets(client_ip, state.get("user_id"), match_scope(scope))
+            result = await self.limiter.check(buckets)
+        except Exception as e:
+            # Ошибка лимитера не должна блокировать трафик
+            logger.error(f"Rate limiter error: {e}")
+            result = None
+
+        if result is None:
+            await self.app(scope, receive, send)
+            return
+
+        rate_limit_headers = result.headers()
+
+        if not result.allowed:
+            self._count_rejection(scope)
+            response = JSONResponse(
+                status_code=429,
+                content={
+                    "error": "Too Many Requests",
+                    "message": f"Rate limit exceeded: {result.limit} per 1 minute",
+                    "retry_after": result.retry_after
+                }
+            )
+            response.raw_headers.extend(rate_limit_headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + rate_limit_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    @staticmethod
+    def _count_rejection(scope: Scope):
+        """Учёт отклонённого запроса в MonitoringService (если он уже создан)"""
+        app = scope.get("app")
+        monitoring_service = getattr(getattr(app, "state", None), "monitoring_service", None)
+        if monitoring_service is not None:
+            monitoring_service.increment_rate_limited_count()
@@ -4,7 +4,7 @@
 
 from typing import Dict
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Request
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel, EmailStr
 
@@ -36,10 +36,9 @@ class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
 
-async def get_service_discovery() -> ServiceDiscovery:
-    """Зависимость для получения Service Discovery"""
-    # В реальном приложении это будет внедрено через DI
-    return ServiceDiscovery()
+def get_service_discovery(request: Request) -> ServiceDiscovery:
+    """Зависимость для получения Service Discovery (общий экземпляр приложения)"""
+    return request.app.state.service_discovery
 
 
 @router.post("/register", summary="Регистрация пользователя")
@@ -48,24 +47,13 @@ async def register(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Регистрация нового пользователя"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/auth/register",
-            method="POST",
-            data=request.dict()
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка регистрации")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/auth/register",
+        method="POST",
+        data=request.dict(),
+        error_detail="Ошибка регистрации"
+    )
 
 
 @router.post("/login", summary="Вход в систему")
@@ -74,24 +62,13 @@ async def login(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Аутентификация пользователя"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/auth/login",
-            method="POST",
-            data=request.dict()
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка входа")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/auth/login",
+        method="POST",
+        data=request.dict(),
+        error_detail="Ошибка входа"
+    )
 
 
 @router.post("/refresh", summary="Обновление токена")
@@ -100,24 +77,13 @@ async def refresh_token(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Обновление access token с помощью refresh token"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/auth/refresh",
-            method="POST",
-            data=request.dict()
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка обновления токена")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/auth/refresh",
+        method="POST",
+        data=request.dict(),
+        error_detail="Ошибка обновления токена"
+    )
 
 
 @router.post("/logout", summary="Выход из системы")
@@ -126,21 +92,10 @@ async def logout(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Выход из системы и отзыв токенов"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/auth/logout",
-            method="POST",
-            headers={"Authorization": f"Bearer {credentials.credentials}"}
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка выхода")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/auth/logout",
+        method="POST",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        error_detail="Ошибка выхода"
+    )
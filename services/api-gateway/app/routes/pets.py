@@ -4,7 +4,7 @@
 
 from typing import Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, Query, Request
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel
 
@@ -54,8 +54,8 @@ class PetUpdate(PetCreate):
     pass
 
 
-async def get_service_discovery() -> ServiceDiscovery:
-    return ServiceDiscovery()
+def get_service_discovery(request: Request) -> ServiceDiscovery:
+    return request.app.state.service_discovery
 
 
 @router.get("", summary="Список питомцев пользователя")
@@ -67,22 +67,14 @@ async def list_pets(
     credentials = Depends(security),
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="pet-service",
-            path="/api/v1/pets",
-            method="GET",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
-            params={"page": page, "limit": limit, "refresh": refresh}
-        )
-        if response["status_code"] >= 400:
-            detail = response["error"].get("detail", "Ошибка получения питомцев") if isinstance(response.get("error"), dict) else response.get("error")
-            raise HTTPException(status_code=response["status_code"], detail=detail)
-        return response["data"]
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="pet-service",
+        path="/api/v1/pets",
+        method="GET",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        params={"page": page, "limit": limit, "refresh": refresh},
+        error_detail="Ошибка получения питомцев"
+    )
 
 
 @router.post("", summary="Создание питомца")
@@ -92,22 +84,14 @@ async def create_pet(
     credentials = Depends(security),
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="pet-service",
-            path="/api/v1/pets",
-            method="POST",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
-            data=pet_data.model_dump(exclude_none=True)
-        )
-        if response["status_code"] >= 400:
-            detail = response["error"].get("detail", "Ошибка создания питомца") if isinstance(response.get("error"), dict) else response.get("error")
-            raise HTTPException(status_code=response["status_code"], detail=detail)
-        return response["data"]
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="pet-service",
+        path="/api/v1/pets",
+        method="POST",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        data=pet_data.model_dump(exclude_none=True),
+        error_detail="Ошибка создания питомца"
+    )
 
 
 @router.get("/{pet_id}", summary="Карточка питомца")
@@ -117,21 +101,13 @@ async def get_pet(
     credentials = Depends(security),
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="pet-service",
-            path=f"/api/v1/pets/{pet_id}",
-            method="GET",
-            headers={"Authorization": f"Bearer {credentials.credentials}"}
-        )
-        if response["status_code"] >= 400:
-            detail = response["error"].get("detail", "Питомец не найден") if isinstance(response.get("error"), dict) else response.get("error")
-            raise HTTPException(status_code=response["status_code"], detail=detail)
-        return response["data"]
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="pet-service",
+        path=f"/api/v1/pets/{pet_id}",
+        method="GET",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        error_detail="Питомец не найден"
+    )
 
 
 @router.put("/{pet_id}", summary="Обновление питомца")
@@ -142,22 +118,14 @@ async def update_pet(
     credentials = Depends(security),
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="pet-service",
-            path=f"/api/v1/pets/{pet_id}",
-            method="PUT",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
-            data=pet_data.model_dump(exclude_none=True)
-        )
-        if response["status_code"] >= 400:
-            detail = response["error"].get("detail", "Ошибка обновления питомца") if isinstance(response.get("error"), dict) else response.get("error")
-            raise HTTPException(status_code=response["status_code"], detail=detail)
-        return response["data"]
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="pet-service",
+        path=f"/api/v1/pets/{pet_id}",
+        method="PUT",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        data=pet_data.model_dump(exclude_none=True),
+        error_detail="Ошибка обновления питомца"
+    )
 
 
 @router.delete("/{pet_id}", summary="Удаление питомца")
@@ -167,20 +135,12 @@ async def delete_pet(
     credentials = Depends(security),
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="pet-service",
-            path=f"/api/v1/pets/{pet_id}",
-            method="DELETE",
-            headers={"Authorization": f"Bearer {credentials.credentials}"}
-        )
-        if response["status_code"] >= 400:
-            detail = response["error"].get("detail", "Ошибка удаления питомца") if isinstance(response.get("error"), dict) else response.get("error")
-            raise HTTPException(status_code=response["status_code"], detail=detail)
-        return response["data"]
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="pet-service",
+        path=f"/api/v1/pets/{pet_id}",
+        method="DELETE",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        error_detail="Ошибка удаления питомца"
+    )
 
 
@@ -4,7 +4,7 @@
 
 from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, Query, Request
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel
 
@@ -37,9 +37,9 @@ class WalkerVerificationRequest(BaseModel):
     work_schedule: Dict
 
 
-async def get_service_discovery() -> ServiceDiscovery:
-    """Зависимость для получения Service Discovery"""
-    return ServiceDiscovery()
+def get_service_discovery(request: Request) -> ServiceDiscovery:
+    """Зависимость для получения Service Discovery (общий экземпляр приложения)"""
+    return request.app.state.service_discovery
 
 
 async def get_current_user(request: Request) -> Dict:
@@ -57,24 +57,13 @@ async def get_user_profile(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Получение профиля текущего пользователя"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/users/profile",
-            method="GET",
-            headers={"Authorization": f"Bearer {credentials.credentials}"}
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка получения профиля")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/users/profile",
+        method="GET",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        error_detail="Ошибка получения профиля"
+    )
 
 
 @router.put("/profile", summary="Обновление профиля пользователя")
@@ -85,25 +74,14 @@ async def update_user_profile(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Обновление профиля пользователя"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/users/profile",
-            method="PUT",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
-            data=profile_data.dict(exclude_unset=True)
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка обновления профиля")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/users/profile",
+        method="PUT",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        data=profile_data.dict(exclude_unset=True),
+        error_detail="Ошибка обновления профиля"
+    )
 
 
 @router.post("/verify-walker", summary="Верификация выгульщика")
@@ -114,25 +92,14 @@ async def verify_walker(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Верификация документов выгульщика"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/users/verify-documents",
-            method="POST",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
-            data=verification_data.dict()
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка верификации")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/users/verify-documents",
+        method="POST",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        data=verification_data.dict(),
+        error_detail="Ошибка верификации"
+    )
 
 
 @router.get("/walker/nearby", summary="Поиск выгульщиков рядом")
@@ -143,28 +110,17 @@ async def get_nearby_walkers(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Поиск выгульщиков в заданном радиусе"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/users/walker/nearby",
-            method="GET",
-            params={
-                "latitude": latitude,
-                "longitude": longitude,
-                "radius": radius
-            }
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка поиска выгульщиков")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/users/walker/nearby",
+        method="GET",
+        params={
+            "latitude": latitude,
+            "longitude": longitude,
+            "radius": radius
+        },
+        error_detail="Ошибка поиска выгульщиков"
+    )
 
 
 @router.get("/{user_id}", summary="Получение информации о пользователе")
@@ -175,24 +131,13 @@ async def get_user_by_id(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Получение информации о конкретном пользователе"""
-    try:
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path=f"/api/v1/users/{user_id}",
-            method="GET",
-            headers={"Authorization": f"Bearer {credentials.credentials}"}
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Пользователь не найден")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path=f"/api/v1/users/{user_id}",
+        method="GET",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        error_detail="Пользователь не найден"
+    )
 
 
 @router.get("/", summary="Получение списка пользователей")
@@ -205,26 +150,15 @@ async def get_users(
     service_discovery: ServiceDiscovery = Depends(get_service_discovery)
 ):
     """Получение списка пользователей с пагинацией"""
-    try:
-        params = {"page": page, "limit": limit}
-        if role:
-            params["role"] = role
-
-        response = await service_discovery.proxy_request(
-            service_name="user-service",
-            path="/api/v1/users",
-            method="GET",
-            headers={"Authorization": f"Bearer {credentials.credentials}"},
-            params=params
-        )
-
-        if response["status_code"] >= 400:
-            raise HTTPException(
-                status_code=response["status_code"],
-                detail=response["error"].get("detail", "Ошибка получения пользователей")
-            )
-
-        return response["data"]
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сервиса: {str(e)}")
+    params = {"page": page, "limit": limit}
+    if role:
+        params["role"] = role
+
+    return await service_discovery.proxy_response(
+        service_name="user-service",
+        path="/api/v1/users",
+        method="GET",
+        headers={"Authorization": f"Bearer {credentials.credentials}"},
+        params=params,
+        error_detail="Ошибка получения пользователей"
+    )
@@ -66,9 +66,10 @@ class GatewayStatsResponse(BaseModel):
     rate_limited_requests: int
     average_response_time: float
     uptime_seconds: int
-    memory_usage_mb: float
-    cpu_usage_percent: float
-    active_connections: int
+    # Системные метрики — последний снимок фонового сборщика (нет до первого снимка)
+    memory_usage_mb: Optional[float] = None
+    cpu_usage_percent: Optional[float] = None
+    active_connections: Optional[int] = None
     services_status: Dict[str, ServiceStatus]
     routes_stats: Dict[str, Dict[str, Any]]
     period_start: datetime
@@ -219,3 +220,36 @@ class APICompositionResponse(BaseModel):
     successful_requests: int
     failed_requests: int
     timestamp: datetime
+
+
+class BatchSubRequest(BaseModel):
+    """Подзапрос пакетного запроса"""
+    method: str = "GET"
+    path: str  # Путь шлюза, например /api/v1/pet/pets/123
+    query: Optional[Dict[str, Any]] = None
+    body: Optional[Any] = None
+
+    @field_validator('method')
+    def validate_method(cls, v: str) -> str:
+        v = v.upper()
+        if v not in ("GET", "POST", "PUT", "PATCH", "DELETE"):
+            raise ValueError('Unsupported method')
+        return v
+
+    @field_validator('path')
+    def validate_path(cls, v: str) -> str:
+        if not v.startswith('/'):
+            raise ValueError('Path must start with /')
+        return v
+
+
+class BatchRequest(BaseModel):
+    """Пакетный запрос"""
+    requests: List[BatchSubRequest]
+
+
+class BatchSubResponse(BaseModel):
+    """Результат подзапроса"""
+    status_code: int
+    headers: Dict[str, str] = {}
+    body: Any = None
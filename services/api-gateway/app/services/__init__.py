@@ -5,5 +5,8 @@
 from .gateway_service import GatewayService
 from .auth_service import AuthService
 from .monitoring_service import MonitoringService
+from .composition_service import CompositionService
+from .batch_service import BatchService
+from .websocket_proxy import WebSocketProxy
 
-__all__ = ["GatewayService", "AuthService", "MonitoringService"]
+__all__ = ["GatewayService", "AuthService", "MonitoringService", "CompositionService", "BatchService", "WebSocketProxy"]
@@ -12,6 +12,7 @@ import httpx
 from fastapi import HTTPException
 
 from app.config import settings
+from app.services.token_cache import token_cache
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +24,22 @@ class AuthService:
         self.user_service_url = settings.user_service_url
 
     async def verify_token(self, token: str) -> Dict[str, Any]:
-        """Проверка JWT токена (верификация подписи и срока действия на стороне Gateway)."""
+        """Проверка JWT токена (верификация подписи и срока действия на стороне Gateway).
+
+        Результат кэшируется по SHA-256 токена до его exp; недавно отклонённые
+        токены отклоняются без повторной проверки подписи.
+        """
+        digest = token_cache.digest(token)
+
+        payload = token_cache.get(digest)
+        if payload is not None:
+            return payload
+
+        rejection = token_cache.get_rejection(digest)
+        if rejection is not None:
+            raise HTTPException(status_code=rejection[0], detail=rejection[1])
+
+        token_cache.record_miss()
         try:
             # Полная проверка подписи и exp
             payload = jwt.decode(
@@ -31,17 +47,25 @@ class AuthService:
                 settings.jwt_secret_key,
                 algorithms=[settings.jwt_algorithm],
                 options={"require": ["exp"]},
+                leeway=settings.jwt_leeway_seconds,
             )
-            return payload
+            token_cache.put(digest, payload)
+            return dict(payload)
 
         except jwt.ExpiredSignatureError:
+            token_cache.put_rejection(digest, 401, "Token expired")
             raise HTTPException(status_code=401, detail="Token expired")
         except jwt.InvalidTokenError:
+            token_cache.put_rejection(digest, 401, "Invalid token")
             raise HTTPException(status_code=401, detail="Invalid token")
         except Exception as e:
             logger.error(f"Token verification error: {e}")
             raise HTTPException(status_code=401, detail="Token verification failed")
 
+    def get_token_cache_stats(self) -> Dict[str, Any]:
+        """Статистика кэша проверенных токенов"""
+        return token_cache.get_stats()
+
     async def _verify_token_with_user_service(self, token: str):
         """Проверка токена через User Service"""
         try:
@@ -0,0 +1,141 @@
+"""
+Пакетные запросы к API Gateway
+
+`POST /api/v1/batch` принимает список подзапросов с путями шлюза. Для каждого
+подзапроса один раз проверяются требование аутентификации и лимиты маршрута
+(те же корзины, что у RateLimitMiddleware), затем подзапросы выполняются
+параллельно через `GatewayService.forward_request` — общий пул keep-alive
+соединений к сервисам — не более `batch_max_concurrency` одновременно.
+Результаты возвращаются в порядке подзапросов.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.config import settings
+from app.schemas.gateway import BatchSubRequest
+from app.services.field_projection import InvalidFields, parse_fields, project
+from app.services.gateway_service import GatewayService, decode_response_body
+from app.services.rate_limiter import rate_limiter
+from app.services.routing_table import get_routing_table
+
+logger = logging.getLogger(__name__)
+
+# Заголовки ответа сервиса, которые возвращаются в результате подзапроса
+_RESPONSE_HEADERS = ("content-type", "etag", "cache-control", "location")
+
+
+class BatchService:
+    """Выполнение пакетных запросов"""
+
+    def __init__(self, gateway_service: GatewayService):
+        self.gateway_service = gateway_service
+
+    async def execute(self, request: Request, sub_requests: List[BatchSubRequest]) -> List[Dict[str, Any]]:
+        """Параллельное выполнение подзапросов с ограничением одновременности"""
+        semaphore = asyncio.Semaphore(settings.batch_max_concurrency)
+        headers = self.gateway_service.build_subrequest_headers(request)
+
+        async def run(sub_request: BatchSubRequest) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._execute_one(request, sub_request, headers)
+
+        return list(await asyncio.gather(*(run(sub_request) for sub_request in sub_requests)))
+
+    def _resolve(self, path: str) -> Optional[Tuple[str, str]]:
+        """Сервис и путь сервиса для пути шлюза /api/{version}/{service}/{path}"""
+        api_prefix = f"/api/{settings.api_version}/"
+        if not path.startswith(api_prefix):
+            return None
+
+        service_name, _, service_path = path[len(api_prefix):].partition("/")
+        if service_name not in self.gateway_service.service_registry:
+            return None
+        return service_name, f"/api/{settings.api_version}/{service_path}"
+
+    async def _execute_one(
+        self,
+        request: Request,
+        sub_request: BatchSubRequest,
+        headers: Dict[str, str]
+    ) -> Dict[str, Any]:
+        resolved = self._resolve(sub_request.path)
+        if resolved is None:
+            return self._error(404, f"No service for path {sub_request.path}")
+        service_name, service_path = resolved
+
+        route_match = get_routing_table().match(sub_request.path)
+        user_id = getattr(request.state, "user_id", None)
+
+        # Аутентификация пакетного запроса уже проверена middleware; маршрут может требовать её явно
+        if route_match is not None and route_match.auth_required and not user_id:
+            return self._error(401, "Missing authentication token")
+
+        if settings.enable_rate_limiting:
+            client_ip = request.client.host if request.client else "127.0.0.1"
+            result = await rate_limiter.check(rate_limiter.build_buckets(client_ip, user_id, route_match))
+            if result is not None and not result.allowed:
+                return self._error(429, "Rate limit exceeded", retry_after=result.retry_after)
+
+        # Проекция полей подзапроса выполняется шлюзом, в сервис параметр не передаётся
+        query = dict(sub_request.query or {})
+        fields_value = query.pop(settings.fields_param, None)
+        try:
+            fields = parse_fields(str(fields_value) if fields_value is not None else None)
+        except InvalidFields as e:
+            return self._error(400, str(e))
+
+        sub_headers = headers
+        content = None
+        if sub_request.body is not None:
+            sub_headers = {**headers, "content-type": "application/json"}
+            content = json.dumps(sub_request.body).encode()
+
+        try:
+            result = await self.gateway_service.forward_request(
+                service_name,
+                service_path,
+                sub_request.method,
+                headers=sub_headers,
+                params=query or None,
+                content=content,
+                priority=route_match.priority if route_match else None
+            )
+        except HTTPException as e:
+            retry_after = (e.headers or {}).get("Retry-After")
+            if retry_after is not None:
+                return self._error(e.status_code, e.detail, retry_after=int(retry_after))
+            return self._error(e.status_code, e.detail)
+        except ValueError as e:
+            return self._error(503, str(e))
+        except Exception as e:
+            logger.error(f"Batch sub-request {sub_request.method} {sub_request.path} failed: {e}")
+            return self._error(502, "Upstream request failed")
+
+        # Изменяющие подзапросы сбрасывают кэш пользователя для сервиса, как и обычный прокси
+        if sub_request.method != "GET" and route_match is not None and route_match.cache_ttl:
+            cache = self.gateway_service.response_cache
+            await cache.invalidate(service_name, cache.get_user_scope(request))
+
+        upstream_headers = result["headers"]
+        body = decode_response_body(result["body"])
+        if fields is not None and result["status_code"] == 200 and not isinstance(body, str):
+            body = project(body, fields)
+
+        return {
+            "status_code": result["status_code"],
+            "headers": {name: upstream_headers[name] for name in _RESPONSE_HEADERS if name in upstream_headers},
+            "body": body
+        }
+
+    @staticmethod
+    def _error(status_code: int, message: str, **extra) -> Dict[str, Any]:
+        return {
+            "status_code": status_code,
+            "headers": {},
+            "body": {"error": message, **extra}
+        }
@@ -0,0 +1,332 @@
+"""
+Circuit breaker для сервисов API Gateway
+
+Решение об открытии принимается по доле ошибок и доле медленных вызовов в
+скользящем окне (`circuit_breaker_window_seconds`, разбито на бакеты по
+времени), но только после `circuit_breaker_minimum_calls` вызовов в окне.
+После `circuit_breaker_recovery_timeout` breaker переходит в half-open и
+пропускает не более `circuit_breaker_half_open_max_probes` одновременных
+пробных запросов: все успешные — закрытие, любой неуспешный — снова open.
+
+Переходы публикуются в Redis pub/sub, и остальные реплики шлюза применяют их
+у себя. Реплика, узнавшая, что другая уже проверяет сервис в half-open, держит
+breaker открытым до результата, поэтому пробы не умножаются на число реплик.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Dict, Any, Optional
+
+from prometheus_client import Counter, Gauge
+
+from app import database
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "gateway_circuit_breaker_transitions_total",
+    "Переходы circuit breaker между состояниями",
+    ["service", "from_state", "to_state", "source"],
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "gateway_circuit_breaker_state",
+    "Состояние circuit breaker (0 - closed, 1 - half_open, 2 - open)",
+    ["service"],
+)
+CIRCUIT_BREAKER_REJECTED = Counter(
+    "gateway_circuit_breaker_rejected_total",
+    "Запросы, отклонённые circuit breaker без обращения к сервису",
+    ["service"],
+)
+
+
+class CircuitBreakerOpen(Exception):
+    """Breaker не пропускает запрос"""
+
+
+class _WindowBucket:
+    __slots__ = ("started_at", "calls", "failures", "slow_calls")
+
+    def __init__(self):
+        self.started_at = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+
+
+class SlidingWindow:
+    """Счётчики вызовов за последние window_seconds (кольцо бакетов по времени)"""
+
+    def __init__(self, window_seconds: float, buckets: int):
+        self.bucket_seconds = window_seconds / buckets
+        self.window_seconds = window_seconds
+        self._buckets = [_WindowBucket() for _ in range(buckets)]
+
+    def _current(self, now: float) -> _WindowBucket:
+        started_at = now - now % self.bucket_seconds
+        bucket = self._buckets[int(started_at / self.bucket_seconds) % len(self._buckets)]
+        if bucket.started_at != started_at:
+            bucket.started_at = started_at
+            bucket.calls = bucket.failures = bucket.slow_calls = 0
+        return bucket
+
+    def record(self, failed: bool, slow: bool, now: Optional[float] = None):
+        bucket = self._current(time.monotonic() if now is None else now)
+        bucket.calls += 1
+        if failed:
+            bucket.failures += 1
+        if slow:
+            bucket.slow_calls += 1
+
+    def totals(self, now: Optional[float] = None) -> Dict[str, int]:
+        now = time.monotonic() if now is None else now
+        calls = failures = slow_calls = 0
+        for bucket in self._buckets:
+            if now - bucket.started_at < self.window_seconds:
+                calls += bucket.calls
+                failures += bucket.failures
+                slow_calls += bucket.slow_calls
+        return {"calls": calls, "failures": failures, "slow_calls": slow_calls}
+
+    def reset(self):
+        for bucket in self._buckets:
+            bucket.started_at = 0.0
+            bucket.calls = bucket.failures = bucket.slow_calls = 0
+
+
+class CircuitBreaker:
+    """Circuit breaker одного сервиса"""
+
+    def __init__(self, service_name: str, on_transition=None):
+        self.service_name = service_name
+        self.state = CLOSED
+        self.window = SlidingWindow(
+            settings.circuit_breaker_window_seconds,
+            settings.circuit_breaker_window_buckets
+        )
+        self.opened_at = 0.0
+        self.open_duration = 0.0
+        self.last_failure_time: Optional[float] = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._on_transition = on_transition
+        CIRCUIT_BREAKER_STATE.labels(service_name).set(STATE_VALUES[CLOSED])
+
+    def acquire(self) -> bool:
+        """Разрешение на вызов; True — вызов является пробным (half-open)"""
+        if not settings.circuit_breaker_enabled:
+            return False
+
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_duration:
+                CIRCUIT_BREAKER_REJECTED.labels(self.service_name).inc()
+                raise CircuitBreakerOpen(self.service_name)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= settings.circuit_breaker_half_open_max_probes:
+                CIRCUIT_BREAKER_REJECTED.labels(self.service_name).inc()
+                raise CircuitBreakerOpen(self.service_name)
+            self._probes_in_flight += 1
+            return True
+
+        return False
+
+    def record(self, failed: bool, duration: float, probe: bool = False):
+        """Результат вызова, разрешённого acquire()"""
+        if not settings.circuit_breaker_enabled:
+            return
+
+        slow = duration >= settings.circuit_breaker_slow_call_duration
+        if failed:
+            self.last_failure_time = time.time()
+
+        if probe:
+            self.release(probe)
+            if self.state != HALF_OPEN:
+                return
+            if failed or slow:
+                self._transition(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= settings.circuit_breaker_half_open_max_probes:
+                    self._transition(CLOSED)
+            return
+
+        if self.state != CLOSED:
+            return
+
+        self.window.record(failed, slow)
+        if failed or slow:
+            self._evaluate()
+
+    def release(self, probe: bool):
+        """Освобождение пробного слота без учёта результата (например, отмена запроса)"""
+        if probe and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+
+    def _evaluate(self):
+        totals = self.window.totals()
+        calls = totals["calls"]
+        if calls < settings.circuit_breaker_minimum_calls:
+            return
+
+        failure_rate = totals["failures"] / calls
+        slow_call_rate = totals["slow_calls"] / calls
+        if (
+            failure_rate >= settings.circuit_breaker_failure_rate_threshold
+            or slow_call_rate >= settings.circuit_breaker_slow_call_rate_threshold
+        ):
+            logger.warning(
+                f"Circuit breaker for {self.service_name}: failure rate {failure_rate:.2f}, "
+                f"slow call rate {slow_call_rate:.2f} over {calls} calls"
+            )
+            self._transition(OPEN)
+
+    def _transition(self, new_state: str, source: str = "local"):
+        old_state = self.state
+        if old_state == new_state:
+            return
+
+        self.state = new_state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        if new_state == OPEN:
+            self._hold_open()
+        elif new_state == CLOSED:
+            self.window.reset()
+
+        CIRCUIT_BREAKER_TRANSITIONS.labels(self.service_name, old_state, new_state, source).inc()
+        CIRCUIT_BREAKER_STATE.labels(self.service_name).set(STATE_VALUES[new_state])
+        logger.info(f"Circuit breaker {old_state} -> {new_state} for service {self.service_name} ({source})")
+
+        if source == "local" and self._on_transition is not None:
+            self._on_transition(self.service_name, new_state)
+
+    def _hold_open(self):
+        """Открытие с разбросом времени восстановления, чтобы реплики не пробовали одновременно"""
+        self.opened_at = time.monotonic()
+        self.open_duration = settings.circuit_breaker_recovery_timeout * random.uniform(1.0, 1.2)
+
+    def apply_remote(self, new_state: str):
+        """Переход, опубликованный другой репликой"""
+        if new_state == HALF_OPEN:
+            # Другая реплика уже проверяет сервис — остаёмся открытыми до результата
+            if self.state == OPEN:
+                self._hold_open()
+            return
+        self._transition(new_state, source="remote")
+
+    def force_close(self):
+        self._transition(CLOSED, source="manual")
+        if self._on_transition is not None:
+            self._on_transition(self.service_name, CLOSED)
+
+    def get_stats(self) -> Dict[str, Any]:
+        totals = self.window.totals()
+        next_attempt_in = None
+        if self.state == OPEN:
+            next_attempt_in = max(self.open_duration - (time.monotonic() - self.opened_at), 0.0)
+        return {
+            "state": self.state,
+            "window_calls": totals["calls"],
+            "window_failures": totals["failures"],
+            "window_slow_calls": totals["slow_calls"],
+            "probes_in_flight": self._probes_in_flight,
+            "last_failure_time": self.last_failure_time,
+            "next_attempt_in": next_attempt_in
+        }
+
+
+class CircuitBreakerRegistry:
+    """Breaker'ы сервисов и синхронизация переходов между репликами через Redis pub/sub"""
+
+    def __init__(self, channel: Optional[str] = None):
+        self.channel = channel or settings.circuit_breaker_sync_channel
+        self.replica_id = uuid.uuid4().hex
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._publish_tasks = set()
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def get(self, service_name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(service_name)
+        if breaker is None:
+            breaker = self._breakers[service_name] = CircuitBreaker(service_name, self._publish)
+        return breaker
+
+    def items(self):
+        return self._breakers.items()
+
+    def _publish(self, service_name: str, state: str):
+        """Публикация локального перехода (без ожидания, переход уже применён)"""
+        redis_client = database.redis_client
+        if not redis_client:
+            return
+
+        message = json.dumps({"service": service_name, "state": state, "replica": self.replica_id})
+        try:
+            task = asyncio.get_running_loop().create_task(redis_client.publish(self.channel, message))
+        except RuntimeError:
+            return
+        self._publish_tasks.add(task)
+        task.add_done_callback(self._publish_done)
+
+    def _publish_done(self, task: asyncio.Task):
+        self._publish_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error publishing circuit breaker transition: {task.exception()}")
+
+    def _apply_message(self, data: str):
+        message = json.loads(data)
+        if message.get("replica") == self.replica_id:
+            return
+        state = message.get("state")
+        if state not in STATE_VALUES:
+            return
+        self.get(message["service"]).apply_remote(state)
+
+    async def start_sync(self):
+        """Фоновая подписка на переходы других реплик"""
+        self._sync_task = asyncio.current_task()
+        while True:
+            redis_client = database.redis_client
+            if not redis_client:
+                await asyncio.sleep(5)
+                continue
+
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        try:
+                            self._apply_message(message["data"])
+                        except Exception as e:
+                            logger.error(f"Invalid circuit breaker message: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Circuit breaker sync error: {e}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.close()
+
+    def stop_sync(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: breaker.get_stats() for name, breaker in self._breakers.items()}
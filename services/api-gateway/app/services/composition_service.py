@@ -0,0 +1,114 @@
+"""
+Композиция API на стороне шлюза
+
+Составной маршрут (`settings.composite_routes`) описывает набор запросов к
+сервисам. Все части выполняются параллельно через `GatewayService.forward_request`
+(общий пул соединений, балансировка, circuit breaker) под общим сроком маршрута;
+у каждой части свой таймаут. Ответ — один JSON-документ: данные частей и ошибки
+тех, что не ответили. Неудачная необязательная часть заменяется значением `default`.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.config import settings, CompositeRouteConfig, CompositionPartConfig
+from app.services.field_projection import project
+from app.services.gateway_service import GatewayService, decode_response_body
+
+logger = logging.getLogger(__name__)
+
+
+class CompositionService:
+    """Выполнение составных маршрутов"""
+
+    def __init__(self, gateway_service: GatewayService):
+        self.gateway_service = gateway_service
+
+    def get_route(self, name: str) -> Optional[CompositeRouteConfig]:
+        return settings.composite_routes.get(name)
+
+    async def compose(self, request: Request, route: CompositeRouteConfig) -> Dict[str, Any]:
+        """Параллельное выполнение частей маршрута и сборка ответа"""
+        start_time = time.time()
+        fields = self.gateway_service.get_fields(request)
+        deadline = route.timeout or settings.composition_timeout
+
+        headers = self.gateway_service.build_subrequest_headers(request)
+        user_id = getattr(request.state, "user_id", None)
+
+        tasks = {
+            part.name: asyncio.create_task(self._call_part(part, headers, user_id))
+            for part in route.parts
+        }
+        done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+        for task in pending:
+            task.cancel()
+
+        data: Dict[str, Any] = {}
+        errors: Dict[str, Any] = {}
+        for part in route.parts:
+            task = tasks[part.name]
+            if task in pending:
+                value, error = None, {"error": "timeout", "message": f"Composition deadline {deadline}s exceeded"}
+            else:
+                value, error = task.result()
+
+            if error is None:
+                data[part.name] = value
+                continue
+
+            errors[part.name] = error
+            if part.required:
+                logger.warning(f"Required part {part.name} of composition {route.name} failed: {error}")
+                raise HTTPException(
+                    status_code=502,
+                    detail={"message": f"Required part {part.name} failed", "errors": errors}
+                )
+            data[part.name] = part.default
+
+        # ?fields= применяется к данным частей: fields=profile.name,pets.id
+        if fields is not None:
+            data = project(data, fields)
+
+        return {
+            "composition": route.name,
+            "data": data,
+            "errors": errors,
+            "partial": bool(errors),
+            "total_time": time.time() - start_time
+        }
+
+    async def _call_part(
+        self,
+        part: CompositionPartConfig,
+        headers: Dict[str, str],
+        user_id: Optional[str]
+    ) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """Запрос одной части: (данные, None) или (None, описание ошибки)"""
+        timeout = part.timeout or settings.composition_part_timeout
+        path = part.path.replace("{user_id}", str(user_id)) if "{user_id}" in part.path else part.path
+
+        try:
+            result = await asyncio.wait_for(
+                self.gateway_service.forward_request(
+                    part.service,
+                    path,
+                    "GET",
+                    headers=headers,
+                    params=part.query or None
+                ),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            return None, {"error": "timeout", "message": f"Part timeout {timeout}s exceeded"}
+        except Exception as e:
+            return None, {"error": "unavailable", "message": str(e)}
+
+        body = decode_response_body(result["body"])
+        if result["status_code"] >= 400:
+            return None, {"error": "upstream_error", "status_code": result["status_code"], "body": body}
+        return body, None
@@ -0,0 +1,209 @@
+"""
+Адаптивное ограничение одновременных запросов к сервисам
+
+Лимит запросов в полёте к каждому сервису подбирается по AIMD: пока время
+ответа близко к минимальному наблюдаемому (без нагрузки), лимит растёт на
+единицу за «окно» из limit ответов; при росте задержки сверх
+`concurrency_latency_tolerance` раз, таймауте или 503/504 лимит умножается на
+`concurrency_backoff_ratio` (не чаще раза в `concurrency_backoff_interval`).
+
+Запросы сверх лимита ждут в очереди по приоритету (0 — высший): у каждого
+класса свой срок ожидания, после которого запрос отбрасывается (503 +
+Retry-After). При переполнении очереди вытесняется самый низкоприоритетный.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY_LIMIT = Gauge(
+    "gateway_concurrency_limit",
+    "Текущий адаптивный лимит одновременных запросов к сервису",
+    ["service"],
+)
+CONCURRENCY_IN_FLIGHT = Gauge(
+    "gateway_concurrency_in_flight",
+    "Запросы к сервису в полёте (под лимитом)",
+    ["service"],
+)
+CONCURRENCY_QUEUE_DEPTH = Gauge(
+    "gateway_concurrency_queue_depth",
+    "Запросы к сервису, ожидающие в очереди",
+    ["service"],
+)
+LOAD_SHED = Counter(
+    "gateway_load_shed_total",
+    "Отброшенные запросы по сервису, приоритету и причине",
+    ["service", "priority", "reason"],
+)
+
+
+class LoadShed(Exception):
+    """Запрос отброшен ограничителем"""
+
+    def __init__(self, service_name: str, reason: str, retry_after: int):
+        super().__init__(f"Service {service_name} overloaded ({reason})")
+        self.service_name = service_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+QueueEntry = Tuple[int, int, asyncio.Future]
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD-лимит одновременных запросов к одному сервису с приоритетной очередью"""
+
+    def __init__(self, service_name: str, max_limit: Optional[int] = None):
+        self.service_name = service_name
+        self.min_limit = settings.concurrency_min_limit
+        self.max_limit = max_limit or settings.concurrency_max_limit
+        self.limit = float(min(max(settings.concurrency_initial_limit, self.min_limit), self.max_limit))
+        self.in_flight = 0
+
+        # Время ответа без нагрузки: минимум по окну из concurrency_rtt_window ответов
+        self.rtt_noload: Optional[float] = None
+        self._window_min = float("inf")
+        self._window_samples = 0
+        self._last_backoff = 0.0
+
+        self._queue: List[QueueEntry] = []
+        self._sequence = itertools.count()
+
+        CONCURRENCY_LIMIT.labels(service_name).set(self.limit)
+
+    async def acquire(self, priority: int):
+        """Ожидание слота; LoadShed, если очередь переполнена или срок ожидания истёк"""
+        if not self._queue and self.in_flight < self._current_limit():
+            self._take_slot()
+            return
+
+        if len(self._queue) >= settings.concurrency_max_queue:
+            worst = max(self._queue)
+            if worst[0] <= priority:
+                self._shed(priority, "queue_full")
+            # Вытесняем самый низкоприоритетный ожидающий запрос
+            self._remove(worst)
+            self._shed_waiter(worst, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._queue, entry)
+        CONCURRENCY_QUEUE_DEPTH.labels(self.service_name).set(len(self._queue))
+
+        try:
+            await asyncio.wait_for(future, timeout=self._queue_timeout(priority))
+        except asyncio.TimeoutError:
+            self._remove(entry)
+            self._shed(priority, "queue_timeout")
+        except asyncio.CancelledError:
+            self._remove(entry)
+            # Слот мог быть выдан одновременно с отменой ожидающего
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+
+    def release(self, response_time: Optional[float] = None, overloaded: bool = False):
+        """Освобождение слота; с response_time — с учётом ответа в адаптации лимита"""
+        self.in_flight = max(self.in_flight - 1, 0)
+        if response_time is not None:
+            self._on_sample(response_time, overloaded)
+        CONCURRENCY_IN_FLIGHT.labels(self.service_name).set(self.in_flight)
+        self._drain()
+
+    def _on_sample(self, response_time: float, overloaded: bool):
+        self._window_min = min(self._window_min, response_time)
+        self._window_samples += 1
+        if self.rtt_noload is None:
+            self.rtt_noload = response_time
+        elif self._window_samples >= settings.concurrency_rtt_window:
+            # Обновляем базу окном, чтобы она следовала за долгосрочными изменениями сервиса
+            self.rtt_noload = self._window_min
+            self._window_min = float("inf")
+            self._window_samples = 0
+        else:
+            self.rtt_noload = min(self.rtt_noload, response_time)
+
+        congested = overloaded or response_time > self.rtt_noload * settings.concurrency_latency_tolerance
+        now = time.monotonic()
+
+        if congested:
+            if now - self._last_backoff >= settings.concurrency_backoff_interval:
+                self._last_backoff = now
+                self.limit = max(float(self.min_limit), self.limit * settings.concurrency_backoff_ratio)
+        elif self.in_flight + 1 >= self._current_limit():
+            # Рост только при упоре в лимит: иначе лимит не ограничивает и расти незачем
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+        CONCURRENCY_LIMIT.labels(self.service_name).set(self.limit)
+
+    def _current_limit(self) -> int:
+        return max(int(self.limit), 1)
+
+    def _take_slot(self):
+        self.in_flight += 1
+        CONCURRENCY_IN_FLIGHT.labels(self.service_name).set(self.in_flight)
+
+    def _drain(self):
+        """Выдача освободившихся слотов ожидающим в порядке приоритета"""
+        while self._queue and self.in_flight < self._current_limit():
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self._take_slot()
+            future.set_result(True)
+        CONCURRENCY_QUEUE_DEPTH.labels(self.service_name).set(len(self._queue))
+
+    def _remove(self, entry: QueueEntry):
+        try:
+            self._queue.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._queue)
+        CONCURRENCY_QUEUE_DEPTH.labels(self.service_name).set(len(self._queue))
+
+    def _queue_timeout(self, priority: int) -> float:
+        timeouts = settings.concurrency_queue_timeouts
+        return timeouts.get(priority, min(timeouts.values()))
+
+    def _shed(self, priority: int, reason: str):
+        LOAD_SHED.labels(self.service_name, str(priority), reason).inc()
+        raise LoadShed(self.service_name, reason, settings.concurrency_retry_after)
+
+    def _shed_waiter(self, entry: QueueEntry, reason: str):
+        priority, _, future = entry
+        LOAD_SHED.labels(self.service_name, str(priority), reason).inc()
+        if not future.done():
+            future.set_exception(LoadShed(self.service_name, reason, settings.concurrency_retry_after))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._queue),
+            "rtt_noload": self.rtt_noload
+        }
+
+
+def build_concurrency_limiters(services: Optional[Dict[str, Any]] = None) -> Dict[str, AdaptiveConcurrencyLimiter]:
+    """Ограничители для всех сервисов конфигурации (не выше размера пула соединений)"""
+    services = services if services is not None else settings.services
+    return {
+        name: AdaptiveConcurrencyLimiter(
+            name,
+            max_limit=min(
+                settings.concurrency_max_limit,
+                config.max_connections or settings.upstream_max_connections
+            )
+        )
+        for name, config in services.items()
+    }
@@ -1,6 +1,11 @@
 """
 Service Discovery для API Gateway
 Управление маршрутизацией запросов к микросервисам
+
+Один экземпляр на приложение (app.state.service_discovery, создаётся и
+закрывается в lifespan) с общим пулом keep-alive соединений. Роуты-прокси
+отдают ответ сервиса как есть (`proxy_response`): JSON разбирается только у
+ответов с ошибкой.
 """
 
 import asyncio
@@ -10,36 +15,36 @@ from typing import Dict, List, Optional
 from urllib.parse import urljoin
 
 import httpx
-from httpx import AsyncClient, Timeout
+from fastapi import HTTPException
+from fastapi.responses import Response
+from httpx import AsyncClient, Limits, Timeout
 
 from app.config import settings
+from app.services.gateway_service import HOP_BY_HOP_HEADERS
+from app.services.routing_table import get_routing_table
 
 
 logger = logging.getLogger(__name__)
 
+# Тело ответа передаётся уже декодированным, длину считает Response
+_SKIPPED_RESPONSE_HEADERS = HOP_BY_HOP_HEADERS | {"content-length", "content-encoding"}
+
 
 class ServiceDiscovery:
     """Service Discovery для маршрутизации запросов"""
 
     def __init__(self):
         self.services: Dict[str, Dict] = {}
-        self.client = AsyncClient(timeout=Timeout(10.0))
+        self.client = AsyncClient(
+            timeout=Timeout(10.0, connect=settings.upstream_connect_timeout, pool=settings.upstream_pool_timeout),
+            limits=Limits(
+                max_connections=settings.upstream_max_connections,
+                max_keepalive_connections=settings.upstream_max_keepalive_connections,
+                keepalive_expiry=settings.upstream_keepalive_expiry
+            )
+        )
         self._running = False
 
-        # Сопоставление путей сервисам
-        self.route_mapping = {
-            "/api/v1/auth": "user-service",
-            "/api/v1/users": "user-service",
-            "/api/v1/pets": "pet-service",
-            "/api/v1/orders": "order-service",
-            "/api/v1/location": "location-service",
-            "/api/v1/payments": "payment-service",
-            "/api/v1/chat": "chat-service",
-            "/api/v1/notifications": "notification-service",
-            "/api/v1/media": "media-service",
-            "/api/v1/analytics": "analytics-service",
-        }
-
         # URL сервисов
         self.service_urls = {
             "user-service": settings.user_service_url,
@@ -65,62 +70,72 @@ class ServiceDiscovery:
     async def stop_discovery(self):
         """Остановка обнаружения сервисов"""
         self._running = False
-        await self.client.aclose()
+        await self.close()
         logger.info("Service Discovery остановлен")
 
+    async def close(self):
+        """Закрытие пула соединений"""
+        await self.client.aclose()
+
     def get_service_url(self, service_name: str) -> Optional[str]:
         """Получение URL сервиса"""
         return self.service_urls.get(service_name)
 
     def get_service_for_path(self, path: str) -> Optional[str]:
         """Определение сервиса по пути запроса"""
-        for route_prefix, service in self.route_mapping.items():
-            if path.startswith(route_prefix):
-                return service
-        return None
-
-    async def proxy_request(self, service_name: str, path: str, method: str = "GET",
-                          headers: Dict = None, data: Dict = None, params: Dict = None) -> Dict:
-        """Проксирование запроса к микросервису"""
+        route_match = get_routing_table().match(path)
+        if route_match is None or route_match.service_config is None:
+            return None
+        return route_match.service_config.name
+
+    async def proxy_response(self, service_name: str, path: str, method: str = "GET",
+                             headers: Dict = None, data: Dict = None, params: Dict = None,
+                             error_detail: str = "Ошибка сервиса") -> Response:
+        """Проксирование с передачей тела и заголовков ответа без разбора JSON
+
+        Ответы с ошибкой (4xx/5xx) превращаются в HTTPException с detail сервиса
+        (или error_detail, если сервис его не вернул).
+        """
         service_url = self.get_service_url(service_name)
         if not service_url:
-            raise ValueError(f"Сервис {service_name} не найден")
-
-        url = urljoin(service_url, path)
+            raise HTTPException(status_code=500, detail=f"Сервис {service_name} не найден")
 
         try:
             response = await self.client.request(
                 method=method,
-                url=url,
+                url=urljoin(service_url, path),
                 headers=headers,
                 json=data,
                 params=params
             )
-
-            if response.status_code >= 400:
-                error_data = response.json() if response.headers.get('content-type') == 'application/json' else {"detail": response.text}
-                return {
-                    "status_code": response.status_code,
-                    "error": error_data
-                }
-
-            return {
-                "status_code": response.status_code,
-                "data": response.json() if response.headers.get('content-type') == 'application/json' else response.text
-            }
-
         except httpx.RequestError as e:
             logger.error(f"Ошибка запроса к {service_name}: {str(e)}")
-            return {
-                "status_code": 503,
-                "error": {"detail": f"Сервис {service_name} недоступен"}
-            }
-        except Exception as e:
-            logger.error(f"Неожиданная ошибка: {str(e)}")
-            return {
-                "status_code": 500,
-                "error": {"detail": "Внутренняя ошибка сервера"}
-            }
+            raise HTTPException(status_code=503, detail=f"Сервис {service_name} недоступен")
+
+        if response.status_code >= 400:
+            raise HTTPException(status_code=response.status_code, detail=self._error_detail(response, error_detail))
+
+        proxied = Response(content=response.content, status_code=response.status_code)
+        # Заголовки как есть, включая повторяющиеся set-cookie
+        proxied.raw_headers.extend(
+            (name, value)
+            for name, value in response.headers.raw
+            if name.lower().decode("latin-1") not in _SKIPPED_RESPONSE_HEADERS
+        )
+        return proxied
+
+    @staticmethod
+    def _error_detail(response: httpx.Response, default: str):
+        """detail из ответа сервиса с ошибкой"""
+        if "application/json" not in response.headers.get("content-type", ""):
+            return response.text or default
+        try:
+            error_data = response.json()
+        except ValueError:
+            return default
+        if isinstance(error_data, dict):
+            return error_data.get("detail", default)
+        return error_data
 
     async def health_check(self, service_name: str) -> bool:
         """Проверка здоровья сервиса"""
@@ -0,0 +1,76 @@
+"""
+Проекция JSON-ответов по параметру ?fields= (sparse fieldsets)
+
+`fields=id,name,owner.name,photos.url` оставляет в ответе только перечисленные
+поля; точка задаёт вложенный путь. Списки проецируются поэлементно, поэтому
+один набор полей подходит и для объекта, и для списка объектов, в том числе
+вложенного в конверт (`items.id,total`). Отсутствующие в ответе поля пропускаются.
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+FIELD_NAME = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+# Дерево полей: имя -> поддерево, None — поле целиком
+FieldTree = Dict[str, Optional["FieldTree"]]
+
+
+class InvalidFields(ValueError):
+    """Некорректное значение параметра fields"""
+
+
+def parse_fields(value: Optional[str]) -> Optional[FieldTree]:
+    """Дерево полей из значения ?fields= (None — проекция не запрошена)"""
+    if not value:
+        return None
+
+    paths = [path.strip() for path in value.split(",") if path.strip()]
+    if not paths:
+        return None
+    if len(paths) > settings.fields_max_paths:
+        raise InvalidFields(f"Too many fields: at most {settings.fields_max_paths} allowed")
+
+    tree: FieldTree = {}
+    for path in paths:
+        parts = path.split(".")
+        if len(parts) > settings.fields_max_depth or not all(FIELD_NAME.match(part) for part in parts):
+            raise InvalidFields(f"Invalid field path: {path}")
+
+        node = tree
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                # Поле уже запрошено целиком
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+
+    return tree
+
+
+def project(data: Any, tree: FieldTree) -> Any:
+    """Значение, сокращённое до полей дерева"""
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    result = {}
+    for name, subtree in tree.items():
+        if name in data:
+            value = data[name]
+            result[name] = value if subtree is None else project(value, subtree)
+    return result
+
+
+def project_body(body: bytes, tree: FieldTree) -> bytes:
+    """Проекция JSON-тела ответа; не-JSON тело возвращается без изменений"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    return json.dumps(project(data, tree), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
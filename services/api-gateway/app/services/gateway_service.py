@@ -6,17 +6,67 @@ import asyncio
 import json
 import logging
 import time
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
 
 import httpx
-from fastapi import Request, Response
+import websockets
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from websockets.exceptions import InvalidStatusCode
 
 from app.config import settings
-from app.database import redis_client
+from app.services.circuit_breaker import CircuitBreakerOpen, CircuitBreakerRegistry
+from app.services.concurrency_limiter import LoadShed, build_concurrency_limiters
+from app.services.field_projection import FieldTree, InvalidFields, parse_fields, project_body
+from app.services.load_balancer import Endpoint, LoadBalancer, build_load_balancers
+from app.services.response_cache import ResponseCache
+from app.services.routing_config import RoutingConfigDocument, RoutingConfigSource
+from app.services.routing_table import (
+    RouteMatch,
+    RoutingTable,
+    get_routing_table,
+    install_routing_table,
+    match_request,
+)
+from app.services.single_flight import SingleFlight
+from app.services.stats_aggregator import RouteStatsAggregator
+from app.services.upstream_pool import UpstreamPool
 
 logger = logging.getLogger(__name__)
 
+# Hop-by-hop заголовки не передаются через прокси (RFC 7230, 6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Статусы сервиса, означающие перегрузку (снижают адаптивный лимит)
+OVERLOAD_STATUS_CODES = {429, 503, 504}
+
+# Заголовки тела исходного запроса, не применимые к порождённым им подзапросам
+BODY_HEADERS = {"content-length", "content-type", "content-encoding"}
+
+
+class RequestBodyTooLarge(Exception):
+    """Тело запроса превышает settings.max_request_size"""
+
+
+def decode_response_body(body: bytes) -> Any:
+    """Тело ответа сервиса как JSON, иначе как текст"""
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", errors="replace")
+
 
 class GatewayService:
     """Основной сервис API Gateway"""
@@ -24,8 +74,16 @@ class GatewayService:
     def __init__(self):
         self.service_registry = {}
         self.route_registry = {}
-        self.circuit_breakers = {}
-        self.load_balancers = {}
+        self.circuit_breakers = CircuitBreakerRegistry()
+        self.load_balancers = build_load_balancers()
+        self.concurrency_limiters = build_concurrency_limiters()
+        self.upstream_pool = UpstreamPool()
+        self.response_cache = ResponseCache()
+        self.route_stats = RouteStatsAggregator()
+        self.single_flight = SingleFlight()
+        self.config_source = RoutingConfigSource()
+        self.config_applied_at: Optional[float] = None
+        self._config_lock = asyncio.Lock()
         self._initialize_registries()
 
     def _initialize_registries(self):
@@ -34,9 +92,7 @@ class GatewayService:
             name: {
                 "config": config,
                 "status": "unknown",
-                "last_health_check": None,
-                "failure_count": 0,
-                "circuit_breaker_state": "closed"
+                "last_health_check": None
             }
             for name, config in settings.services.items()
         }
@@ -53,78 +109,462 @@ class GatewayService:
         method: str = None
     ) -> Dict[str, Any]:
         """Маршрутизация запроса к сервису"""
-        try:
-            method = method or request.method
-
-            # Получение конфигурации сервиса
-            service_config = self.service_registry.get(service_name)
-            if not service_config:
-                raise ValueError(f"Service {service_name} not found")
-
-            if not service_config["config"].enabled:
-                raise ValueError(f"Service {service_name} is disabled")
-
-            # Проверка circuit breaker
-            if self._is_circuit_breaker_open(service_name):
-                raise ValueError(f"Circuit breaker is open for service {service_name}")
-
-            # Формирование URL сервиса
-            service_url = service_config["config"].url
-            full_url = f"{service_url}{path}"
-
-            # Подготовка заголовков
-            headers = dict(request.headers)
-            headers.pop("host", None)  # Удаляем оригинальный host
-
-            # Инъекция идентификатора пользователя из middleware
-            inject = getattr(request.state, 'inject_user_headers', None)
-            if inject and isinstance(inject, dict):
-                headers.update(inject)
-
-            # Подготовка тела запроса
-            body = None
-            if method in ["POST", "PUT", "PATCH"]:
-                body = await request.body()
-
-            # Выполнение запроса
-            start_time = time.time()
-
-            async with httpx.AsyncClient(timeout=service_config["config"].timeout) as client:
-                response = await client.request(
-                    method=method,
-                    url=full_url,
-                    headers=headers,
-                    params=request.query_params,
-                    content=body
+        method = method or request.method
+        self._check_content_length(request)
+        fields = self.get_fields(request)
+        route_match = match_request(request)
+        priority = route_match.priority if route_match else None
+
+        # Одинаковые GET в полёте делят один запрос к сервису (ключ как у кэша ответов)
+        if method == "GET" and self.should_coalesce(request, route_match):
+            result = await self.single_flight.do(
+                self.response_cache.build_key(request, service_name),
+                lambda: self.forward_request(
+                    service_name,
+                    path,
+                    method,
+                    headers=self.build_upstream_headers(request),
+                    params=self.upstream_params(request),
+                    priority=priority
                 )
+            )
+            return self._project_result(result, fields)
+
+        # Подготовка тела запроса
+        body = None
+        if method in ["POST", "PUT", "PATCH"]:
+            body = await request.body()
+
+        result = await self.forward_request(
+            service_name,
+            path,
+            method,
+            headers=self.build_upstream_headers(request),
+            params=self.upstream_params(request),
+            content=body,
+            priority=priority
+        )
+        return self._project_result(result, fields)
+
+    def should_coalesce(self, request: Request, route_match: Optional[RouteMatch]) -> bool:
+        """GET маршрута с coalesce, если клиент не запросил свежий ответ явно"""
+        if request.method != "GET" or route_match is None or not route_match.coalesce:
+            return False
 
-                response_time = time.time() - start_time
+        cache_control = request.headers.get("cache-control", "").lower()
+        return "no-store" not in cache_control and "no-cache" not in cache_control
 
-                # Обновление статистики
-                await self._update_route_stats(
-                    path, service_name, method, response.status_code, response_time
-                )
+    def should_buffer(self, request: Request, route_match: Optional[RouteMatch]) -> bool:
+        """Нужен ли буферизованный ответ: single-flight или проекция полей"""
+        return self.should_coalesce(request, route_match) or settings.fields_param in request.query_params
 
-                return {
-                    "status_code": response.status_code,
-                    "headers": dict(response.headers),
-                    "body": response.text,
-                    "response_time": response_time
-                }
+    def get_fields(self, request: Request) -> Optional[FieldTree]:
+        """Запрошенная проекция ответа (?fields=); 400 при некорректном значении"""
+        try:
+            return parse_fields(request.query_params.get(settings.fields_param))
+        except InvalidFields as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def upstream_params(self, request: Request) -> List[Tuple[str, str]]:
+        """Query-параметры для сервиса: параметр проекции обрабатывает шлюз"""
+        return [
+            (name, value)
+            for name, value in request.query_params.multi_items()
+            if name != settings.fields_param
+        ]
+
+    def _project_result(self, result: Dict[str, Any], fields: Optional[FieldTree]) -> Dict[str, Any]:
+        """Проекция успешного JSON-ответа сервиса (исходный результат не изменяется)"""
+        if fields is None or result["status_code"] != 200:
+            return result
+        if "json" not in result["headers"].get("content-type", ""):
+            return result
+
+        headers = {name: value for name, value in result["headers"].items() if name != "content-length"}
+        return {**result, "headers": headers, "body": project_body(result["body"], fields)}
+
+    async def forward_request(
+        self,
+        service_name: str,
+        path: str,
+        method: str = "GET",
+        headers: Optional[Dict[str, str]] = None,
+        params: Any = None,
+        content: Optional[bytes] = None,
+        priority: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Отправка запроса к сервису через общий пул соединений"""
+        self._get_available_service(service_name)
+        probe, endpoint = await self._acquire_upstream(service_name, priority)
+        full_url = f"{endpoint.url}{path}"
+
+        # Выполнение запроса
+        start_time = time.time()
+
+        try:
+            response = await self.upstream_pool.request(
+                service_name,
+                method,
+                full_url,
+                headers=headers,
+                params=params,
+                content=content
+            )
 
         except httpx.TimeoutException:
-            await self._handle_service_failure(service_name, "timeout")
+            self._handle_service_failure(service_name, "timeout", time.time() - start_time, probe, endpoint)
             raise ValueError(f"Service {service_name} timeout")
 
         except httpx.ConnectError:
-            await self._handle_service_failure(service_name, "connection_error")
+            self._handle_service_failure(service_name, "connection_error", time.time() - start_time, probe, endpoint)
             raise ValueError(f"Service {service_name} connection error")
 
+        except asyncio.CancelledError:
+            self._release_upstream(service_name, probe, endpoint)
+            raise
+
         except Exception as e:
             logger.error(f"Error routing request to {service_name}: {e}")
-            await self._handle_service_failure(service_name, "error")
+            self._handle_service_failure(service_name, "error", time.time() - start_time, probe, endpoint)
+            raise
+
+        response_time = time.time() - start_time
+        self._handle_service_response(service_name, response.status_code, response_time, probe, endpoint)
+
+        # Обновление статистики
+        self._update_route_stats(
+            path, service_name, method, response.status_code, response_time
+        )
+
+        return {
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "body": response.content,
+            "response_time": response_time
+        }
+
+    async def cached_request(
+        self,
+        request: Request,
+        service_name: str,
+        path: str,
+        cache_ttl: int
+    ) -> Response:
+        """GET через кэш ответов: ETag, If-None-Match → 304, учёт Cache-Control сервиса"""
+        cache_key = self.response_cache.build_key(request, service_name)
+
+        entry = await self.response_cache.get(cache_key)
+        if entry is not None:
+            return self._cached_response(request, entry, "HIT")
+
+        result = await self.route_request(request, service_name, path, "GET")
+
+        status_code = result["status_code"]
+        upstream_headers = result["headers"]
+        body = result["body"]
+
+        ttl = self.response_cache.resolve_ttl(cache_ttl, upstream_headers) if status_code == 200 else None
+        if not ttl:
+            return Response(
+                content=body,
+                status_code=status_code,
+                media_type=upstream_headers.get("content-type")
+            )
+
+        entry = self.response_cache.build_entry(status_code, upstream_headers, body, ttl)
+        await self.response_cache.set(cache_key, entry)
+        return self._cached_response(request, entry, "MISS")
+
+    def _cached_response(self, request: Request, entry, cache_status: str) -> Response:
+        """Ответ из записи кэша (304, если клиент уже имеет эту версию)"""
+        headers = dict(entry.headers)
+        headers["X-Cache"] = cache_status
+
+        if self.response_cache.is_not_modified(request, entry.etag):
+            headers.pop("content-type", None)
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=entry.body, status_code=entry.status_code, headers=headers)
+
+    async def stream_request(
+        self,
+        request: Request,
+        service_name: str,
+        path: str,
+        method: str = None
+    ) -> StreamingResponse:
+        """Потоковое проксирование: тела запроса и ответа передаются чанками без буферизации"""
+        method = method or request.method
+        self._check_content_length(request)
+
+        self._get_available_service(service_name)
+
+        headers = {
+            name: value
+            for name, value in self.build_upstream_headers(request).items()
+            if name.lower() not in HOP_BY_HOP_HEADERS
+        }
+
+        body = None
+        if "content-length" in request.headers or "transfer-encoding" in request.headers:
+            body = self._iter_request_body(request)
+
+        route_match = match_request(request)
+        probe, endpoint = await self._acquire_upstream(service_name, route_match.priority if route_match else None)
+        full_url = f"{endpoint.url}{path}"
+        start_time = time.time()
+
+        try:
+            upstream = await self.upstream_pool.stream(
+                service_name,
+                method,
+                full_url,
+                headers=headers,
+                params=self.upstream_params(request),
+                content=body
+            )
+
+        except RequestBodyTooLarge:
+            # Ошибка клиента, а не сервиса
+            self._release_upstream(service_name, probe, endpoint)
+            raise HTTPException(status_code=413, detail="Request body too large")
+
+        except httpx.TimeoutException:
+            self._handle_service_failure(service_name, "timeout", time.time() - start_time, probe, endpoint)
+            raise ValueError(f"Service {service_name} timeout")
+
+        except httpx.ConnectError:
+            self._handle_service_failure(service_name, "connection_error", time.time() - start_time, probe, endpoint)
+            raise ValueError(f"Service {service_name} connection error")
+
+        except asyncio.CancelledError:
+            self._release_upstream(service_name, probe, endpoint)
+            raise
+
+        except Exception as e:
+            logger.error(f"Error streaming request to {service_name}: {e}")
+            self._handle_service_failure(service_name, "error", time.time() - start_time, probe, endpoint)
+            raise
+
+        # Время до получения заголовков ответа: балансировщик, circuit breaker и статистика
+        status_code = upstream.response.status_code
+        response_time = time.time() - start_time
+        self._handle_service_response(
+            service_name, status_code, response_time, probe, endpoint, release_concurrency=False
+        )
+        self._update_route_stats(
+            path, service_name, method, status_code, response_time
+        )
+
+        # Слот адаптивного лимита занят до конца передачи тела, замер — полное время ответа
+        upstream.add_close_callback(lambda: self._release_concurrency(
+            service_name, time.time() - start_time, status_code in OVERLOAD_STATUS_CODES
+        ))
+
+        response = StreamingResponse(
+            self._iter_upstream_body(upstream),
+            status_code=upstream.response.status_code,
+            background=BackgroundTask(upstream.aclose)
+        )
+        # Сохраняем заголовки как есть (включая повторяющиеся set-cookie и content-encoding)
+        response.raw_headers = [
+            (name, value)
+            for name, value in upstream.response.headers.raw
+            if name.lower().decode("latin-1") not in HOP_BY_HOP_HEADERS
+        ]
+        return response
+
+    async def connect_websocket(
+        self,
+        service_name: str,
+        path: str,
+        query_string: str = "",
+        headers: Optional[List[Tuple[str, str]]] = None,
+        subprotocols: Optional[List[str]] = None
+    ):
+        """WebSocket-соединение с экземпляром сервиса
+
+        Рукопожатие учитывается балансировщиком и circuit breaker как обычный
+        запрос; открытое соединение в число запросов в полёте не входит.
+        Отказ сервиса в рукопожатии (InvalidStatusCode) пробрасывается как есть.
+        """
+        self._get_available_service(service_name)
+        probe = self._acquire_circuit_breaker(service_name)
+        try:
+            balancer, endpoint = self._select_endpoint(service_name)
+        except BaseException:
+            self.circuit_breakers.get(service_name).release(probe)
             raise
 
+        # http://host -> ws://host, https://host -> wss://host
+        url = f"ws{endpoint.url[len('http'):]}{path}"
+        if query_string:
+            url = f"{url}?{query_string}"
+        start_time = time.time()
+
+        try:
+            upstream = await websockets.connect(
+                url,
+                extra_headers=headers,
+                subprotocols=subprotocols or None,
+                open_timeout=settings.websocket_connect_timeout,
+                ping_interval=settings.websocket_ping_interval,
+                max_size=settings.websocket_max_message_size,
+                max_queue=settings.websocket_max_queue
+            )
+
+        except asyncio.CancelledError:
+            self._release_upstream_endpoint(service_name, probe, endpoint)
+            raise
+
+        except InvalidStatusCode as e:
+            failed = e.status_code >= 500
+            response_time = time.time() - start_time
+            balancer.on_request_end(endpoint, response_time, failed)
+            self.circuit_breakers.get(service_name).record(failed, response_time, probe)
+            raise
+
+        except Exception as e:
+            logger.error(f"Error connecting websocket to {service_name}: {e}")
+            response_time = time.time() - start_time
+            balancer.on_request_end(endpoint, response_time, failed=True)
+            self.circuit_breakers.get(service_name).record(True, response_time, probe)
+            raise ValueError(f"Service {service_name} websocket connection error")
+
+        response_time = time.time() - start_time
+        balancer.on_request_end(endpoint, response_time, failed=False)
+        self.circuit_breakers.get(service_name).record(False, response_time, probe)
+        return upstream
+
+    async def _iter_request_body(self, request: Request):
+        """Чтение тела запроса чанками с контролем settings.max_request_size"""
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > settings.max_request_size:
+                raise RequestBodyTooLarge()
+            if chunk:
+                yield chunk
+
+    async def _iter_upstream_body(self, upstream):
+        """Передача тела ответа сервиса клиенту; поток закрывается при любом исходе"""
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+
+    def _check_content_length(self, request: Request):
+        """Ранний отказ по заголовку Content-Length, не дожидаясь чтения тела"""
+        content_length = request.headers.get("content-length")
+        if not content_length:
+            return
+
+        try:
+            too_large = int(content_length) > settings.max_request_size
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+
+        if too_large:
+            raise HTTPException(status_code=413, detail="Request body too large")
+
+    def _get_available_service(self, service_name: str) -> Dict[str, Any]:
+        """Проверка, что сервис зарегистрирован и включён"""
+        service_config = self.service_registry.get(service_name)
+        if not service_config:
+            raise ValueError(f"Service {service_name} not found")
+
+        if not service_config["config"].enabled:
+            raise ValueError(f"Service {service_name} is disabled")
+
+        return service_config
+
+    def _select_endpoint(self, service_name: str) -> Tuple[LoadBalancer, Endpoint]:
+        """Экземпляр сервиса для запроса (учитывается как запрос в полёте)"""
+        balancer = self.load_balancers.get(service_name)
+        if balancer is None:
+            # Сервис удалён перезагрузкой конфигурации, пока запрос ждал слот
+            raise ValueError(f"Service {service_name} not found")
+        endpoint = balancer.select()
+        balancer.on_request_start(endpoint)
+        return balancer, endpoint
+
+    async def _acquire_upstream(self, service_name: str, priority: Optional[int]) -> Tuple[bool, Endpoint]:
+        """Проба circuit breaker, слот адаптивного лимита и экземпляр сервиса.
+
+        Если следующий шаг не удался (сервис удалён, пока запрос ждал в очереди),
+        уже полученные проба и слот возвращаются.
+        """
+        probe = self._acquire_circuit_breaker(service_name)
+        await self._acquire_concurrency(service_name, priority, probe)
+        try:
+            _, endpoint = self._select_endpoint(service_name)
+        except BaseException:
+            self._release_concurrency(service_name)
+            self.circuit_breakers.get(service_name).release(probe)
+            raise
+        return probe, endpoint
+
+    def _acquire_circuit_breaker(self, service_name: str) -> bool:
+        """Разрешение circuit breaker на вызов; True — пробный вызов в half-open"""
+        try:
+            return self.circuit_breakers.get(service_name).acquire()
+        except CircuitBreakerOpen:
+            raise ValueError(f"Circuit breaker is open for service {service_name}")
+
+    async def _acquire_concurrency(self, service_name: str, priority: Optional[int], probe: bool):
+        """Слот адаптивного лимита сервиса; 503 с Retry-After, если запрос отброшен"""
+        limiter = self.concurrency_limiters.get(service_name)
+        if limiter is None or not settings.adaptive_concurrency_enabled:
+            return
+
+        if priority is None:
+            priority = self.service_registry[service_name]["config"].priority
+
+        try:
+            await limiter.acquire(priority)
+        except LoadShed as e:
+            self.circuit_breakers.get(service_name).release(probe)
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        except asyncio.CancelledError:
+            self.circuit_breakers.get(service_name).release(probe)
+            raise
+
+    def _release_concurrency(
+        self,
+        service_name: str,
+        response_time: Optional[float] = None,
+        overloaded: bool = False
+    ):
+        """Возврат слота адаптивного лимита (с замером — для подстройки лимита)"""
+        limiter = self.concurrency_limiters.get(service_name)
+        if limiter is not None and settings.adaptive_concurrency_enabled:
+            limiter.release(response_time, overloaded)
+
+    def build_upstream_headers(self, request: Request) -> Dict[str, str]:
+        """Подготовка заголовков для проксирования"""
+        headers = dict(request.headers)
+        headers.pop("host", None)  # Удаляем оригинальный host
+
+        # Инъекция идентификатора пользователя из middleware
+        inject = getattr(request.state, 'inject_user_headers', None)
+        if inject and isinstance(inject, dict):
+            headers.update(inject)
+
+        return headers
+
+    def build_subrequest_headers(self, request: Request) -> Dict[str, str]:
+        """Заголовки для подзапросов композиции и пакетного API (без hop-by-hop и заголовков тела)"""
+        return {
+            name: value
+            for name, value in self.build_upstream_headers(request).items()
+            if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() not in BODY_HEADERS
+        }
+
     async def get_service_registry(self) -> Dict[str, Any]:
         """Получение реестра сервисов"""
         try:
@@ -133,11 +573,12 @@ class GatewayService:
                 registry[name] = {
                     "name": service_data["config"].name,
                     "url": service_data["config"].url,
+                    "endpoints": self.load_balancers[name].get_stats() if name in self.load_balancers else [],
                     "enabled": service_data["config"].enabled,
                     "status": service_data["status"],
                     "last_health_check": service_data["last_health_check"],
-                    "circuit_breaker_state": service_data["circuit_breaker_state"],
-                    "failure_count": service_data["failure_count"]
+                    "circuit_breaker_state": self.circuit_breakers.get(name).state,
+                    "failure_count": self.circuit_breakers.get(name).get_stats()["window_failures"]
                 }
             return registry
 
@@ -155,7 +596,9 @@ class GatewayService:
                     "methods": config.methods,
                     "auth_required": config.auth_required,
                     "rate_limit": config.rate_limit,
-                    "cache_ttl": config.cache_ttl
+                    "cache_ttl": config.cache_ttl,
+                    "coalesce": config.coalesce,
+                    "priority": config.priority
                 }
                 for path, config in self.route_registry.items()
             }
@@ -165,30 +608,94 @@ class GatewayService:
             return {}
 
     async def start_route_updates(self):
-        """Запуск обновления конфигурации маршрутов"""
-        try:
-            while True:
-                try:
-                    await self._update_route_configurations()
-                    await asyncio.sleep(300)  # Обновление каждые 5 минут
-                except Exception as e:
-                    logger.error(f"Error updating route configurations: {e}")
-                    await asyncio.sleep(60)
-
-        except Exception as e:
-            logger.error(f"Error in route update loop: {e}")
+        """Отслеживание источника конфигурации маршрутизации (файл или Redis)"""
+        if not self.config_source.enabled:
+            return
+
+        logger.info(f"Watching routing config ({self.config_source.kind})")
+        while True:
+            try:
+                await self._update_route_configurations()
+            except Exception as e:
+                logger.error(f"Error updating route configurations: {e}")
+            await asyncio.sleep(settings.routing_config_poll_interval)
+
+    async def _update_route_configurations(self) -> bool:
+        """Применение новой версии конфигурации из источника, если она появилась"""
+        document = await self.config_source.fetch()
+        if document is None:
+            return False
+        return await self.apply_routing_config(document)
+
+    async def apply_routing_config(self, document: RoutingConfigDocument) -> bool:
+        """Применение проверенной конфигурации: компиляция вне обработки запросов и атомарная замена
+
+        Документ не новее активной таблицы игнорируется. Запросы, уже получившие
+        маршрут, завершаются на прежних объектах.
+        """
+        async with self._config_lock:
+            active_version = get_routing_table().version
+            if document.version <= active_version:
+                logger.info(f"Routing config v{document.version} is not newer than active v{active_version}")
+                return False
 
-    async def _update_route_configurations(self):
-        """Обновление конфигураций маршрутов"""
-        try:
-            # Здесь можно реализовать динамическую загрузку конфигурации
-            # из внешних источников (Consul, etcd, database, etc.)
-            logger.debug("Route configurations updated")
+            table = await asyncio.to_thread(
+                RoutingTable.compile,
+                document.routes,
+                document.services,
+                document.service_path_aliases,
+                document.version
+            )
+
+            # Дальше без await: запросы не увидят частично применённую конфигурацию
+            settings.services = document.services
+            settings.routes = document.routes
+            settings.service_path_aliases = document.service_path_aliases
+            self._sync_services(document.services)
+            install_routing_table(table)
+            self.config_applied_at = time.time()
+            return True
+
+    def _sync_services(self, services: Dict[str, Any]):
+        """Реестры, пулы, балансировщики и лимиты под новый набор сервисов"""
+        previous_registry = self.service_registry
+        self._initialize_registries()
+        for name, service_data in self.service_registry.items():
+            previous = previous_registry.get(name)
+            if previous is not None:
+                service_data["status"] = previous["status"]
+                service_data["last_health_check"] = previous["last_health_check"]
+
+        self.upstream_pool.sync_services(services)
+
+        # Балансировщики с прежним набором экземпляров сохраняют накопленную статистику.
+        # Словарь обновляется на месте: на него ссылается цикл health check
+        load_balancers = build_load_balancers(services)
+        for name, balancer in load_balancers.items():
+            current = self.load_balancers.get(name)
+            if current is not None and [e.url for e in current.endpoints] == [e.url for e in balancer.endpoints]:
+                load_balancers[name] = current
+        self.load_balancers.clear()
+        self.load_balancers.update(load_balancers)
+
+        # Подобранные лимиты сохраняются для оставшихся сервисов
+        self.concurrency_limiters = {
+            name: self.concurrency_limiters.get(name, limiter)
+            for name, limiter in build_concurrency_limiters(services).items()
+        }
 
-        except Exception as e:
-            logger.error(f"Error updating route configurations: {e}")
+    def get_config_info(self) -> Dict[str, Any]:
+        """Активная версия конфигурации маршрутизации"""
+        table = get_routing_table()
+        return {
+            "version": table.version,
+            "source": self.config_source.kind or "settings",
+            "applied_at": self.config_applied_at,
+            "routes": len(table.get_routes()),
+            "services": len(self.service_registry)
+        }
 
-    async def _update_route_stats(
+    def _update_route_stats(
         self,
         path: str,
         service_name: str,
@@ -196,113 +703,100 @@ class GatewayService:
         status_code: int,
         response_time: float
     ):
-        """Обновление статистики маршрутов (в Redis, если доступен)"""
+        """Обновление статистики маршрутов (в памяти, сброс в Redis фоновой задачей)"""
         try:
-            if not redis_client:
-                return
-
-            # Ключ для статистики
-            stats_key = f"route_stats:{path}:{service_name}:{method}"
-
-            # Получение текущей статистики
-            current_stats = await redis_client.get(stats_key)
-            if current_stats:
-                stats = json.loads(current_stats)
-            else:
-                stats = {
-                    "total_requests": 0,
-                    "successful_requests": 0,
-                    "failed_requests": 0,
-                    "average_response_time": 0,
-                    "min_response_time": float('inf'),
-                    "max_response_time": 0,
-                    "status_codes": {}
-                }
-
-            # Обновление статистики
-            stats["total_requests"] += 1
-
-            if 200 <= status_code < 400:
-                stats["successful_requests"] += 1
-            else:
-                stats["failed_requests"] += 1
-
-            # Обновление временных метрик
-            if stats["average_response_time"] == 0:
-                stats["average_response_time"] = response_time
-            else:
-                stats["average_response_time"] = (
-                    stats["average_response_time"] * (stats["total_requests"] - 1) + response_time
-                ) / stats["total_requests"]
-
-            stats["min_response_time"] = min(stats["min_response_time"], response_time)
-            stats["max_response_time"] = max(stats["max_response_time"], response_time)
-
-            # Обновление статистики по статусам
-            status_str = str(status_code)
-            stats["status_codes"][status_str] = stats["status_codes"].get(status_str, 0) + 1
-
-            # Сохранение обновленной статистики
-            await redis_client.setex(stats_key, 86400, json.dumps(stats))  # 24 часа
+            self.route_stats.record(path, service_name, method, status_code, response_time)
 
         except Exception as e:
             logger.error(f"Error updating route stats: {e}")
 
-    async def _handle_service_failure(self, service_name: str, failure_type: str):
+    def _handle_service_failure(
+        self,
+        service_name: str,
+        failure_type: str,
+        response_time: float,
+        probe: bool,
+        endpoint: Endpoint
+    ):
         """Обработка отказа сервиса"""
         try:
-            service_data = self.service_registry.get(service_name)
-            if not service_data:
+            logger.debug(f"Service {service_name} failure at {endpoint.url}: {failure_type}")
+            # Слоты освобождаются, даже если сервис уже удалён из конфигурации
+            self._release_concurrency(service_name, response_time, overloaded=True)
+            self.circuit_breakers.get(service_name).record(True, response_time, probe)
+            # Удалённый сервис: его балансировщик и экземпляры уже не используются
+            balancer = self.load_balancers.get(service_name)
+            if balancer is None:
                 return
+            balancer.on_request_end(endpoint, response_time, failed=True)
 
-            service_data["failure_count"] += 1
-            service_data["status"] = "unhealthy"
-
-            # Проверка необходимости открытия circuit breaker
-            if service_data["failure_count"] >= settings.circuit_breaker_failure_threshold:
-                service_data["circuit_breaker_state"] = "open"
-                service_data["last_circuit_breaker_open"] = datetime.utcnow()
-                logger.warning(f"Circuit breaker opened for service {service_name}")
+            # Сервис недоступен, только если не осталось доступных экземпляров
+            service_data = self.service_registry.get(service_name)
+            if service_data and not balancer.has_available_endpoints():
+                service_data["status"] = "unhealthy"
 
         except Exception as e:
             logger.error(f"Error handling service failure: {e}")
 
-    def _is_circuit_breaker_open(self, service_name: str) -> bool:
-        """Проверка состояния circuit breaker"""
-        try:
-            service_data = self.service_registry.get(service_name)
-            if not service_data:
-                return False
+    def _handle_service_response(
+        self,
+        service_name: str,
+        status_code: int,
+        response_time: float,
+        probe: bool,
+        endpoint: Endpoint,
+        release_concurrency: bool = True
+    ):
+        """Учёт ответа сервиса в балансировщике и circuit breaker (5xx считаются отказом).
 
-            if service_data["circuit_breaker_state"] == "open":
-                # Проверка возможности закрытия circuit breaker
-                last_open = service_data.get("last_circuit_breaker_open")
-                if last_open:
-                    elapsed = (datetime.utcnow() - last_open).total_seconds()
-                    if elapsed >= settings.circuit_breaker_recovery_timeout:
-                        service_data["circuit_breaker_state"] = "half_open"
-                        logger.info(f"Circuit breaker half-open for service {service_name}")
+        При `release_concurrency=False` слот адаптивного лимита возвращает вызывающий
+        (потоковый ответ — после передачи тела).
+        """
+        try:
+            if release_concurrency:
+                self._release_concurrency(service_name, response_time, status_code in OVERLOAD_STATUS_CODES)
+            failed = status_code >= 500
+            self.circuit_breakers.get(service_name).record(failed, response_time, probe)
+            balancer = self.load_balancers.get(service_name)
+            if balancer is not None:
+                balancer.on_request_end(endpoint, response_time, failed)
 
-                return service_data["circuit_breaker_state"] == "open"
+        except Exception as e:
+            logger.error(f"Error recording service response: {e}")
 
-            return False
+    def _release_upstream(self, service_name: str, probe: bool, endpoint: Endpoint):
+        """Освобождение пробы circuit breaker, слотов лимита и экземпляра без учёта результата"""
+        self._release_concurrency(service_name)
+        self._release_upstream_endpoint(service_name, probe, endpoint)
 
-        except Exception as e:
-            logger.error(f"Error checking circuit breaker: {e}")
-            return False
+    def _release_upstream_endpoint(self, service_name: str, probe: bool, endpoint: Endpoint):
+        """Освобождение пробы circuit breaker и слота экземпляра"""
+        self.circuit_breakers.get(service_name).release(probe)
+        balancer = self.load_balancers.get(service_name)
+        if balancer is not None:
+            balancer.release(endpoint)
 
     async def close_circuit_breaker(self, service_name: str):
-        """Закрытие circuit breaker"""
+        """Закрытие circuit breaker (на всех репликах)"""
         try:
-            service_data = self.service_registry.get(service_name)
-            if service_data:
-                service_data["circuit_breaker_state"] = "closed"
-                service_data["failure_count"] = 0
+            if service_name in self.service_registry:
+                self.circuit_breakers.get(service_name).force_close()
                 logger.info(f"Circuit breaker closed for service {service_name}")
 
         except Exception as e:
             logger.error(f"Error closing circuit breaker: {e}")
 
+    def get_circuit_breaker_stats(self) -> Dict[str, Any]:
+        """Состояние circuit breaker'ов сервисов"""
+        return {
+            name: self.circuit_breakers.get(name).get_stats()
+            for name in self.service_registry
+        }
+
+    def get_concurrency_stats(self) -> Dict[str, Any]:
+        """Адаптивные лимиты и очереди сервисов"""
+        return {name: limiter.get_stats() for name, limiter in self.concurrency_limiters.items()}
+
     async def get_gateway_stats(self) -> Dict[str, Any]:
         """Получение статистики API Gateway"""
         try:
@@ -315,21 +809,16 @@ class GatewayService:
                 "routes_stats": {}
             }
 
-            # Чтение данных из Redis, если доступен
-            if redis_client:
-                try:
-                    keys = await redis_client.keys("route_stats:*")
-                    for key in keys:
-                        route_stats = await redis_client.get(key)
-                        if not route_stats:
-                            continue
-                        route_data = json.loads(route_stats)
-                        stats["total_requests"] += route_data.get("total_requests", 0)
-                        stats["successful_requests"] += route_data.get("successful_requests", 0)
-                        stats["failed_requests"] += route_data.get("failed_requests", 0)
-                        stats["routes_stats"][key] = route_data
-                except Exception as e:
-                    logger.error(f"Error reading route stats from redis: {e}")
+            # Чтение агрегированной статистики из Redis (один HGETALL)
+            try:
+                routes_stats = await self.route_stats.read_totals()
+                for route_key, route_data in routes_stats.items():
+                    stats["total_requests"] += route_data["total_requests"]
+                    stats["successful_requests"] += route_data["successful_requests"]
+                    stats["failed_requests"] += route_data["failed_requests"]
+                stats["routes_stats"] = routes_stats
+            except Exception as e:
+                logger.error(f"Error reading route stats from redis: {e}")
 
             # Статус сервисов
             for name, service_data in self.service_registry.items():
@@ -341,6 +830,15 @@ class GatewayService:
             logger.error(f"Error getting gateway stats: {e}")
             return {}
 
+    async def get_route_stats_window(self, minutes: int) -> Dict[str, Any]:
+        """Статистика маршрутов за скользящее окно в минутах"""
+        try:
+            return await self.route_stats.read_window(minutes)
+
+        except Exception as e:
+            logger.error(f"Error reading route stats window: {e}")
+            return {}
+
     async def enable_service(self, service_name: str) -> bool:
         """Включение сервиса"""
         try:
@@ -371,15 +869,31 @@ class GatewayService:
             logger.error(f"Error disabling service {service_name}: {e}")
             return False
 
-    async def reload_configuration(self):
-        """Перезагрузка конфигурации"""
-        try:
-            logger.info("Reloading gateway configuration")
-            self._initialize_registries()
-            logger.info("Gateway configuration reloaded")
-
-        except Exception as e:
-            logger.error(f"Error reloading configuration: {e}")
+    async def reload_configuration(self) -> Dict[str, Any]:
+        """Перезагрузка конфигурации: из источника, а без него — из текущих настроек
+
+        Некорректный документ источника приводит к ValueError (ValidationError).
+        """
+        logger.info("Reloading gateway configuration")
+        if self.config_source.enabled:
+            self.config_source.reset()
+            await self._update_route_configurations()
+        else:
+            await self.apply_routing_config(RoutingConfigDocument(
+                version=get_routing_table().version + 1,
+                services=settings.services,
+                routes=settings.routes,
+                service_path_aliases=settings.service_path_aliases
+            ))
+
+        logger.info(f"Gateway configuration v{get_routing_table().version} active")
+        return self.get_config_info()
+
+    async def close(self):
+        """Освобождение ресурсов (статистика, пулы соединений к сервисам)"""
+        self.circuit_breakers.stop_sync()
+        await self.route_stats.stop_flushing()
+        await self.upstream_pool.aclose()
 
     async def get_service_health(self, service_name: str) -> Dict[str, Any]:
         """Получение здоровья сервиса"""
@@ -388,12 +902,13 @@ class GatewayService:
             if not service_data:
                 return {"status": "not_found"}
 
+            breaker_stats = self.circuit_breakers.get(service_name).get_stats()
             return {
                 "service_name": service_name,
                 "status": service_data["status"],
                 "last_health_check": service_data["last_health_check"],
-                "failure_count": service_data["failure_count"],
-                "circuit_breaker_state": service_data["circuit_breaker_state"],
+                "failure_count": breaker_stats["window_failures"],
+                "circuit_breaker_state": breaker_stats["state"],
                 "enabled": service_data["config"].enabled
             }
 
@@ -0,0 +1,180 @@
+"""
+Балансировка нагрузки между экземплярами сервиса
+
+Для каждого запроса выбираются два случайных доступных экземпляра и берётся
+тот, у кого меньше EWMA времени ответа с учётом запросов в полёте
+(power of two choices). Экземпляр исключается из выбора после
+`load_balancer_max_failures` отказов подряд или по результату health check и
+возвращается по истечении `load_balancer_ejection_time` либо после успешной
+проверки здоровья.
+"""
+
+import logging
+import random
+import time
+from typing import Dict, Any, List, Optional
+
+from prometheus_client import Gauge
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_HEALTHY = Gauge(
+    "gateway_upstream_endpoint_healthy",
+    "Доступность экземпляра сервиса для балансировки (1 - доступен)",
+    ["service", "endpoint"],
+)
+ENDPOINT_OUTSTANDING = Gauge(
+    "gateway_upstream_endpoint_outstanding_requests",
+    "Запросы в полёте к экземпляру сервиса",
+    ["service", "endpoint"],
+)
+
+
+class Endpoint:
+    """Экземпляр сервиса"""
+
+    __slots__ = (
+        "service_name",
+        "url",
+        "ewma_latency",
+        "outstanding",
+        "consecutive_failures",
+        "healthy",
+        "ejected_until",
+    )
+
+    def __init__(self, service_name: str, url: str):
+        self.service_name = service_name
+        self.url = url.rstrip("/")
+        self.ewma_latency = 0.0
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+
+    def is_available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+    def cost(self) -> float:
+        return self.ewma_latency * (self.outstanding + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ejected": self.ejected_until > time.monotonic(),
+            "ewma_latency": self.ewma_latency,
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures
+        }
+
+
+class LoadBalancer:
+    """Балансировщик экземпляров одного сервиса (P2C по EWMA и запросам в полёте)"""
+
+    def __init__(self, service_name: str, urls: List[str], failure_latency: float = 30.0):
+        self.service_name = service_name
+        self.endpoints = [Endpoint(service_name, url) for url in urls]
+        self._by_url = {endpoint.url: endpoint for endpoint in self.endpoints}
+        # Время ответа, с которым в EWMA учитывается отказ
+        self.failure_latency = failure_latency
+
+        for endpoint in self.endpoints:
+            self._export_health(endpoint)
+
+    def select(self) -> Endpoint:
+        """Выбор экземпляра для запроса"""
+        if len(self.endpoints) == 1:
+            return self.endpoints[0]
+
+        now = time.monotonic()
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.is_available(now)]
+        if not candidates:
+            # Все экземпляры исключены — лучше попытаться, чем отказать без запроса
+            candidates = self.endpoints
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        first, second = random.sample(candidates, 2)
+        if (first.cost(), first.outstanding) <= (second.cost(), second.outstanding):
+            return first
+        return second
+
+    def on_request_start(self, endpoint: Endpoint):
+        endpoint.outstanding += 1
+        ENDPOINT_OUTSTANDING.labels(self.service_name, endpoint.url).set(endpoint.outstanding)
+
+    def release(self, endpoint: Endpoint):
+        """Завершение запроса без учёта результата (например, отмена клиентом)"""
+        endpoint.outstanding = max(endpoint.outstanding - 1, 0)
+        ENDPOINT_OUTSTANDING.labels(self.service_name, endpoint.url).set(endpoint.outstanding)
+
+    def on_request_end(self, endpoint: Endpoint, response_time: float, failed: bool):
+        """Учёт завершения запроса: EWMA времени ответа и пассивное исключение"""
+        self.release(endpoint)
+
+        latency = max(response_time, self.failure_latency) if failed else response_time
+        alpha = settings.load_balancer_ewma_alpha
+        if endpoint.ewma_latency == 0.0:
+            endpoint.ewma_latency = latency
+        else:
+            endpoint.ewma_latency = alpha * latency + (1 - alpha) * endpoint.ewma_latency
+
+        if not failed:
+            endpoint.consecutive_failures = 0
+            return
+
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= settings.load_balancer_max_failures:
+            endpoint.ejected_until = time.monotonic() + settings.load_balancer_ejection_time
+            endpoint.consecutive_failures = 0
+            logger.warning(
+                f"Endpoint {endpoint.url} of {self.service_name} ejected "
+                f"for {settings.load_balancer_ejection_time}s"
+            )
+            self._export_health(endpoint)
+
+    def mark_health(self, url: str, healthy: bool):
+        """Результат health check экземпляра"""
+        endpoint = self._by_url.get(url.rstrip("/"))
+        if endpoint is None:
+            return
+
+        if healthy and (not endpoint.healthy or endpoint.ejected_until):
+            logger.info(f"Endpoint {endpoint.url} of {self.service_name} readmitted")
+            endpoint.ejected_until = 0.0
+            endpoint.consecutive_failures = 0
+        elif not healthy and endpoint.healthy:
+            logger.warning(f"Endpoint {endpoint.url} of {self.service_name} failed health check")
+
+        endpoint.healthy = healthy
+        self._export_health(endpoint)
+
+    def has_available_endpoints(self) -> bool:
+        now = time.monotonic()
+        return any(endpoint.is_available(now) for endpoint in self.endpoints)
+
+    def _export_health(self, endpoint: Endpoint):
+        ENDPOINT_HEALTHY.labels(self.service_name, endpoint.url).set(
+            1 if endpoint.is_available(time.monotonic()) else 0
+        )
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.to_dict() for endpoint in self.endpoints]
+
+
+def get_endpoint_urls(config) -> List[str]:
+    """Адреса экземпляров сервиса: список `urls`, иначе единственный `url`"""
+    return list(config.urls) if config.urls else [config.url]
+
+
+def build_load_balancers(services: Optional[Dict[str, Any]] = None) -> Dict[str, LoadBalancer]:
+    """Балансировщики для всех сервисов конфигурации"""
+    services = services if services is not None else settings.services
+    return {
+        name: LoadBalancer(name, get_endpoint_urls(config), failure_latency=config.timeout)
+        for name, config in services.items()
+    }
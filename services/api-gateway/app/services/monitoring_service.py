@@ -4,23 +4,87 @@
 
 import asyncio
 import logging
-import psutil
 import time
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 import httpx
 
 from app.config import settings
+from app.services.load_balancer import LoadBalancer, get_endpoint_urls
+from app.services.system_metrics import SystemMetricsSampler
 
 logger = logging.getLogger(__name__)
 
+# Порядок статусов от лучшего к худшему
+STATUS_PRIORITY = {"healthy": 0, "degraded": 1, "unhealthy": 2, "down": 3}
+
+
+class HealthHistory:
+    """Последние результаты проверок сервиса: частота смены статуса и тренд времени ответа"""
+
+    def __init__(self, size: int):
+        self._checks = deque(maxlen=size)
+
+    def add(self, status: str, response_time: Optional[float], checked_at: float):
+        self._checks.append((checked_at, status, response_time))
+
+    def summary(self) -> Dict[str, Any]:
+        checks = list(self._checks)
+        if not checks:
+            return {"checks": 0}
+
+        statuses = [status for _, status, _ in checks]
+        transitions = sum(1 for previous, current in zip(statuses, statuses[1:]) if previous != current)
+        latencies = [response_time for _, _, response_time in checks if response_time is not None]
+
+        return {
+            "checks": len(checks),
+            "window_seconds": checks[-1][0] - checks[0][0],
+            "current_status": statuses[-1],
+            "availability": statuses.count("healthy") / len(statuses),
+            "transitions": transitions,
+            "flapping": transitions >= settings.health_flapping_threshold,
+            "average_response_time": sum(latencies) / len(latencies) if latencies else None,
+            "latency_trend": self._latency_trend(latencies),
+            "history": [
+                {"timestamp": checked_at, "status": status, "response_time": response_time}
+                for checked_at, status, response_time in checks
+            ]
+        }
+
+    @staticmethod
+    def _latency_trend(latencies: List[float]) -> Dict[str, Any]:
+        """Наклон линейной регрессии времени ответа (секунд на проверку)"""
+        count = len(latencies)
+        if count < 3:
+            return {"direction": "unknown", "slope": None}
+
+        mean_x = (count - 1) / 2
+        mean_y = sum(latencies) / count
+        covariance = sum((index - mean_x) * (latency - mean_y) for index, latency in enumerate(latencies))
+        variance = sum((index - mean_x) ** 2 for index in range(count))
+        slope = covariance / variance
+
+        # Изменение меньше 1% от среднего за проверку считаем шумом
+        if mean_y and abs(slope) < mean_y * 0.01:
+            direction = "stable"
+        else:
+            direction = "rising" if slope > 0 else "falling"
+        return {"direction": direction, "slope": slope}
+
 
 class MonitoringService:
     """Сервис мониторинга"""
 
-    def __init__(self):
+    def __init__(self, load_balancers: Optional[Dict[str, LoadBalancer]] = None):
+        # Балансировщики GatewayService: результаты проверок исключают/возвращают экземпляры
+        self.load_balancers = load_balancers if load_balancers is not None else {}
         self.service_health_status = {}
+        self.health_history: Dict[str, HealthHistory] = {}
+        self.system_metrics = SystemMetricsSampler()
+        self._http_client: Optional[httpx.AsyncClient] = None
         self.gateway_metrics = {
             "start_time": time.time(),
             "total_requests": 0,
@@ -35,6 +99,7 @@ class MonitoringService:
         """Запуск проверки здоровья сервисов"""
         try:
             logger.info("Starting health checks")
+            self.system_metrics.start()
 
             while True:
                 try:
@@ -47,65 +112,96 @@ class MonitoringService:
         except Exception as e:
             logger.error(f"Error starting health checks: {e}")
 
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Общий клиент для health check (keep-alive соединения между циклами)"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                timeout=settings.health_check_timeout,
+                limits=httpx.Limits(max_connections=settings.health_check_max_connections)
+            )
+        return self._http_client
+
+    async def close(self):
+        """Остановка сборщика метрик и закрытие клиента"""
+        self.system_metrics.stop()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
     async def _perform_health_checks(self):
-        """Выполнение проверки здоровья всех сервисов"""
+        """Выполнение проверки здоровья всех сервисов (параллельно)"""
         try:
-            for service_name, service_config in settings.services.items():
-                if service_config.enabled:
-                    await self._check_service_health(service_name, service_config)
+            await asyncio.gather(*(
+                self._check_service_health(service_name, service_config)
+                for service_name, service_config in settings.services.items()
+                if service_config.enabled
+            ))
 
         except Exception as e:
             logger.error(f"Error performing health checks: {e}")
 
     async def _check_service_health(self, service_name: str, service_config):
-        """Проверка здоровья конкретного сервиса"""
-        try:
-            health_url = f"{service_config.url}{service_config.health_check}"
+        """Проверка здоровья конкретного сервиса (всех его экземпляров)"""
+        urls = get_endpoint_urls(service_config)
+        results = await asyncio.gather(*(
+            self._check_endpoint_health(service_name, url, service_config.health_check)
+            for url in urls
+        ))
+        endpoints = dict(zip(urls, results))
+
+        balancer = self.load_balancers.get(service_name)
+        if balancer is not None:
+            for url, endpoint_status in endpoints.items():
+                balancer.mark_health(url, endpoint_status["status"] in ("healthy", "degraded"))
+
+        # Статус сервиса — лучший из статусов экземпляров
+        best = min(endpoints.values(), key=lambda item: STATUS_PRIORITY.get(item["status"], len(STATUS_PRIORITY)))
+        self.service_health_status[service_name] = {
+            **best,
+            "last_check": datetime.utcnow(),
+            "endpoints": endpoints
+        }
 
-            start_time = time.time()
-            async with httpx.AsyncClient(timeout=5) as client:
-                response = await client.get(health_url)
-
-                response_time = time.time() - start_time
-
-                if response.status_code == 200:
-                    status = "healthy"
-                elif response.status_code >= 500:
-                    status = "unhealthy"
-                else:
-                    status = "degraded"
-
-                # Обновление статуса сервиса
-                self.service_health_status[service_name] = {
-                    "status": status,
-                    "response_time": response_time,
-                    "last_check": datetime.utcnow(),
-                    "error_message": None
-                }
-
-                logger.debug(f"Service {service_name} health check: {status} ({response_time:.2f}s)")
-
-        except httpx.TimeoutException:
-            self._update_service_status(service_name, "unhealthy", "Timeout")
-        except httpx.ConnectError:
-            self._update_service_status(service_name, "down", "Connection failed")
-        except Exception as e:
-            self._update_service_status(service_name, "unhealthy", str(e))
+        history = self.health_history.get(service_name)
+        if history is None:
+            history = self.health_history[service_name] = HealthHistory(settings.health_history_size)
+        history.add(best["status"], best["response_time"], time.time())
 
-    def _update_service_status(self, service_name: str, status: str, error_message: str):
-        """Обновление статуса сервиса"""
+        if best["error_message"]:
+            logger.warning(f"Service {service_name} status: {best['status']} - {best['error_message']}")
+        else:
+            logger.debug(f"Service {service_name} health check: {best['status']} ({best['response_time']:.2f}s)")
+
+    async def _check_endpoint_health(self, service_name: str, url: str, health_check: str) -> Dict[str, Any]:
+        """Проверка здоровья одного экземпляра сервиса"""
         try:
-            self.service_health_status[service_name] = {
-                "status": status,
-                "response_time": None,
-                "last_check": datetime.utcnow(),
-                "error_message": error_message
-            }
+            health_url = f"{url}{health_check}"
+
+            start_time = time.time()
+            # Жёсткий срок на всю проверку, включая ожидание соединения из пула
+            response = await asyncio.wait_for(
+                self._get_http_client().get(health_url),
+                timeout=settings.health_check_timeout
+            )
+
+            response_time = time.time() - start_time
+
+            if response.status_code == 200:
+                status = "healthy"
+            elif response.status_code >= 500:
+                status = "unhealthy"
+            else:
+                status = "degraded"
 
-            logger.warning(f"Service {service_name} status: {status} - {error_message}")
+            return {"status": status, "response_time": response_time, "error_message": None}
 
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            return {"status": "unhealthy", "response_time": None, "error_message": "Timeout"}
+        except httpx.ConnectError:
+            return {"status": "down", "response_time": None, "error_message": "Connection failed"}
         except Exception as e:
-            logger.error(f"Error updating service status: {e}")
+            logger.debug(f"Health check of {service_name} at {url} failed: {e}")
+            return {"status": "unhealthy", "response_time": None, "error_message": str(e)}
 
     async def get_gateway_stats(self) -> Dict[str, Any]:
         """Получение статистики API Gateway"""
@@ -137,20 +233,22 @@ class MonitoringService:
             return {}
 
     def _get_system_metrics(self) -> Dict[str, Any]:
-        """Получение системных метрик"""
+        """Последний снимок системных метрик из фонового сборщика"""
         try:
-            return {
-                "memory_usage_mb": psutil.virtual_memory().used / 1024 / 1024,
-                "cpu_usage_percent": psutil.cpu_percent(interval=1),
-                "disk_usage_percent": psutil.disk_usage('/').percent,
-                "active_connections": len(psutil.net_connections()),
-                "load_average": psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None
-            }
+            return self.system_metrics.latest()
 
         except Exception as e:
             logger.error(f"Error getting system metrics: {e}")
             return {}
 
+    def get_health_history(self, service_name: str = None) -> Dict[str, Any]:
+        """История проверок здоровья: доступность, смены статуса (flapping), тренд времени ответа"""
+        if service_name:
+            history = self.health_history.get(service_name)
+            return history.summary() if history else {}
+
+        return {name: history.summary() for name, history in self.health_history.items()}
+
     def increment_request_count(self, successful: bool = True):
         """Увеличение счетчика запросов"""
         try:
@@ -302,11 +400,12 @@ class MonitoringService:
                     )
 
             # Проверка высокой нагрузки
-            if self._get_system_metrics().get("cpu_usage_percent", 0) > 90:
+            cpu_usage = self._get_system_metrics().get("cpu_usage_percent") or 0
+            if cpu_usage > 90:
                 await self.send_alert(
                     "high_cpu_usage",
                     "High CPU usage detected",
-                    {"cpu_usage": self._get_system_metrics().get("cpu_usage_percent")}
+                    {"cpu_usage": cpu_usage}
                 )
 
             # Проверка недоступности сервисов
@@ -0,0 +1,279 @@
+"""
+Распределённый rate limiter API Gateway (GCRA)
+
+Для запроса собираются все применимые корзины — глобальная, IP, пользователь,
+сервис (`ServiceConfig.rate_limit`) и маршрут (`RouteConfig.rate_limit`) — и
+проверяются одним вызовом Lua-скрипта в Redis: запрос проходит, только если его
+допускают все корзины, и лишь тогда состояние корзин обновляется.
+
+Перед Redis выполняется локальная проверка: клиент, которому Redis недавно
+отказал по его собственной корзине (IP, пользователь, маршрут клиента),
+отклоняется до точного момента допуска без сетевого обращения. Общие корзины
+(глобальная, сервис) локально не блокируются: их интервал — доли секунды, и
+блокировка отклоняла бы всех клиентов реплики. Если Redis
+недоступен, те же лимиты считаются в памяти процесса.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from app import database
+from app.config import settings
+from app.services.routing_table import RouteMatch
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DECISIONS = Counter(
+    "gateway_rate_limit_decisions_total",
+    "Решения rate limiter по источнику и результату",
+    ["source", "result"],
+)
+
+# Период всех лимитов конфигурации — запросов в минуту
+LIMIT_PERIOD_MS = 60_000
+
+# KEYS — ключи корзин; ARGV — пары (интервал эмиссии, допуск всплеска) в мс.
+# Возвращает {allowed, индекс ограничивающей корзины, retry_after_ms, remaining, reset_ms}
+GCRA_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local new_tats = {}
+local tightest, tightest_remaining, tightest_reset = 1, nil, 0
+
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[2 * i - 1])
+    local tolerance = tonumber(ARGV[2 * i])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then
+        tat = now
+    end
+    local new_tat = tat + interval
+    local allow_at = new_tat - tolerance
+    if allow_at > now then
+        return {0, i, allow_at - now, 0, tat - now}
+    end
+    new_tats[i] = new_tat
+    local remaining = math.floor((now - allow_at) / interval)
+    if tightest_remaining == nil or remaining < tightest_remaining then
+        tightest, tightest_remaining, tightest_reset = i, remaining, new_tat - now
+    end
+end
+
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], new_tats[i], 'PX', new_tats[i] - now)
+end
+
+return {1, tightest, 0, tightest_remaining, tightest_reset}
+"""
+
+
+class RateLimitBucket:
+    """Корзина лимита: ключ и число запросов в минуту"""
+
+    __slots__ = ("key", "limit", "interval_ms", "tolerance_ms", "per_client")
+
+    def __init__(self, key: str, limit: int, per_client: bool = False):
+        self.key = key
+        self.limit = limit
+        # Корзина одного клиента: отказ Redis можно запомнить локально
+        self.per_client = per_client
+        self.interval_ms = max(LIMIT_PERIOD_MS // limit, 1)
+        self.tolerance_ms = LIMIT_PERIOD_MS
+
+
+class RateLimitResult:
+    """Решение limiter и данные для заголовков RateLimit-*"""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_seconds", "retry_after", "retry_after_ms", "bucket_key")
+
+    def __init__(
+        self,
+        allowed: bool,
+        limit: int,
+        remaining: int,
+        reset_seconds: int,
+        retry_after: int = 0,
+        bucket_key: str = "",
+        retry_after_ms: int = 0
+    ):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_seconds = reset_seconds
+        # Retry-After округляется вверх до секунды; точный срок — в retry_after_ms
+        self.retry_after = retry_after
+        self.retry_after_ms = retry_after_ms
+        self.bucket_key = bucket_key
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        """Заголовки RateLimit-* (draft-ietf-httpapi-ratelimit-headers)"""
+        headers = [
+            (b"ratelimit-limit", str(self.limit).encode()),
+            (b"ratelimit-remaining", str(self.remaining).encode()),
+            (b"ratelimit-reset", str(self.reset_seconds).encode()),
+        ]
+        if not self.allowed:
+            headers.append((b"retry-after", str(self.retry_after).encode()))
+        return headers
+
+
+class DistributedRateLimiter:
+    """GCRA-лимитер с одним атомарным вызовом Redis на запрос"""
+
+    KEY_PREFIX = "rate_limit"
+
+    def __init__(self, local_max_keys: int = 100_000):
+        self.local_max_keys = local_max_keys
+        # Ключ корзины -> момент (monotonic), до которого клиент точно отклоняется
+        self._blocked_until: "OrderedDict[str, float]" = OrderedDict()
+        # Ключ корзины -> TAT (мс) для работы без Redis
+        self._local_tats: "OrderedDict[str, float]" = OrderedDict()
+        self._script = None
+        self._script_client = None
+
+    def build_buckets(
+        self,
+        client_ip: str,
+        user_id: Optional[str],
+        route_match: Optional[RouteMatch]
+    ) -> List[RateLimitBucket]:
+        """Корзины, применимые к запросу"""
+        prefix = self.KEY_PREFIX
+        client_key = f"user:{user_id}" if user_id else f"ip:{client_ip}"
+        # (ключ, лимит, корзина одного клиента)
+        candidates = [
+            (f"{prefix}:global", settings.global_rate_limit, False),
+            (f"{prefix}:ip:{client_ip}", settings.ip_rate_limit, True),
+        ]
+        if user_id:
+            candidates.append((f"{prefix}:user:{user_id}", settings.user_rate_limit, True))
+        if route_match is not None:
+            if route_match.service_name and route_match.service_rate_limit:
+                candidates.append(
+                    (f"{prefix}:service:{route_match.service_name}", route_match.service_rate_limit, False)
+                )
+            if route_match.rate_limit:
+                candidates.append((f"{prefix}:route:{route_match.prefix}:{client_key}", route_match.rate_limit, True))
+
+        return [
+            RateLimitBucket(key, limit, per_client)
+            for key, limit, per_client in candidates
+            if limit and limit > 0
+        ]
+
+    async def check(self, buckets: List[RateLimitBucket]) -> Optional[RateLimitResult]:
+        """Проверка всех корзин запроса"""
+        if not buckets:
+            return None
+
+        rejected = self._check_blocked(buckets)
+        if rejected is not None:
+            RATE_LIMIT_DECISIONS.labels("local", "rejected").inc()
+            return rejected
+
+        redis_client = database.redis_client
+        if redis_client:
+            try:
+                result = await self._check_redis(redis_client, buckets)
+                RATE_LIMIT_DECISIONS.labels("redis", "allowed" if result.allowed else "rejected").inc()
+                if not result.allowed and any(
+                    bucket.per_client and bucket.key == result.bucket_key for bucket in buckets
+                ):
+                    self._block(result.bucket_key, result.retry_after_ms)
+                return result
+            except Exception as e:
+                logger.error(f"Redis rate limiter error, falling back to local limits: {e}")
+
+        result = self._check_local(buckets)
+        RATE_LIMIT_DECISIONS.labels("fallback", "allowed" if result.allowed else "rejected").inc()
+        return result
+
+    def _check_blocked(self, buckets: List[RateLimitBucket]) -> Optional[RateLimitResult]:
+        """Локальная предпроверка без обращения к Redis"""
+        if not self._blocked_until:
+            return None
+
+        now = time.monotonic()
+        for bucket in buckets:
+            blocked_until = self._blocked_until.get(bucket.key)
+            if blocked_until is None:
+                continue
+            if blocked_until <= now:
+                del self._blocked_until[bucket.key]
+                continue
+            retry_after_ms = math.ceil((blocked_until - now) * 1000)
+            retry_after = max(math.ceil(retry_after_ms / 1000), 1)
+            return RateLimitResult(False, bucket.limit, 0, retry_after, retry_after, bucket.key, retry_after_ms)
+        return None
+
+    def _block(self, bucket_key: str, retry_after_ms: int):
+        """Локальный отказ корзине клиента до момента допуска по данным Redis (мс)"""
+        if retry_after_ms <= 0:
+            return
+        self._blocked_until[bucket_key] = time.monotonic() + retry_after_ms / 1000
+        self._blocked_until.move_to_end(bucket_key)
+        while len(self._blocked_until) > self.local_max_keys:
+            self._blocked_until.popitem(last=False)
+
+    async def _check_redis(self, redis_client, buckets: List[RateLimitBucket]) -> RateLimitResult:
+        """Один вызов Lua-скрипта (EVALSHA) для всех корзин"""
+        if self._script is None or self._script_client is not redis_client:
+            self._script = redis_client.register_script(GCRA_SCRIPT)
+            self._script_client = redis_client
+
+        args = []
+        for bucket in buckets:
+            args.extend((bucket.interval_ms, bucket.tolerance_ms))
+
+        allowed, index, retry_after_ms, remaining, reset_ms = await self._script(
+            keys=[bucket.key for bucket in buckets],
+            args=args
+        )
+        bucket = buckets[int(index) - 1]
+        return RateLimitResult(
+            allowed=bool(int(allowed)),
+            limit=bucket.limit,
+            remaining=int(remaining),
+            reset_seconds=math.ceil(int(reset_ms) / 1000),
+            retry_after=max(math.ceil(int(retry_after_ms) / 1000), 1),
+            bucket_key=bucket.key,
+            retry_after_ms=int(retry_after_ms)
+        )
+
+    def _check_local(self, buckets: List[RateLimitBucket]) -> RateLimitResult:
+        """Тот же GCRA в памяти процесса (лимиты на реплику, если Redis недоступен)"""
+        now = time.monotonic() * 1000
+        new_tats = []
+        tightest = None
+
+        for bucket in buckets:
+            tat = max(self._local_tats.get(bucket.key, now), now)
+            new_tat = tat + bucket.interval_ms
+            allow_at = new_tat - bucket.tolerance_ms
+            if allow_at > now:
+                retry_after = max(math.ceil((allow_at - now) / 1000), 1)
+                return RateLimitResult(
+                    False, bucket.limit, 0, math.ceil((tat - now) / 1000), retry_after, bucket.key
+                )
+            remaining = int((now - allow_at) // bucket.interval_ms)
+            new_tats.append((bucket.key, new_tat))
+            if tightest is None or remaining < tightest[1]:
+                tightest = (bucket, remaining, new_tat - now)
+
+        for key, new_tat in new_tats:
+            self._local_tats[key] = new_tat
+            self._local_tats.move_to_end(key)
+        while len(self._local_tats) > self.local_max_keys:
+            self._local_tats.popitem(last=False)
+
+        bucket, remaining, reset_ms = tightest
+        return RateLimitResult(True, bucket.limit, remaining, math.ceil(reset_ms / 1000), 0, bucket.key)
+
+
+# Общий лимитер: middleware и подзапросы пакетного API расходуют одни корзины
+rate_limiter = DistributedRateLimiter()
@@ -0,0 +1,298 @@
+"""
+Кэш ответов API Gateway
+
+Два уровня: локальный LRU в памяти процесса (ограничен `settings.cache_max_size`)
+и общий Redis (`app.database.redis_client`). Кэшируются только безопасные GET
+маршрутов с `cache_ttl` (из таблицы маршрутизации); ключ учитывает путь, query,
+пользователя и заголовки согласования (`VARY_KEY_HEADERS`). Ответы с `Vary` по другим
+заголовкам (или `Vary: *`) не кэшируются.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+
+from fastapi import Request
+from prometheus_client import Counter
+
+from app import database
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = Counter(
+    "gateway_response_cache_lookups_total",
+    "Обращения к кэшу ответов по уровню и результату",
+    ["tier", "result"],
+)
+
+# Заголовки ответа сервиса, которые сохраняются вместе с телом
+STORED_HEADERS = ("content-type", "cache-control", "etag", "last-modified", "vary")
+
+# Заголовки запроса, входящие в ключ: по ним сервисы варьируют ответ (Vary)
+VARY_KEY_HEADERS = ("accept", "accept-language")
+
+# Vary, не требующий учёта в ключе: в кэше хранится декодированное тело
+VARY_IGNORED_HEADERS = ("accept-encoding",)
+
+
+class CachedResponse:
+    """Закэшированный ответ сервиса"""
+
+    __slots__ = ("status_code", "headers", "body", "etag", "expires_at")
+
+    def __init__(
+        self,
+        status_code: int,
+        headers: Dict[str, str],
+        body: bytes,
+        etag: str,
+        expires_at: float
+    ):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+    @property
+    def is_expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "status_code": self.status_code,
+            "headers": self.headers,
+            "body": base64.b64encode(self.body).decode("ascii"),
+            "etag": self.etag,
+            "expires_at": self.expires_at
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(
+            status_code=data["status_code"],
+            headers=data["headers"],
+            body=base64.b64decode(data["body"]),
+            etag=data["etag"],
+            expires_at=data["expires_at"]
+        )
+
+
+class ResponseCache:
+    """Двухуровневый кэш ответов (LRU в процессе + Redis)"""
+
+    KEY_PREFIX = "gateway_cache"
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or settings.cache_max_size
+        # key -> (ответ, срок жизни в локальном уровне)
+        self._entries: "OrderedDict[str, Tuple[CachedResponse, float]]" = OrderedDict()
+
+    # Правила кэширования
+
+    def is_cacheable(self, request: Request, cache_ttl: Optional[int]) -> bool:
+        """Можно ли обслужить запрос из кэша"""
+        if not settings.cache_enabled or request.method != "GET" or not cache_ttl:
+            return False
+
+        cache_control = request.headers.get("cache-control", "").lower()
+        return "no-store" not in cache_control and "no-cache" not in cache_control
+
+    def build_key(self, request: Request, service_name: str) -> str:
+        """Ключ кэша: сервис, путь, отсортированный query, заголовки согласования и пользователь"""
+        query = "&".join(
+            f"{name}={value}" for name, value in sorted(request.query_params.multi_items())
+        )
+        negotiation = "\n".join(request.headers.get(name, "") for name in VARY_KEY_HEADERS)
+        digest = hashlib.sha256(
+            f"{request.url.path}?{query}\n{negotiation}".encode("utf-8")
+        ).hexdigest()
+        return f"{service_name}:{self.get_user_scope(request)}:{digest}"
+
+    def get_user_scope(self, request: Request) -> str:
+        """Пользователь, которому принадлежит ответ"""
+        user_id = getattr(request.state, "user_id", None)
+        if user_id:
+            return str(user_id)
+
+        # Публичный маршрут, но с токеном: сервис может персонализировать ответ
+        authorization = request.headers.get("authorization")
+        if authorization:
+            return "token-" + hashlib.sha256(authorization.encode("utf-8")).hexdigest()[:16]
+
+        return "anonymous"
+
+    def resolve_ttl(self, route_ttl: int, upstream_headers: Dict[str, str]) -> Optional[int]:
+        """TTL с учётом Cache-Control и Vary сервиса (None — не кэшировать)"""
+        vary = {
+            name.strip().lower()
+            for name in upstream_headers.get("vary", "").split(",")
+            if name.strip()
+        }
+        # Вариант ответа зависит от заголовков, не входящих в ключ
+        if vary - set(VARY_KEY_HEADERS) - set(VARY_IGNORED_HEADERS):
+            return None
+
+        cache_control = upstream_headers.get("cache-control", "").lower()
+        if not cache_control:
+            return route_ttl
+
+        directives = {}
+        for part in cache_control.split(","):
+            name, _, value = part.strip().partition("=")
+            directives[name] = value.strip('"')
+
+        if "no-store" in directives or "no-cache" in directives:
+            return None
+
+        for directive in ("s-maxage", "max-age"):
+            if directive in directives:
+                try:
+                    max_age = int(directives[directive])
+                except ValueError:
+                    continue
+                return min(route_ttl, max_age) if max_age > 0 else None
+
+        return route_ttl
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    @staticmethod
+    def is_not_modified(request: Request, etag: str) -> bool:
+        """Проверка If-None-Match (слабое сравнение, RFC 7232)"""
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+
+        if if_none_match.strip() == "*":
+            return True
+
+        bare_etag = etag[2:] if etag.startswith("W/") else etag
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == bare_etag:
+                return True
+        return False
+
+    def build_entry(
+        self,
+        status_code: int,
+        upstream_headers: Dict[str, str],
+        body: bytes,
+        ttl: int
+    ) -> CachedResponse:
+        """Формирование записи кэша (ETag сервиса или вычисленный по телу)"""
+        headers = {
+            name: upstream_headers[name]
+            for name in STORED_HEADERS
+            if name in upstream_headers
+        }
+        etag = headers.get("etag") or self.make_etag(body)
+        headers["etag"] = etag
+        return CachedResponse(status_code, headers, body, etag, time.time() + ttl)
+
+    # Операции с кэшем
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Поиск ответа: сначала локальный LRU, затем Redis"""
+        local = self._entries.get(key)
+        if local is not None:
+            entry, local_expires_at = local
+            if time.time() < local_expires_at:
+                self._entries.move_to_end(key)
+                CACHE_LOOKUPS.labels("local", "hit").inc()
+                return entry
+            del self._entries[key]
+        CACHE_LOOKUPS.labels("local", "miss").inc()
+
+        redis_client = database.redis_client
+        if not redis_client:
+            return None
+
+        try:
+            raw = await redis_client.get(f"{self.KEY_PREFIX}:{key}")
+        except Exception as e:
+            logger.error(f"Error reading response cache from redis: {e}")
+            return None
+
+        if not raw:
+            CACHE_LOOKUPS.labels("redis", "miss").inc()
+            return None
+
+        entry = CachedResponse.from_json(raw)
+        if entry.is_expired:
+            CACHE_LOOKUPS.labels("redis", "miss").inc()
+            return None
+
+        CACHE_LOOKUPS.labels("redis", "hit").inc()
+        self._store_local(key, entry)
+        return entry
+
+    async def set(self, key: str, entry: CachedResponse):
+        """Сохранение ответа в оба уровня"""
+        self._store_local(key, entry)
+
+        redis_client = database.redis_client
+        if not redis_client:
+            return
+
+        ttl = max(int(entry.expires_at - time.time()), 1)
+        service_name, user_scope, _ = key.split(":", 2)
+        index_key = self._index_key(service_name, user_scope)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(f"{self.KEY_PREFIX}:{key}", ttl, entry.to_json())
+                pipe.sadd(index_key, key)
+                pipe.expire(index_key, max(ttl, settings.cache_ttl))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error writing response cache to redis: {e}")
+
+    async def invalidate(self, service_name: str, user_scope: str):
+        """Сброс ответов пользователя для сервиса (после изменяющих запросов)"""
+        prefix = f"{service_name}:{user_scope}:"
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+        redis_client = database.redis_client
+        if not redis_client:
+            return
+
+        index_key = self._index_key(service_name, user_scope)
+        try:
+            keys: List[str] = list(await redis_client.smembers(index_key))
+            await redis_client.delete(index_key, *[f"{self.KEY_PREFIX}:{key}" for key in keys])
+        except Exception as e:
+            logger.error(f"Error invalidating response cache in redis: {e}")
+
+    def purge_expired(self) -> int:
+        """Удаление просроченных записей локального уровня"""
+        now = time.time()
+        expired = [key for key, (_, local_expires_at) in self._entries.items() if now >= local_expires_at]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"local_entries": len(self._entries), "max_size": self.max_size}
+
+    def _store_local(self, key: str, entry: CachedResponse):
+        # Локальный уровень живёт не дольше cache_local_ttl: инвалидация на другой
+        # реплике чистит только Redis, и устаревший ответ здесь ограничен по времени
+        self._entries[key] = (entry, min(entry.expires_at, time.time() + settings.cache_local_ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _index_key(self, service_name: str, user_scope: str) -> str:
+        return f"{self.KEY_PREFIX}:index:{service_name}:{user_scope}"
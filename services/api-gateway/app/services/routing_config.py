@@ -0,0 +1,108 @@
+"""
+Версионированная конфигурация маршрутизации
+
+Документ (JSON) содержит версию, сервисы, маршруты и высокоуровневые префиксы
+в тех же моделях, что и `settings`. Источник — файл или ключ Redis
+(`routing_config_source`); GatewayService периодически читает его и применяет
+документ, только если его версия новее активной таблицы маршрутизации.
+
+Пример:
+
+    {
+      "version": 42,
+      "services": {"pet": {"name": "pet-service", "url": "http://pet-service:8000"}},
+      "routes": {"/pet": {"path": "/pet", "service": "pet", "cache_ttl": 60}},
+      "service_path_aliases": {"/pets": "pet"}
+    }
+"""
+
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from app import database
+from app.config import settings, RouteConfig, ServiceConfig
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingConfigDocument(BaseModel):
+    """Версия конфигурации маршрутизации"""
+    version: int = Field(ge=1)
+    services: Dict[str, ServiceConfig]
+    routes: Dict[str, RouteConfig]
+    service_path_aliases: Dict[str, str] = {}
+
+    @model_validator(mode="after")
+    def check_references(self) -> "RoutingConfigDocument":
+        """Маршруты и префиксы ссылаются только на описанные сервисы"""
+        for key, route in self.routes.items():
+            if key != route.path or not route.path.startswith("/"):
+                raise ValueError(f"Route key {key} must match its path and start with '/'")
+            if route.service not in self.services:
+                raise ValueError(f"Route {key} references unknown service {route.service}")
+
+        for path, service_name in self.service_path_aliases.items():
+            if not path.startswith("/"):
+                raise ValueError(f"Alias {path} must start with '/'")
+            if service_name not in self.services:
+                raise ValueError(f"Alias {path} references unknown service {service_name}")
+
+        return self
+
+
+class RoutingConfigSource:
+    """Источник документа конфигурации: файл или ключ Redis"""
+
+    KINDS = ("file", "redis")
+
+    def __init__(self, kind: Optional[str] = None):
+        self.kind = (kind if kind is not None else settings.routing_config_source).lower()
+        self.path = settings.routing_config_path
+        self.redis_key = settings.routing_config_redis_key
+        self._last_raw: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.kind in self.KINDS
+
+    def reset(self):
+        """Следующий fetch разберёт документ, даже если он не изменился"""
+        self._last_raw = None
+
+    async def fetch(self) -> Optional[RoutingConfigDocument]:
+        """Новый документ или None, если источник пуст или не изменился
+
+        Ошибки валидации пробрасываются (ValidationError), но повторно один и тот
+        же некорректный документ не разбирается.
+        """
+        raw = await self._read()
+        if raw is None or raw == self._last_raw:
+            return None
+
+        self._last_raw = raw
+        return RoutingConfigDocument.model_validate_json(raw)
+
+    async def _read(self) -> Optional[str]:
+        if self.kind == "file":
+            return await asyncio.to_thread(self._read_file)
+
+        if self.kind == "redis":
+            if database.redis_client is None:
+                return None
+            raw = await database.redis_client.get(self.redis_key)
+            if isinstance(raw, bytes):
+                raw = raw.decode("utf-8")
+            return raw
+
+        return None
+
+    def _read_file(self) -> Optional[str]:
+        try:
+            with open(self.path, encoding="utf-8") as config_file:
+                return config_file.read()
+        except FileNotFoundError:
+            logger.warning(f"Routing config file {self.path} not found")
+            return None
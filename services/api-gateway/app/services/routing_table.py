@@ -0,0 +1,197 @@
+"""
+Таблица маршрутизации API Gateway
+
+Префиксное дерево по сегментам пути, компилируется один раз из конфигурации
+(`settings.routes`, `settings.services`, `settings.service_path_aliases`).
+Поиск — самый длинный совпавший префикс за O(длины пути), результат содержит
+сразу сервис, требование аутентификации, лимиты и TTL кэша.
+
+Активная таблица хранится в модуле и заменяется целиком (`install_routing_table`),
+поэтому запросы никогда не видят частично обновлённую конфигурацию.
+"""
+
+import logging
+from typing import Dict, Optional, List
+
+from fastapi import Request
+from starlette.types import Scope
+
+from app.config import settings, RouteConfig, ServiceConfig
+
+logger = logging.getLogger(__name__)
+
+
+class RouteMatch:
+    """Результат маршрутизации пути"""
+
+    __slots__ = (
+        "prefix",
+        "service_name",
+        "service_config",
+        "route_config",
+        "auth_required",
+        "rate_limit",
+        "service_rate_limit",
+        "cache_ttl",
+        "coalesce",
+        "priority",
+    )
+
+    def __init__(
+        self,
+        prefix: str,
+        service_name: Optional[str],
+        service_config: Optional[ServiceConfig],
+        route_config: Optional[RouteConfig],
+        auth_required: bool,
+        rate_limit: Optional[int] = None,
+        cache_ttl: Optional[int] = None,
+        coalesce: bool = False,
+        priority: Optional[int] = None
+    ):
+        self.prefix = prefix
+        self.service_name = service_name
+        self.service_config = service_config
+        self.route_config = route_config
+        self.auth_required = auth_required
+        self.rate_limit = rate_limit
+        self.service_rate_limit = service_config.rate_limit if service_config else None
+        self.cache_ttl = cache_ttl
+        self.coalesce = coalesce
+        # Приоритет маршрута, иначе сервиса
+        if priority is None and service_config is not None:
+            priority = service_config.priority
+        self.priority = priority
+
+    def __repr__(self):
+        return f"<RouteMatch(prefix={self.prefix}, service={self.service_name}, auth={self.auth_required})>"
+
+
+class _TrieNode:
+    __slots__ = ("children", "match")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.match: Optional[RouteMatch] = None
+
+
+class RoutingTable:
+    """Скомпилированная таблица маршрутов (longest-prefix по сегментам пути)"""
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        self._root = _TrieNode()
+        self._matches: List[RouteMatch] = []
+
+        # Непокрытые маршрутами пути API по умолчанию требуют аутентификации
+        self.api_prefix = f"/api/{settings.api_version}"
+        self.api_default = RouteMatch(self.api_prefix, None, None, None, auth_required=True)
+
+    @classmethod
+    def compile(
+        cls,
+        routes: Optional[Dict[str, RouteConfig]] = None,
+        services: Optional[Dict[str, ServiceConfig]] = None,
+        aliases: Optional[Dict[str, str]] = None,
+        version: int = 0
+    ) -> "RoutingTable":
+        """Сборка таблицы из конфигурации"""
+        routes = routes if routes is not None else settings.routes
+        services = services if services is not None else settings.services
+        aliases = aliases if aliases is not None else settings.service_path_aliases
+
+        table = cls(version=version)
+
+        for route_config in routes.values():
+            table.add(RouteMatch(
+                prefix=table.api_prefix + route_config.path,
+                service_name=route_config.service,
+                service_config=services.get(route_config.service),
+                route_config=route_config,
+                auth_required=route_config.auth_required,
+                rate_limit=route_config.rate_limit,
+                cache_ttl=route_config.cache_ttl,
+                coalesce=route_config.coalesce,
+                priority=route_config.priority
+            ))
+
+        # Высокоуровневые роуты шлюза (/api/v1/pets, /api/v1/users, ...)
+        for path, service_name in aliases.items():
+            table.add(RouteMatch(
+                prefix=table.api_prefix + path,
+                service_name=service_name,
+                service_config=services.get(service_name),
+                route_config=None,
+                auth_required=True
+            ))
+
+        return table
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        return [segment for segment in path.split("/") if segment]
+
+    def add(self, route_match: RouteMatch):
+        """Добавление маршрута (только на этапе компиляции)"""
+        node = self._root
+        for segment in self._segments(route_match.prefix):
+            node = node.children.setdefault(segment, _TrieNode())
+        if node.match is not None:
+            logger.warning(f"Duplicate route prefix {route_match.prefix}, keeping the first one")
+            return
+        node.match = route_match
+        self._matches.append(route_match)
+
+    def match(self, path: str) -> Optional[RouteMatch]:
+        """Самый длинный совпавший префикс пути"""
+        node = self._root
+        best = None
+        for segment in path.split("/"):
+            if not segment:
+                continue
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.match is not None:
+                best = node.match
+
+        if best is None and (path == self.api_prefix or path.startswith(self.api_prefix + "/")):
+            return self.api_default
+        return best
+
+    def get_routes(self) -> List[RouteMatch]:
+        return list(self._matches)
+
+
+_active_table: Optional[RoutingTable] = None
+
+
+def get_routing_table() -> RoutingTable:
+    """Активная таблица маршрутизации (компилируется при первом обращении)"""
+    global _active_table
+    if _active_table is None:
+        _active_table = RoutingTable.compile()
+    return _active_table
+
+
+def install_routing_table(table: RoutingTable):
+    """Атомарная замена активной таблицы"""
+    global _active_table
+    _active_table = table
+    logger.info(f"Routing table v{table.version} installed ({len(table.get_routes())} routes)")
+
+
+def match_scope(scope: Scope) -> Optional[RouteMatch]:
+    """Маршрут ASGI-запроса: вычисляется один раз и сохраняется в scope["state"]"""
+    state = scope.setdefault("state", {})
+    if "route_match" in state:
+        return state["route_match"]
+
+    route_match = get_routing_table().match(scope["path"])
+    state["route_match"] = route_match
+    return route_match
+
+
+def match_request(request: Request) -> Optional[RouteMatch]:
+    """Маршрут запроса (request.state разделяет scope["state"] с middleware)"""
+    return match_scope(request.scope)
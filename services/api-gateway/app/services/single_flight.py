@@ -0,0 +1,53 @@
+"""
+Объединение одинаковых запросов в полёте (single-flight)
+
+Пока к сервису идёт запрос с некоторым ключом, повторные запросы с тем же
+ключом не уходят в сервис, а ждут результат первого. Вызов выполняется в
+отдельной задаче: отключение клиента, начавшего запрос, не отменяет его для
+остальных ожидающих.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "gateway_single_flight_requests_total",
+    "Запросы через single-flight: leader — ушёл в сервис, shared — получил чужой результат",
+    ["result"],
+)
+
+
+class SingleFlight:
+    """Группа вызовов, дедуплицируемых по ключу"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Результат call() — собственного или уже выполняющегося с тем же ключом"""
+        task = self._calls.get(key)
+        if task is None:
+            SINGLE_FLIGHT_REQUESTS.labels("leader").inc()
+            task = asyncio.get_running_loop().create_task(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        else:
+            SINGLE_FLIGHT_REQUESTS.labels("shared").inc()
+
+        # shield: отмена одного ожидающего не отменяет общий вызов
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Исключение уже получили ожидающие; если их не осталось, не даём asyncio ругаться
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
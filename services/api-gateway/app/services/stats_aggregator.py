@@ -0,0 +1,278 @@
+"""
+Агрегация статистики маршрутов API Gateway
+
+Счётчики копятся в памяти процесса по ключу (маршрут, сервис, метод) и
+периодически сбрасываются в Redis дельтами через HINCRBY/HINCRBYFLOAT одним
+pipeline. Инкременты коммутативны, поэтому данные нескольких реплик шлюза
+корректно складываются в общих хэшах.
+
+Раскладка в Redis (без KEYS/SCAN при чтении):
+- `route_stats` — один хэш с накопленными итогами, поле `маршрут|сервис|метод|метрика`;
+- `route_stats:m:<минута>` — поминутные хэши той же структуры с TTL, ключи
+  окна вычисляются по времени и читаются одним pipeline.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from app import database
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Границы бакетов гистограммы времени ответа (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+LATENCY_FIELDS = tuple(f"latency_le:{bound}" for bound in LATENCY_BUCKETS)
+
+TOTALS_KEY = "route_stats"
+MINUTE_KEY_PREFIX = "route_stats:m:"
+FIELD_SEPARATOR = "|"
+
+# Сегменты пути, которые являются идентификаторами ресурсов
+_ID_SEGMENT = re.compile(
+    r"^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{24,})$"
+)
+
+# (минута, маршрут, сервис, метод)
+RouteKey = Tuple[int, str, str, str]
+
+
+class RouteCounters:
+    """Накопленные с последнего сброса счётчики маршрута"""
+
+    __slots__ = (
+        "total_requests",
+        "successful_requests",
+        "failed_requests",
+        "response_time_sum",
+        "status_codes",
+        "latency_buckets",
+    )
+
+    def __init__(self):
+        self.total_requests = 0
+        self.successful_requests = 0
+        self.failed_requests = 0
+        self.response_time_sum = 0.0
+        self.status_codes: Dict[int, int] = {}
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def merge(self, other: "RouteCounters"):
+        self.total_requests += other.total_requests
+        self.successful_requests += other.successful_requests
+        self.failed_requests += other.failed_requests
+        self.response_time_sum += other.response_time_sum
+        for status_code, count in other.status_codes.items():
+            self.status_codes[status_code] = self.status_codes.get(status_code, 0) + count
+        for index, count in enumerate(other.latency_buckets):
+            self.latency_buckets[index] += count
+
+
+class RouteStatsAggregator:
+    """Агрегатор статистики маршрутов с пакетным сбросом в Redis"""
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = flush_interval or settings.stats_flush_interval
+        self._pending: Dict[RouteKey, RouteCounters] = {}
+        self._running = False
+
+    @staticmethod
+    def normalize_route(path: str) -> str:
+        """Замена идентификаторов в пути на {id}, чтобы не плодить ключи"""
+        return "/".join(
+            "{id}" if _ID_SEGMENT.match(segment) else segment
+            for segment in path.split("/")
+        )
+
+    def record(
+        self,
+        path: str,
+        service_name: str,
+        method: str,
+        status_code: int,
+        response_time: float
+    ):
+        """Учёт запроса. Без await: в пределах event loop обновление атомарно"""
+        key = (int(time.time() // 60), self.normalize_route(path), service_name, method)
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = RouteCounters()
+
+        counters.total_requests += 1
+        if 200 <= status_code < 400:
+            counters.successful_requests += 1
+        else:
+            counters.failed_requests += 1
+
+        counters.response_time_sum += response_time
+        counters.status_codes[status_code] = counters.status_codes.get(status_code, 0) + 1
+
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if response_time <= bound:
+                counters.latency_buckets[index] += 1
+                break
+
+    async def start_flushing(self):
+        """Фоновый сброс накопленных дельт"""
+        self._running = True
+        while self._running:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def stop_flushing(self):
+        """Остановка фонового сброса с финальной выгрузкой"""
+        self._running = False
+        await self.flush()
+
+    async def flush(self):
+        """Выгрузка дельт в Redis одним pipeline"""
+        if not self._pending:
+            return
+
+        redis_client = database.redis_client
+        if not redis_client:
+            self._prune_expired()
+            return
+
+        # Подмена словаря целиком: новые запросы пишут уже в свежий буфер
+        pending, self._pending = self._pending, {}
+
+        retention_seconds = settings.stats_retention_minutes * 60
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                minute_keys = set()
+                for (minute, route, service_name, method), counters in pending.items():
+                    prefix = self.field_prefix(route, service_name, method)
+                    minute_key = f"{MINUTE_KEY_PREFIX}{minute}"
+                    self._queue_increments(pipe, TOTALS_KEY, prefix, counters)
+                    self._queue_increments(pipe, minute_key, prefix, counters)
+                    minute_keys.add(minute_key)
+                for minute_key in minute_keys:
+                    pipe.expire(minute_key, retention_seconds)
+                await pipe.execute()
+
+        except Exception as e:
+            logger.error(f"Error flushing route stats: {e}")
+            # Возвращаем дельты в буфер, чтобы не потерять их до следующей попытки
+            for key, counters in pending.items():
+                current = self._pending.get(key)
+                if current is None:
+                    self._pending[key] = counters
+                else:
+                    current.merge(counters)
+            self._prune_expired()
+
+    def _prune_expired(self):
+        """Удаление из буфера минут старше окна хранения: при недоступном Redis буфер не растёт без предела"""
+        oldest_minute = int(time.time() // 60) - settings.stats_retention_minutes
+        expired = [key for key in self._pending if key[0] < oldest_minute]
+        if not expired:
+            return
+
+        dropped_requests = sum(self._pending.pop(key).total_requests for key in expired)
+        logger.warning(
+            f"Dropped {len(expired)} unflushed route stats buckets ({dropped_requests} requests) "
+            f"older than {settings.stats_retention_minutes} minutes"
+        )
+
+    @staticmethod
+    def field_prefix(route: str, service_name: str, method: str) -> str:
+        return FIELD_SEPARATOR.join((route, service_name, method)) + FIELD_SEPARATOR
+
+    @staticmethod
+    def _queue_increments(pipe, redis_key: str, prefix: str, counters: RouteCounters):
+        pipe.hincrby(redis_key, prefix + "total_requests", counters.total_requests)
+        if counters.successful_requests:
+            pipe.hincrby(redis_key, prefix + "successful_requests", counters.successful_requests)
+        if counters.failed_requests:
+            pipe.hincrby(redis_key, prefix + "failed_requests", counters.failed_requests)
+        pipe.hincrbyfloat(redis_key, prefix + "response_time_sum", counters.response_time_sum)
+
+        for status_code, count in counters.status_codes.items():
+            pipe.hincrby(redis_key, f"{prefix}status:{status_code}", count)
+        for field, count in zip(LATENCY_FIELDS, counters.latency_buckets):
+            if count:
+                pipe.hincrby(redis_key, prefix + field, count)
+
+    async def read_totals(self) -> Dict[str, Dict[str, Any]]:
+        """Накопленная статистика всех маршрутов (один HGETALL)"""
+        redis_client = database.redis_client
+        if not redis_client:
+            return {}
+
+        raw = await redis_client.hgetall(TOTALS_KEY)
+        return self._summarize_routes(self._group_fields([raw]))
+
+    async def read_window(self, minutes: int) -> Dict[str, Dict[str, Any]]:
+        """Статистика маршрутов за последние N минут (поминутные хэши одним pipeline)"""
+        redis_client = database.redis_client
+        if not redis_client:
+            return {}
+
+        current_minute = int(time.time() // 60)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for minute in range(current_minute - minutes + 1, current_minute + 1):
+                pipe.hgetall(f"{MINUTE_KEY_PREFIX}{minute}")
+            buckets = await pipe.execute()
+
+        return self._summarize_routes(self._group_fields(buckets))
+
+    @staticmethod
+    def _group_fields(hashes) -> Dict[str, Dict[str, float]]:
+        """Суммирование хэшей и группировка полей по маршруту"""
+        grouped: Dict[str, Dict[str, float]] = {}
+        for raw in hashes:
+            for field, value in (raw or {}).items():
+                parts = field.split(FIELD_SEPARATOR, 3)
+                if len(parts) != 4:
+                    continue
+                route, service_name, method, metric = parts
+                route_fields = grouped.setdefault(f"{route}:{service_name}:{method}", {})
+                route_fields[metric] = route_fields.get(metric, 0) + float(value)
+        return grouped
+
+    @classmethod
+    def _summarize_routes(cls, grouped: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, Any]]:
+        return {route: cls.summarize(fields) for route, fields in grouped.items()}
+
+    @staticmethod
+    def summarize(raw: Dict[str, float]) -> Dict[str, Any]:
+        """Преобразование метрик маршрута в статистику с перцентилями"""
+        total = int(raw.get("total_requests", 0))
+        response_time_sum = float(raw.get("response_time_sum", 0))
+
+        status_codes = {
+            field.split(":", 1)[1]: int(value)
+            for field, value in raw.items()
+            if field.startswith("status:")
+        }
+        buckets = [int(raw.get(field, 0)) for field in LATENCY_FIELDS]
+
+        return {
+            "total_requests": total,
+            "successful_requests": int(raw.get("successful_requests", 0)),
+            "failed_requests": int(raw.get("failed_requests", 0)),
+            "average_response_time": response_time_sum / total if total else 0,
+            "p50_response_time": RouteStatsAggregator._percentile(buckets, total, 0.50),
+            "p95_response_time": RouteStatsAggregator._percentile(buckets, total, 0.95),
+            "p99_response_time": RouteStatsAggregator._percentile(buckets, total, 0.99),
+            "status_codes": status_codes,
+        }
+
+    @staticmethod
+    def _percentile(buckets, total: int, quantile: float) -> Optional[float]:
+        """Оценка перцентиля по гистограмме (верхняя граница бакета)"""
+        if not total:
+            return None
+
+        threshold = total * quantile
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            if cumulative >= threshold:
+                # Для последнего бакета верхней границы нет — берём предыдущую
+                return bound if bound != float("inf") else LATENCY_BUCKETS[-2]
+        return LATENCY_BUCKETS[-2]
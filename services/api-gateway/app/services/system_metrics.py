@@ -0,0 +1,86 @@
+"""
+Фоновый сбор системных метрик API Gateway
+
+psutil вызывается в отдельном потоке раз в `system_metrics_interval` секунд,
+снимки складываются в кольцевой буфер. Обработчики запросов читают последний
+снимок без блокировки event loop (раньше `cpu_percent(interval=1)` и
+`net_connections()` задерживали каждый запрос статистики больше чем на секунду).
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+import psutil
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SystemMetricsSampler:
+    """Периодический сбор psutil-метрик в кольцевой буфер"""
+
+    def __init__(self, interval: Optional[float] = None, history_size: Optional[int] = None):
+        self.interval = interval or settings.system_metrics_interval
+        self._history = deque(maxlen=history_size or settings.system_metrics_history_size)
+        self._latest: Dict[str, Any] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Запуск потока сбора (повторный вызов ничего не делает)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        # Первый вызов cpu_percent(None) задаёт точку отсчёта и возвращает 0.0
+        psutil.cpu_percent(interval=None)
+        self._thread = threading.Thread(target=self._run, name="system-metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling system metrics: {e}")
+            if self._stop_event.wait(self.interval):
+                break
+
+    def sample(self) -> Dict[str, Any]:
+        """Один снимок метрик (выполняется в потоке сборщика)"""
+        try:
+            active_connections = len(psutil.net_connections())
+        except (psutil.AccessDenied, OSError):
+            active_connections = None
+
+        snapshot = {
+            "timestamp": time.time(),
+            "memory_usage_mb": psutil.virtual_memory().used / 1024 / 1024,
+            "cpu_usage_percent": psutil.cpu_percent(interval=None),
+            "disk_usage_percent": psutil.disk_usage('/').percent,
+            "active_connections": active_connections,
+            "load_average": psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None
+        }
+
+        # deque.append и присваивание ссылки атомарны относительно читателей в event loop
+        self._history.append(snapshot)
+        self._latest = snapshot
+        return snapshot
+
+    def latest(self) -> Dict[str, Any]:
+        """Последний снимок без метки времени (формат прежнего _get_system_metrics)"""
+        snapshot = self._latest
+        return {key: value for key, value in snapshot.items() if key != "timestamp"}
+
+    def history(self) -> List[Dict[str, Any]]:
+        return list(self._history)
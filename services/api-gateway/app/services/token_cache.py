@@ -0,0 +1,131 @@
+"""
+Кэш проверенных JWT для API Gateway
+
+Ключ — SHA-256 от токена (сам токен в памяти не хранится). Положительные записи
+живут до `exp` (+ допуск на рассинхронизацию часов, как при jwt.decode), но не
+дольше `settings.jwt_cache_ttl`. Отклонённые токены запоминаются на короткое
+время, чтобы повторы не тратили CPU на проверку подписи.
+
+Все операции синхронные (без await), поэтому кэш безопасно разделять между
+задачами asyncio одного event loop.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from prometheus_client import Counter
+
+from app.config import settings
+
+TOKEN_CACHE_LOOKUPS = Counter(
+    "gateway_jwt_cache_lookups_total",
+    "Обращения к кэшу проверенных JWT",
+    ["result"],
+)
+
+
+class VerifiedTokenCache:
+    """Ограниченный LRU проверенных токенов с негативным кэшем"""
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        max_ttl: Optional[int] = None,
+        negative_ttl: Optional[int] = None
+    ):
+        self.max_size = max_size or settings.jwt_cache_max_size
+        self.max_ttl = max_ttl if max_ttl is not None else settings.jwt_cache_ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else settings.jwt_negative_cache_ttl
+
+        # digest -> (payload, действителен до)
+        self._verified: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # digest -> (status_code, detail, действителен до)
+        self._rejected: "OrderedDict[bytes, Tuple[int, str, float]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, digest: bytes) -> Optional[Dict[str, Any]]:
+        """Payload ранее проверенного и ещё действительного токена"""
+        entry = self._verified.get(digest)
+        if entry is not None:
+            payload, valid_until = entry
+            if time.time() < valid_until:
+                self._verified.move_to_end(digest)
+                self.hits += 1
+                TOKEN_CACHE_LOOKUPS.labels("hit").inc()
+                return dict(payload)
+            del self._verified[digest]
+        return None
+
+    def record_miss(self):
+        """Учёт промаха: токен пришлось проверять полностью"""
+        self.misses += 1
+        TOKEN_CACHE_LOOKUPS.labels("miss").inc()
+
+    def get_rejection(self, digest: bytes) -> Optional[Tuple[int, str]]:
+        """Причина недавнего отказа для токена (status_code, detail)"""
+        entry = self._rejected.get(digest)
+        if entry is None:
+            return None
+
+        status_code, detail, valid_until = entry
+        if time.time() >= valid_until:
+            del self._rejected[digest]
+            return None
+
+        self.negative_hits += 1
+        TOKEN_CACHE_LOOKUPS.labels("negative_hit").inc()
+        return status_code, detail
+
+    def put(self, digest: bytes, payload: Dict[str, Any]):
+        """Сохранение проверенного токена до exp (+ leeway)"""
+        now = time.time()
+        exp = payload.get("exp")
+        if exp is None:
+            return
+
+        valid_until = min(float(exp) + settings.jwt_leeway_seconds, now + self.max_ttl)
+        if valid_until <= now:
+            return
+
+        self._verified[digest] = (payload, valid_until)
+        self._verified.move_to_end(digest)
+        while len(self._verified) > self.max_size:
+            self._verified.popitem(last=False)
+
+    def put_rejection(self, digest: bytes, status_code: int, detail: str):
+        """Запоминание отклонённого токена"""
+        if self.negative_ttl <= 0:
+            return
+
+        self._rejected[digest] = (status_code, detail, time.time() + self.negative_ttl)
+        self._rejected.move_to_end(digest)
+        while len(self._rejected) > self.max_size:
+            self._rejected.popitem(last=False)
+
+    def clear(self):
+        self._verified.clear()
+        self._rejected.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._verified),
+            "rejected_entries": len(self._rejected),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Общий кэш для всех экземпляров AuthService (middleware и сервисы приложения)
+token_cache = VerifiedTokenCache()
@@ -0,0 +1,301 @@
+"""
+Пул соединений API Gateway к микросервисам
+
+Для каждого сервиса создаётся один долгоживущий `httpx.AsyncClient` со своим
+пулом keep-alive соединений. Клиенты строятся один раз из `settings.services`
+и закрываются в lifespan приложения. При смене конфигурации сервисов
+(`sync_services`) клиенты с изменёнными параметрами пула заменяются, а старые
+закрываются через `upstream_drain_timeout`, когда завершатся запросы в полёте.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Any, List, Optional, Set
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import settings, ServiceConfig
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+UPSTREAM_IN_FLIGHT = Gauge(
+    "gateway_upstream_in_flight_requests",
+    "Количество запросов к сервису, выполняющихся в данный момент",
+    ["service"],
+)
+UPSTREAM_POOL_UTILIZATION = Gauge(
+    "gateway_upstream_pool_utilization",
+    "Доля занятых соединений пула (in-flight / max_connections)",
+    ["service"],
+)
+UPSTREAM_POOL_WAIT = Histogram(
+    "gateway_upstream_pool_wait_seconds",
+    "Время ожидания соединения из пула",
+    ["service"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+UPSTREAM_CONNECTIONS = Counter(
+    "gateway_upstream_connections_total",
+    "Запросы к сервисам по признаку переиспользования соединения",
+    ["service", "reused"],
+)
+
+
+class _RequestTrace:
+    """Трассировка httpcore для одного запроса: ожидание пула и reuse соединения"""
+
+    __slots__ = ("service_name", "started_at", "acquired", "new_connection")
+
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self.started_at = time.perf_counter()
+        self.acquired = False
+        self.new_connection = False
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]):
+        if self.acquired:
+            return
+
+        if event_name == "connection.connect_tcp.started":
+            self.new_connection = True
+        elif not event_name.endswith("send_request_headers.started"):
+            return
+
+        # Первое из событий означает, что слот пула получен
+        self.acquired = True
+        UPSTREAM_POOL_WAIT.labels(self.service_name).observe(time.perf_counter() - self.started_at)
+        UPSTREAM_CONNECTIONS.labels(
+            self.service_name, "false" if self.new_connection else "true"
+        ).inc()
+
+
+class UpstreamStream:
+    """Потоковый ответ сервиса, удерживающий слот пула до закрытия"""
+
+    def __init__(self, pool: "UpstreamPool", service_name: str, response: httpx.Response):
+        self._pool = pool
+        self._closed = False
+        self._close_callbacks: List[Callable[[], None]] = []
+        self.service_name = service_name
+        self.response = response
+
+    def add_close_callback(self, callback: Callable[[], None]):
+        """Вызов при закрытии потока (тело передано целиком или прервано)"""
+        self._close_callbacks.append(callback)
+
+    async def aiter_raw(self):
+        """Тело ответа как есть (без декодирования content-encoding)"""
+        async for chunk in self.response.aiter_raw():
+            yield chunk
+
+    async def aclose(self):
+        """Закрытие ответа и освобождение слота пула (идемпотентно)"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self.response.aclose()
+        finally:
+            self._pool._release(self.service_name)
+            for callback in self._close_callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Upstream stream close callback failed for {self.service_name}: {e}")
+
+
+class UpstreamPool:
+    """Пул HTTP-клиентов к микросервисам (один клиент на сервис)"""
+
+    def __init__(self, services: Optional[Dict[str, ServiceConfig]] = None):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._configs: Dict[str, ServiceConfig] = {}
+        self._max_connections: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._retiring: Set[asyncio.Task] = set()
+
+        for name, config in (services if services is not None else settings.services).items():
+            self.add_service(name, config)
+
+    def add_service(self, service_name: str, config: ServiceConfig):
+        """Создание клиента для сервиса (если ещё не создан)"""
+        if service_name in self._clients:
+            return
+
+        max_connections = config.max_connections or settings.upstream_max_connections
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=(
+                config.max_keepalive_connections or settings.upstream_max_keepalive_connections
+            ),
+            keepalive_expiry=(
+                config.keepalive_expiry
+                if config.keepalive_expiry is not None
+                else settings.upstream_keepalive_expiry
+            ),
+        )
+        timeout = httpx.Timeout(
+            config.timeout,
+            connect=settings.upstream_connect_timeout,
+            pool=settings.upstream_pool_timeout,
+        )
+
+        http2 = config.http2 if config.http2 is not None else settings.upstream_http2_enabled
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning(f"HTTP/2 requested for {service_name}, but h2 is not installed; using HTTP/1.1")
+            http2 = False
+
+        self._clients[service_name] = httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+        self._configs[service_name] = config
+        self._max_connections[service_name] = max_connections
+        # Счётчик сохраняется при замене клиента: запросы старого клиента ещё завершатся
+        self._in_flight.setdefault(service_name, 0)
+
+    def sync_services(self, services: Dict[str, ServiceConfig]):
+        """Приведение клиентов к новому набору сервисов"""
+        for name, config in services.items():
+            current = self._configs.get(name)
+            if name in self._clients and self._pool_params(current) != self._pool_params(config):
+                self._retire(name, self._clients.pop(name))
+            self.add_service(name, config)
+
+        for name in list(self._clients):
+            if name not in services:
+                self._retire(name, self._clients.pop(name))
+                del self._configs[name]
+
+    @staticmethod
+    def _pool_params(config: Optional[ServiceConfig]) -> tuple:
+        if config is None:
+            return ()
+        return (
+            config.timeout,
+            config.max_connections,
+            config.max_keepalive_connections,
+            config.keepalive_expiry,
+            config.http2,
+        )
+
+    def _retire(self, service_name: str, client: httpx.AsyncClient):
+        """Отложенное закрытие выведенного из работы клиента"""
+        task = asyncio.get_running_loop().create_task(self._close_later(service_name, client))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    async def _close_later(self, service_name: str, client: httpx.AsyncClient):
+        try:
+            await asyncio.sleep(settings.upstream_drain_timeout)
+        finally:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing retired upstream client for {service_name}: {e}")
+
+    def get_client(self, service_name: str) -> httpx.AsyncClient:
+        """Получение клиента сервиса"""
+        client = self._clients.get(service_name)
+        if client is None:
+            raise ValueError(f"Service {service_name} not found")
+        return client
+
+    async def request(
+        self,
+        service_name: str,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Any = None,
+        content: Any = None,
+    ) -> httpx.Response:
+        """Выполнение запроса через пул соединений сервиса"""
+        client = self.get_client(service_name)
+
+        self._acquire(service_name)
+        try:
+            return await client.request(
+                method=method,
+                url=url,
+                headers=headers,
+                params=params,
+                content=content,
+                extensions={"trace": _RequestTrace(service_name)},
+            )
+        finally:
+            self._release(service_name)
+
+    async def stream(
+        self,
+        service_name: str,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Any = None,
+        content: Any = None,
+    ) -> UpstreamStream:
+        """Потоковый запрос: тело ответа читается по мере поступления, вызывающий обязан закрыть поток"""
+        client = self.get_client(service_name)
+        upstream_request = client.build_request(
+            method=method,
+            url=url,
+            headers=headers,
+            params=params,
+            content=content,
+            extensions={"trace": _RequestTrace(service_name)},
+        )
+
+        self._acquire(service_name)
+        try:
+            response = await client.send(upstream_request, stream=True)
+        except BaseException:
+            self._release(service_name)
+            raise
+
+        return UpstreamStream(self, service_name, response)
+
+    def _acquire(self, service_name: str):
+        self._in_flight[service_name] += 1
+        self._publish_utilization(service_name)
+
+    def _release(self, service_name: str):
+        self._in_flight[service_name] -= 1
+        self._publish_utilization(service_name)
+
+    def _publish_utilization(self, service_name: str):
+        in_flight = self._in_flight[service_name]
+        UPSTREAM_IN_FLIGHT.labels(service_name).set(in_flight)
+        UPSTREAM_POOL_UTILIZATION.labels(service_name).set(
+            in_flight / self._max_connections[service_name]
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Текущая загрузка пулов"""
+        return {
+            name: {
+                "in_flight": self._in_flight[name],
+                "max_connections": self._max_connections[name],
+                "utilization": self._in_flight[name] / self._max_connections[name],
+            }
+            for name in self._clients
+        }
+
+    async def aclose(self):
+        """Закрытие всех клиентов (включая ожидающие закрытия после смены конфигурации)"""
+        for task in list(self._retiring):
+            task.cancel()
+        await asyncio.gather(*self._retiring, return_exceptions=True)
+
+        for service_name, client in self._clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing upstream client for {service_name}: {e}")
+        self._clients.clear()
@@ -0,0 +1,287 @@
+"""
+Проксирование WebSocket через API Gateway
+
+Сервис определяется таблицей маршрутизации так же, как для HTTP
+(`/api/v1/location/...` -> location-service). Аутентификация выполняется
+один раз при upgrade (AuthMiddleware). После рукопожатия с сервисом кадры
+передаются двумя задачами — по одной на направление. Промежуточных очередей
+нет: каждая задача ждёт отправки кадра, поэтому медленная сторона тормозит
+чтение другой, а буфер чтения сервиса ограничен `websocket_max_queue` кадрами.
+Соединение закрывается, если в обе стороны не было кадров дольше
+`websocket_idle_timeout`.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from fastapi import WebSocket
+from prometheus_client import Counter, Gauge
+from starlette.websockets import WebSocketState
+from websockets.exceptions import ConnectionClosed, InvalidStatusCode
+
+from app.config import settings
+from app.services.gateway_service import HOP_BY_HOP_HEADERS, GatewayService
+from app.services.routing_table import RouteMatch
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    "gateway_websocket_connections",
+    "Открытые проксируемые WebSocket-соединения",
+    ["service"],
+)
+WEBSOCKET_CONNECTIONS_TOTAL = Counter(
+    "gateway_websocket_connections_total",
+    "WebSocket-соединения по результату: closed, rejected, upstream_error",
+    ["service", "result"],
+)
+WEBSOCKET_MESSAGES = Counter(
+    "gateway_websocket_messages_total",
+    "Проксированные WebSocket-кадры по направлению",
+    ["service", "direction"],
+)
+WEBSOCKET_CLOSES = Counter(
+    "gateway_websocket_closes_total",
+    "Закрытия WebSocket-соединений по инициатору",
+    ["service", "reason"],
+)
+
+# Коды закрытия (RFC 6455, 7.4)
+CLOSE_NORMAL = 1000
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_INTERNAL_ERROR = 1011
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_BAD_GATEWAY = 1014
+
+# Коды, которые нельзя отправлять в кадре закрытия
+_RESERVED_CLOSE_CODES = {1004, 1005, 1006, 1015}
+
+# Заголовки рукопожатия клиента, которые формирует клиент сервиса заново;
+# X-User-* передаются только из состояния аутентификации шлюза
+_HANDSHAKE_HEADERS = HOP_BY_HOP_HEADERS | {
+    "host",
+    "origin",
+    "sec-websocket-key",
+    "sec-websocket-version",
+    "sec-websocket-extensions",
+    "sec-websocket-protocol",
+    "x-user-id",
+    "x-user-role",
+}
+
+
+def _close_code(code: Optional[int]) -> int:
+    """Код, допустимый для отправки другой стороне"""
+    if code is None or code in _RESERVED_CLOSE_CODES or not 1000 <= code <= 4999:
+        return CLOSE_NORMAL
+    return code
+
+
+class WebSocketProxy:
+    """Проксирование WebSocket-соединений к сервисам"""
+
+    def __init__(self, gateway_service: GatewayService):
+        self.gateway_service = gateway_service
+        self.active_connections = 0
+        self.connections_by_service: Dict[str, int] = {}
+
+    async def proxy(self, websocket: WebSocket, route_match: Optional[RouteMatch], path: str):
+        """Установление соединения с сервисом и передача кадров до закрытия одной из сторон"""
+        if not settings.enable_websocket_support:
+            await websocket.close(code=CLOSE_POLICY_VIOLATION)
+            return
+
+        if route_match is None or route_match.service_name is None:
+            await websocket.close(code=CLOSE_POLICY_VIOLATION, reason="No service for path")
+            return
+        service_name = route_match.service_name
+
+        if self.active_connections >= settings.websocket_max_connections:
+            WEBSOCKET_CONNECTIONS_TOTAL.labels(service_name, "rejected").inc()
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Too many connections")
+            return
+
+        upstream = await self._connect_upstream(websocket, service_name, path)
+        if upstream is None:
+            return
+
+        await websocket.accept(subprotocol=upstream.subprotocol)
+
+        self._track(service_name, 1)
+        try:
+            reason = await self._pump(websocket, upstream, service_name)
+            WEBSOCKET_CLOSES.labels(service_name, reason).inc()
+            WEBSOCKET_CONNECTIONS_TOTAL.labels(service_name, "closed").inc()
+        finally:
+            self._track(service_name, -1)
+            await upstream.close()
+            if websocket.application_state != WebSocketState.DISCONNECTED:
+                await self._close_client(websocket, CLOSE_NORMAL)
+
+    async def _connect_upstream(self, websocket: WebSocket, service_name: str, path: str):
+        """Рукопожатие с сервисом; при неудаче клиенту отказывается с подходящим кодом"""
+        headers, subprotocols = self._build_handshake(websocket)
+        try:
+            return await self.gateway_service.connect_websocket(
+                service_name,
+                f"/api/{settings.api_version}/{path}",
+                websocket.scope.get("query_string", b"").decode("latin-1"),
+                headers=headers,
+                subprotocols=subprotocols
+            )
+        except InvalidStatusCode as e:
+            # Сервис отклонил соединение (например, 403): отказ без повторных попыток
+            code = CLOSE_POLICY_VIOLATION if e.status_code < 500 else CLOSE_BAD_GATEWAY
+        except ValueError as e:
+            logger.warning(f"WebSocket upstream unavailable: {e}")
+            code = CLOSE_TRY_AGAIN_LATER
+
+        WEBSOCKET_CONNECTIONS_TOTAL.labels(service_name, "upstream_error").inc()
+        await websocket.close(code=code)
+        return None
+
+    def _build_handshake(self, websocket: WebSocket) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """Заголовки рукопожатия для сервиса и запрошенные клиентом подпротоколы"""
+        headers = [
+            (name, value)
+            for name, value in websocket.headers.items()
+            if name.lower() not in _HANDSHAKE_HEADERS
+        ]
+
+        # Идентификатор пользователя для доверенных внутренних сервисов (как у HTTP-прокси)
+        user_id = websocket.scope.get("state", {}).get("user_id")
+        if user_id:
+            headers.append(("X-User-Id", str(user_id)))
+            headers.append(("X-User-Role", str(websocket.scope["state"].get("user_role") or "")))
+
+        subprotocols = [
+            protocol.strip()
+            for protocol in websocket.headers.get("sec-websocket-protocol", "").split(",")
+            if protocol.strip()
+        ]
+        return headers, subprotocols
+
+    async def _pump(self, websocket: WebSocket, upstream, service_name: str) -> str:
+        """Передача кадров в обе стороны; результат — причина закрытия"""
+        last_activity = [time.monotonic()]
+
+        client_to_upstream = asyncio.create_task(
+            self._pump_client(websocket, upstream, service_name, last_activity)
+        )
+        upstream_to_client = asyncio.create_task(
+            self._pump_upstream(websocket, upstream, service_name, last_activity)
+        )
+
+        try:
+            done, pending = await asyncio.wait(
+                {client_to_upstream, upstream_to_client},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+        except asyncio.CancelledError:
+            client_to_upstream.cancel()
+            upstream_to_client.cancel()
+            raise
+
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        finished = done.pop()
+        if finished.cancelled():
+            return "error"
+        if finished.exception() is not None:
+            logger.error(f"WebSocket proxy error for {service_name}: {finished.exception()}")
+            await self._close_client(websocket, CLOSE_INTERNAL_ERROR)
+            return "error"
+        return finished.result()
+
+    async def _pump_client(self, websocket: WebSocket, upstream, service_name: str, last_activity: list) -> str:
+        """Кадры клиента -> сервис"""
+        while True:
+            message = await self._wait_idle(websocket.receive(), last_activity)
+            if message is None:
+                await upstream.close(code=CLOSE_NORMAL, reason="Idle timeout")
+                await self._close_client(websocket, CLOSE_NORMAL)
+                return "idle_timeout"
+
+            if message["type"] == "websocket.disconnect":
+                await upstream.close(code=_close_code(message.get("code")))
+                return "client_closed"
+
+            data = message.get("text")
+            if data is None:
+                data = message.get("bytes")
+            if data is None:
+                continue
+
+            try:
+                await upstream.send(data)
+            except ConnectionClosed as e:
+                await self._close_client(websocket, _close_code(e.rcvd.code if e.rcvd else None))
+                return "upstream_closed"
+
+            last_activity[0] = time.monotonic()
+            WEBSOCKET_MESSAGES.labels(service_name, "client_to_upstream").inc()
+
+    async def _pump_upstream(self, websocket: WebSocket, upstream, service_name: str, last_activity: list) -> str:
+        """Кадры сервиса -> клиент"""
+        while True:
+            try:
+                data = await self._wait_idle(upstream.recv(), last_activity)
+            except ConnectionClosed as e:
+                await self._close_client(websocket, _close_code(e.rcvd.code if e.rcvd else None))
+                return "upstream_closed"
+
+            if data is None:
+                await upstream.close(code=CLOSE_NORMAL, reason="Idle timeout")
+                await self._close_client(websocket, CLOSE_NORMAL)
+                return "idle_timeout"
+
+            if isinstance(data, str):
+                await websocket.send_text(data)
+            else:
+                await websocket.send_bytes(data)
+
+            last_activity[0] = time.monotonic()
+            WEBSOCKET_MESSAGES.labels(service_name, "upstream_to_client").inc()
+
+    @staticmethod
+    async def _wait_idle(receive, last_activity: list) -> Any:
+        """Ожидание кадра; None, если соединение простаивает в обе стороны дольше idle timeout"""
+        future = asyncio.ensure_future(receive)
+        try:
+            while True:
+                remaining = last_activity[0] + settings.websocket_idle_timeout - time.monotonic()
+                if remaining <= 0:
+                    return None
+                done, _ = await asyncio.wait({future}, timeout=remaining)
+                if done:
+                    return future.result()
+        finally:
+            if not future.done():
+                future.cancel()
+
+    @staticmethod
+    async def _close_client(websocket: WebSocket, code: int):
+        """Закрытие соединения с клиентом, если оно ещё открыто"""
+        if websocket.application_state == WebSocketState.DISCONNECTED:
+            return
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            # Клиент уже отключился
+            pass
+
+    def _track(self, service_name: str, delta: int):
+        self.active_connections += delta
+        self.connections_by_service[service_name] = self.connections_by_service.get(service_name, 0) + delta
+        WEBSOCKET_CONNECTIONS.labels(service_name).set(self.connections_by_service[service_name])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_connections": self.active_connections,
+            "connections_by_service": dict(self.connections_by_service),
+            "max_connections": settings.websocket_max_connections
+        }
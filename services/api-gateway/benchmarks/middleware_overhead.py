@@ -0,0 +1,183 @@
+"""
+Бенчмарк накладных расходов цепочки middleware API Gateway
+
+Сравнивает прежнюю схему (AuthMiddleware и SlowAPIMiddleware на базе
+BaseHTTPMiddleware) с чистыми ASGI middleware. Приложение вызывается напрямую
+через ASGI, без сети, поэтому разница — это стоимость самих слоёв.
+
+Запуск из каталога services/api-gateway:
+    python benchmarks/middleware_overhead.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Лимиты заведомо выше числа запросов бенчмарка
+BENCHMARK_RATE_LIMIT = "1000000000"
+for name in ("GLOBAL_RATE_LIMIT", "IP_RATE_LIMIT", "USER_RATE_LIMIT", "PET_SERVICE_RATE_LIMIT"):
+    os.environ.setdefault(name, BENCHMARK_RATE_LIMIT)
+
+import jwt
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.config import settings
+from app.middleware import AuthMiddleware, RateLimitMiddleware
+from app.services.auth_service import AuthService
+from app.services.routing_table import match_request
+
+PUBLIC_PATH = "/health"
+PROTECTED_PATH = "/api/v1/pet/ping"
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    """Прежняя реализация AuthMiddleware (BaseHTTPMiddleware)"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.auth_service = AuthService()
+        self.public_paths = {"/health", "/docs", "/redoc", "/openapi.json", "/metrics"}
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in self.public_paths:
+            return await call_next(request)
+
+        route_match = match_request(request)
+        if not (route_match and route_match.auth_required):
+            return await call_next(request)
+
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return JSONResponse(status_code=401, content={"error": "Missing authentication token"})
+
+        try:
+            payload = await self.auth_service.verify_token(auth_header[7:])
+        except HTTPException as e:
+            return JSONResponse(status_code=e.status_code, content={"error": e.detail})
+
+        request.state.user_id = payload.get("user_id") or payload.get("sub")
+        request.state.user_role = payload.get("role")
+        request.state.user_roles = payload.get("roles", [])
+        request.state.token_payload = payload
+        return await call_next(request)
+
+
+class LegacyPassThroughMiddleware(BaseHTTPMiddleware):
+    """Эквивалент SlowAPIMiddleware без лимитов по умолчанию"""
+
+    async def dispatch(self, request: Request, call_next):
+        return await call_next(request)
+
+
+def build_app(chain: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get(PUBLIC_PATH)
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get(PROTECTED_PATH)
+    async def ping(request: Request):
+        return {"user_id": getattr(request.state, "user_id", None)}
+
+    if chain == "legacy":
+        app.add_middleware(LegacyAuthMiddleware)
+        app.add_middleware(LegacyPassThroughMiddleware)
+    elif chain == "asgi":
+        app.add_middleware(RateLimitMiddleware)
+        app.add_middleware(AuthMiddleware)
+
+    return app
+
+
+def make_token() -> str:
+    return jwt.encode(
+        {"user_id": "benchmark-user", "role": "client", "exp": datetime.utcnow() + timedelta(hours=1)},
+        settings.jwt_secret_key,
+        algorithm=settings.jwt_algorithm
+    )
+
+
+async def call(app: FastAPI, path: str, headers) -> int:
+    """Один запрос к приложению через ASGI"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+        "state": {},
+    }
+    request_sent = False
+    never = asyncio.Event()
+    status = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await never.wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app: FastAPI, path: str, headers, requests: int) -> float:
+    """Среднее время запроса в микросекундах"""
+    for _ in range(min(requests // 10, 1000)):
+        status = await call(app, path, headers)
+    if status != 200:
+        raise RuntimeError(f"Unexpected status {status} for {path}")
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(app, path, headers)
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+async def main(requests: int):
+    for route_config in settings.routes.values():
+        route_config.rate_limit = int(BENCHMARK_RATE_LIMIT)
+
+    headers = [
+        (b"host", b"testserver"),
+        (b"authorization", f"Bearer {make_token()}".encode()),
+    ]
+
+    apps = {chain: build_app(chain) for chain in ("none", "legacy", "asgi")}
+
+    print(f"{'scenario':<12}{'chain':<10}{'us/request':>12}{'overhead us':>14}")
+    for scenario, path in (("public", PUBLIC_PATH), ("protected", PROTECTED_PATH)):
+        baseline = None
+        for chain in ("none", "legacy", "asgi"):
+            elapsed = await measure(apps[chain], path, headers, requests)
+            if chain == "none":
+                baseline = elapsed
+            print(f"{scenario:<12}{chain:<10}{elapsed:>12.1f}{elapsed - baseline:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -10,25 +10,23 @@ from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 import structlog
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
 import uvicorn
 from prometheus_client import make_asgi_app
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
 
 from app.config import settings
 from app.database import init_cache
 from app.services.gateway_service import GatewayService
 from app.services.auth_service import AuthService
 from app.services.monitoring_service import MonitoringService
+from app.services.composition_service import CompositionService
+from app.services.batch_service import BatchService
+from app.services.discovery import ServiceDiscovery
+from app.services.websocket_proxy import WebSocketProxy
 from app.api.v1.api import api_router
-from app.middleware.auth import AuthMiddleware
-# Пользовательские middleware отсутствуют (оставляем стандартные FastAPI/SlowAPI)
+from app.middleware import AuthMiddleware, CompressionMiddleware, RateLimitMiddleware
 
 
 # Настройка структурированного логирования
@@ -72,7 +70,12 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Инициализация сервисов
     app.state.gateway_service = GatewayService()
     app.state.auth_service = AuthService()
-    app.state.monitoring_service = MonitoringService()
+    app.state.monitoring_service = MonitoringService(app.state.gateway_service.load_balancers)
+    app.state.composition_service = CompositionService(app.state.gateway_service)
+    app.state.batch_service = BatchService(app.state.gateway_service)
+    app.state.websocket_proxy = WebSocketProxy(app.state.gateway_service)
+    # Общий клиент прокси-роутов /auth, /users, /pets
+    app.state.service_discovery = ServiceDiscovery()
 
     # Запуск фоновых задач
     asyncio.create_task(start_background_tasks(app))
@@ -83,6 +86,10 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     logger.info("API Gateway Service shutting down...")
 
+    await app.state.gateway_service.close()
+    await app.state.monitoring_service.close()
+    await app.state.service_discovery.close()
+
 
 async def start_background_tasks(app: FastAPI):
     """Запуск фоновых задач"""
@@ -92,36 +99,33 @@ async def start_background_tasks(app: FastAPI):
         asyncio.create_task(monitoring_service.start_health_checks())
 
         # Запуск очистки кэша
-        asyncio.create_task(clean_cache_periodically())
+        asyncio.create_task(clean_cache_periodically(app))
 
         # Запуск обновления конфигурации маршрутизации
         gateway_service = app.state.gateway_service
         asyncio.create_task(gateway_service.start_route_updates())
 
+        # Запуск пакетного сброса статистики маршрутов в Redis
+        asyncio.create_task(gateway_service.route_stats.start_flushing())
+
+        # Синхронизация состояний circuit breaker между репликами
+        asyncio.create_task(gateway_service.circuit_breakers.start_sync())
+
     except Exception as e:
         logger.error(f"Error starting background tasks: {e}")
 
 
-async def clean_cache_periodically():
+async def clean_cache_periodically(app: FastAPI):
     """Периодическая очистка кэша"""
     while True:
         try:
-            # Здесь должна быть логика очистки устаревшего кэша
-            await asyncio.sleep(3600)  # Каждые 60 минут
+            # Redis-уровень истекает по TTL, локальный LRU чистим от просроченных записей
+            purged = app.state.gateway_service.response_cache.purge_expired()
+            logger.debug(f"Purged {purged} expired cache entries")
+            await asyncio.sleep(60)  # Каждую минуту
         except Exception as e:
             logger.error(f"Error cleaning cache: {e}")
-
-
-def create_rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
-    """Обработчик превышения лимита запросов"""
-    return JSONResponse(
-        status_code=429,
-        content={
-            "error": "Too Many Requests",
-            "message": f"Rate limit exceeded: {exc.detail}",
-            "retry_after": exc.retry_after
-        }
-    )
+            await asyncio.sleep(60)
 
 
 def create_application() -> FastAPI:
@@ -135,16 +139,13 @@ def create_application() -> FastAPI:
         redoc_url="/redoc",
     )
 
-    # Настройка rate limiting
-    limiter = Limiter(key_func=get_remote_address)
-    app.state.limiter = limiter
-
-    # Middleware для обработки ошибок rate limiting
-    app.add_exception_handler(RateLimitExceeded, create_rate_limit_exceeded_handler)
-
-    # Пользовательские middleware (минимальная конфигурация)
+    # Пользовательские middleware (чистые ASGI). Последний добавленный — внешний:
+    # аутентификация выполняется до лимитирования, чтобы лимиты знали пользователя
+    app.add_middleware(RateLimitMiddleware)
     app.add_middleware(AuthMiddleware)
-    app.add_middleware(SlowAPIMiddleware)
+
+    # Сжатие снаружи аутентификации: сжимаются и ответы об ошибках
+    app.add_middleware(CompressionMiddleware)
 
     # CORS middleware
     app.add_middleware(
@@ -0,0 +1,53 @@
+"""
+Граница аутентификации шлюза: без токена публичны только /api/v1/auth/*
+"""
+
+import asyncio
+
+import pytest
+
+from app.middleware import AuthMiddleware
+from app.services.routing_table import RoutingTable, install_routing_table
+
+
+async def _downstream(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _call(path: str) -> int:
+    """Статус ответа AuthMiddleware на GET без токена"""
+    install_routing_table(RoutingTable.compile())
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(AuthMiddleware(_downstream)(scope, receive, send))
+    return messages[0]["status"]
+
+
+@pytest.mark.parametrize("path", [
+    "/api/v1/user/users/me",
+    "/api/v1/user/users",
+    "/api/v1/users/me",
+    "/api/v1/pet/pets",
+])
+def test_protected_paths_require_token(path):
+    assert _call(path) == 401
+
+
+@pytest.mark.parametrize("path", ["/api/v1/auth/login", "/health"])
+def test_public_paths_pass_without_token(path):
+    assert _call(path) == 200
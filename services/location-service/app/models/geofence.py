@@ -12,6 +12,8 @@ from sqlalchemy.sql import func
 from geoalchemy2 import Geometry
 import uuid
 
+from app.utils import geodesy
+
 from .base import Base
 
 
@@ -88,16 +90,14 @@ class Geofence(Base):
 
     def contains_point(self, latitude: float, longitude: float) -> bool:
         """Проверка, находится ли точка внутри геофенса"""
-        from app.services.location_service import LocationService
-        distance = LocationService.calculate_distance(
+        distance = geodesy.haversine(
             self.center_latitude, self.center_longitude, latitude, longitude
         )
         return distance <= self.radius_meters
 
     def distance_to_point(self, latitude: float, longitude: float) -> float:
         """Расстояние от центра геофенса до точки"""
-        from app.services.location_service import LocationService
-        return LocationService.calculate_distance(
+        return geodesy.haversine(
             self.center_latitude, self.center_longitude, latitude, longitude
         )
 
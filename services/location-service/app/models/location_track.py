@@ -12,6 +12,8 @@ from sqlalchemy.sql import func
 from geoalchemy2 import Geometry
 import uuid
 
+from app.utils import geodesy
+
 from .base import Base
 
 
@@ -114,11 +116,8 @@ class LocationTrack(Base):
         }
 
     def distance_to(self, other_lat: float, other_lon: float) -> float:
-        """Расчет расстояния до другой точки"""
-        from app.services.location_service import LocationService
-        return LocationService.calculate_distance(
-            self.latitude, self.longitude, other_lat, other_lon
-        )
+        """Расчет расстояния до другой точки (в метрах)"""
+        return geodesy.haversine(self.latitude, self.longitude, other_lat, other_lon)
 
     def is_within_geofence(self, geofence_lat: float, geofence_lon: float, radius_meters: float) -> bool:
         """Проверка нахождения в геофенсе"""
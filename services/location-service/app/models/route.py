@@ -12,6 +12,8 @@ from sqlalchemy.sql import func
 from geoalchemy2 import Geometry
 import uuid
 
+from app.utils import geodesy
+
 from .base import Base
 
 
@@ -127,14 +129,11 @@ class Route(Base):
         # Сортировка точек по времени
         sorted_tracks = sorted(location_tracks, key=lambda x: x.timestamp)
 
-        # Расчет дистанции
-        total_distance = 0
-        for i in range(1, len(sorted_tracks)):
-            distance = sorted_tracks[i-1].distance_to(
-                sorted_tracks[i].latitude,
-                sorted_tracks[i].longitude
-            )
-            total_distance += distance
+        # Расчет дистанции: длины всех отрезков трека одним вызовом
+        total_distance = geodesy.path_length(
+            [track.latitude for track in sorted_tracks],
+            [track.longitude for track in sorted_tracks]
+        )
 
         self.total_distance_meters = total_distance
 
@@ -185,8 +184,7 @@ class Route(Base):
             last_point = optimized_points[-1]
 
             # Расчет расстояния между точками
-            from app.services.location_service import LocationService
-            distance = LocationService.calculate_distance(
+            distance = geodesy.haversine(
                 last_point['latitude'], last_point['longitude'],
                 point['latitude'], point['longitude']
             )
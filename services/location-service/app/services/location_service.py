@@ -4,7 +4,6 @@
 
 import logging
 import uuid
-import math
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 
@@ -14,6 +13,7 @@ from sqlalchemy.orm import selectinload
 
 from app.config import settings
 from app.database.session import get_session
+from app.utils import geodesy
 from app.models.location_track import LocationTrack
 from app.models.geofence import Geofence
 from app.models.location_alert import LocationAlert
@@ -35,20 +35,7 @@ class LocationService:
     @staticmethod
     def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Расчет расстояния между двумя точками по формуле гаверсинуса (в метрах)"""
-        R = 6371000  # Радиус Земли в метрах
-
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-
-        a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-        return R * c
+        return geodesy.haversine(lat1, lon1, lat2, lon2)
 
     @staticmethod
     async def create_location_track(db: AsyncSession, track_data: LocationTrackCreate) -> LocationTrack:
@@ -268,7 +255,8 @@ class LocationService:
             is_inside_any = False
 
             for geofence in geofences:
-                distance = LocationService.calculate_distance(
+                # Геофенсов у заказа единицы: скалярный расчёт быстрее пакетного (см. бенчмарк)
+                distance = geodesy.haversine(
                     latitude, longitude,
                     geofence.center_latitude, geofence.center_longitude
                 )
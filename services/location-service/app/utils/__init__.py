@@ -0,0 +1,7 @@
+"""
+Утилиты для Location Service
+"""
+
+from . import geodesy
+
+__all__ = ["geodesy"]
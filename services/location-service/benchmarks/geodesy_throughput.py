@@ -0,0 +1,101 @@
+"""
+Бенчмарк пропускной способности геодезических ядер (`app/utils/geodesy.py`)
+
+Для каждого размера пакета (по умолчанию от 1 до 1M точек) измеряется число
+расстояний в секунду: скалярный гаверсинус в цикле Python (прежняя схема,
+до `--scalar-limit` точек), `point_to_many` и `consecutive` во float64/float32,
+плоское приближение и `pairwise` (матрица sqrt(N) x sqrt(N)).
+
+Запуск из каталога services/location-service:
+    python benchmarks/geodesy_throughput.py --sizes 1,100,10000,1000000
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.utils import geodesy
+
+# Окрестности Коломны: городские расстояния, как в реальных треках
+CENTER_LAT = 55.0833
+CENTER_LON = 38.7833
+SPREAD_DEGREES = 0.1
+
+
+def measure(func, min_time: float) -> float:
+    """Среднее время одного вызова (секунды), вызовы повторяются не меньше min_time"""
+    func()  # прогрев
+    calls = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - started
+    return elapsed / calls
+
+
+def build_cases(size: int, scalar_limit: int):
+    rng = np.random.default_rng(size)
+    lats = CENTER_LAT + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES, size)
+    lons = CENTER_LON + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES, size)
+    lats32 = lats.astype(np.float32)
+    lons32 = lons.astype(np.float32)
+
+    side = max(int(math.sqrt(size)), 1)
+
+    cases = []
+    if size <= scalar_limit:
+        lat_list = lats.tolist()
+        lon_list = lons.tolist()
+        cases.append(("scalar loop", size, lambda: [
+            geodesy.haversine(CENTER_LAT, CENTER_LON, lat, lon)
+            for lat, lon in zip(lat_list, lon_list)
+        ]))
+
+    cases += [
+        ("point_to_many f64", size, lambda: geodesy.point_to_many(CENTER_LAT, CENTER_LON, lats, lons)),
+        ("point_to_many f32", size, lambda: geodesy.point_to_many(
+            CENTER_LAT, CENTER_LON, lats32, lons32, dtype=np.float32
+        )),
+        ("point_to_many equirect", size, lambda: geodesy.point_to_many(
+            CENTER_LAT, CENTER_LON, lats, lons, method=geodesy.EQUIRECTANGULAR
+        )),
+        ("consecutive f64", max(size - 1, 0), lambda: geodesy.consecutive(lats, lons)),
+        ("consecutive f32", max(size - 1, 0), lambda: geodesy.consecutive(lats32, lons32, dtype=np.float32)),
+        ("pairwise f64", side * side, lambda: geodesy.pairwise(
+            lats[:side], lons[:side], lats[:side], lons[:side]
+        )),
+        ("pairwise f32", side * side, lambda: geodesy.pairwise(
+            lats32[:side], lons32[:side], lats32[:side], lons32[:side], dtype=np.float32
+        )),
+    ]
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geodesy kernels throughput")
+    parser.add_argument("--sizes", default="1,10,100,1000,10000,100000,1000000")
+    parser.add_argument("--scalar-limit", type=int, default=100000)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    print(f"{'points':>9}  {'kernel':<24} {'per call':>12} {'distances/s':>14}")
+    for size in sizes:
+        for name, distances, func in build_cases(size, args.scalar_limit):
+            seconds = measure(func, args.min_time)
+            rate = distances / seconds if seconds > 0 else float("inf")
+            print(f"{size:>9}  {name:<24} {seconds * 1e6:>10.1f}us {rate:>14,.0f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ from app.schemas.order import (
 from app.services.order_service import OrderService
 from app.services.matching_service import MatchingService
 from app.services.pricing_service import PricingService
+from app.services.price_surface import price_surface
 
 router = APIRouter()
 security = HTTPBearer(auto_error=False)
@@ -295,6 +296,27 @@ async def get_pending_orders_for_walker(
         raise HTTPException(status_code=500, detail="Ошибка получения ожидающих заказов")
 
 
+@router.get("/walker/schedule", summary="Расписание выгульщика на дату")
+async def get_walker_schedule(
+    date: str = Query(None, description="Дата (YYYY-MM-DD), по умолчанию сегодня"),
+    current_user: Dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Заказы выгульщика на дату и свободные окна рабочего дня"""
+    try:
+        from datetime import datetime
+        schedule_date = datetime.fromisoformat(date) if date else datetime.utcnow()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный формат даты")
+
+    try:
+        return await MatchingService.get_walker_schedule(db, current_user["user_id"], schedule_date)
+
+    except Exception as e:
+        logger.error(f"Error getting walker schedule: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка получения расписания")
+
+
 @router.get("/statistics/summary", summary="Получение статистики заказов")
 async def get_order_statistics(
     current_user: Dict = Depends(get_current_user),
@@ -335,3 +357,43 @@ async def get_price_breakdown(
     except Exception as e:
         logger.error(f"Error getting price breakdown: {e}")
         raise HTTPException(status_code=500, detail="Ошибка получения разбивки стоимости")
+
+
+@router.post("/matching/run", summary="Запуск пакетного подбора выгульщиков")
+async def run_batch_matching(
+    request: Request,
+    current_user: Dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Немедленный запуск пакетного подбора; предложения сохраняются до подтверждения выгульщиком.
+
+    Возвращается сводка запуска (число заказов и предложений, заполнение, длительность)
+    без самих предложений: их видит только выгульщик в `/walker/pending`.
+    """
+    try:
+        result = await request.app.state.batch_matcher.run(db)
+        if result is None:
+            raise HTTPException(status_code=409, detail="Подбор уже выполняется")
+
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running batch matching: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка пакетного подбора")
+
+
+@router.get("/matching/stats", summary="Статистика пакетного подбора")
+async def get_batch_matching_stats(
+    request: Request,
+    current_user: Dict = Depends(get_current_user)
+):
+    """Число запусков и сводка последнего запуска (заполнение, расстояние, длительность)"""
+    return request.app.state.batch_matcher.get_stats()
+
+
+@router.get("/pricing/surface", summary="Состояние сетки базовых ставок")
+async def get_price_surface_stats():
+    """Время сборки, точность и число ячеек сетки ставок по районам"""
+    return price_surface.get_stats()
@@ -78,6 +78,32 @@ class Settings(BaseSettings):
     # Геолокационные настройки
     max_search_distance: float = float(os.getenv("MAX_SEARCH_DISTANCE", "10000"))  # Максимальная дистанция поиска в метрах
     default_search_radius: float = float(os.getenv("DEFAULT_SEARCH_RADIUS", "3000"))  # Радиус поиска по умолчанию
+    walker_cell_precision: int = int(os.getenv("WALKER_CELL_PRECISION", "5"))  # Длина geohash ячейки кэша выгульщиков (5 ~ 4.9x4.9 км)
+    walker_cell_cache_ttl: int = int(os.getenv("WALKER_CELL_CACHE_TTL", "300"))  # TTL ячейки в секундах (страховка при потере событий)
+    walker_location_channel: str = os.getenv("WALKER_LOCATION_CHANNEL", "walker_location_updates")  # Канал Redis с перемещениями выгульщиков
+
+    # Пакетный подбор выгульщиков
+    batch_matching_enabled: bool = os.getenv("BATCH_MATCHING_ENABLED", "true").lower() == "true"
+    batch_matching_interval: float = float(os.getenv("BATCH_MATCHING_INTERVAL", "5"))  # Период запуска в секундах
+    batch_matching_horizon: int = int(os.getenv("BATCH_MATCHING_HORIZON", "120"))  # Заказы, начинающиеся в ближайшие N минут
+    batch_matching_max_orders: int = int(os.getenv("BATCH_MATCHING_MAX_ORDERS", "200"))  # Заказов за один запуск
+    matching_rating_weight: float = float(os.getenv("MATCHING_RATING_WEIGHT", "0.7"))  # Вес рейтинга в стоимости назначения
+    matching_distance_weight: float = float(os.getenv("MATCHING_DISTANCE_WEIGHT", "0.3"))  # Вес расстояния (доля радиуса поиска)
+    matching_lateness_weight: float = float(os.getenv("MATCHING_LATENESS_WEIGHT", "1.0"))  # Вес опоздания к началу заказа (за час)
+
+    # Индекс занятости выгульщиков
+    availability_reload_interval: int = int(os.getenv("AVAILABILITY_RELOAD_INTERVAL", "600"))  # Полная перезагрузка из БД, секунды
+    availability_channel: str = os.getenv("AVAILABILITY_CHANNEL", "order_availability_updates")  # Канал Redis с изменениями занятости
+    walker_work_day_start: int = int(os.getenv("WALKER_WORK_DAY_START", "7"))  # Начало рабочего дня для свободных окон (час, UTC)
+    walker_work_day_end: int = int(os.getenv("WALKER_WORK_DAY_END", "22"))  # Конец рабочего дня для свободных окон (час, UTC)
+
+    # Сетка базовых ставок по районам
+    price_surface_enabled: bool = os.getenv("PRICE_SURFACE_ENABLED", "true").lower() == "true"
+    price_surface_interval: int = int(os.getenv("PRICE_SURFACE_INTERVAL", "600"))  # Период пересборки в секундах
+    price_surface_precision: int = int(os.getenv("PRICE_SURFACE_PRECISION", "6"))  # Длина geohash ячейки (6 ~ 1.2 x 0.6 км)
+    price_surface_radius: int = int(os.getenv("PRICE_SURFACE_RADIUS", "5000"))  # Радиус района ставки и спроса в метрах
+    price_surface_order_window_hours: int = int(os.getenv("PRICE_SURFACE_ORDER_WINDOW_HOURS", "24"))  # Окно заказов для спроса и ставок
+    price_surface_order_weight: float = float(os.getenv("PRICE_SURFACE_ORDER_WEIGHT", "0.3"))  # Доля ставки завершённых заказов в базовой
 
     # Временные ограничения
     min_order_duration: int = int(os.getenv("MIN_ORDER_DURATION", "30"))  # Минимальная продолжительность заказа в минутах
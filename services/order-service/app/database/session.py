@@ -3,15 +3,16 @@
 
 Назначение:
 - Кэширование заказов и их списков
-- Кэширование результатов геопоиска выгульщиков
-- Флаги ожидающих подтверждения заказов
+- Кэш выгульщиков по geohash-ячейкам (с поколениями для инвалидации)
+- Флаги ожидающих подтверждения заказов и предложения пакетного подбора
 
 Используется сервисами: `OrderService`, `MatchingService`, `GatewayService` (через общее подключение).
 """
 
 import json
 import logging
-from typing import Optional, Dict, Any, List
+import uuid
+from typing import Optional, Dict, Any, List, Tuple
 import redis.asyncio as redis
 
 from app.config import settings
@@ -154,26 +155,211 @@ class RedisSession:
             logger.error(f"Error removing pending order {order_id} for walker {walker_id}: {e}")
             return False
 
-    async def cache_nearby_walkers(self, location_key: str, walkers_data: List[Dict[str, Any]], expire: int = 600):
-        """Кэширование списка выгульщиков рядом по ключу местоположения."""
+    async def get_active_match_proposals(
+        self,
+        order_ids: List[str],
+        walker_ids: List[str]
+    ) -> Tuple[set, set]:
+        """Заказы и выгульщики, у которых уже есть неподтверждённое предложение"""
+        if not order_ids and not walker_ids:
+            return set(), set()
         try:
-            await self.redis.setex(f"nearby_walkers:{location_key}", expire, json.dumps(walkers_data))
+            keys = [f"match_proposal:{order_id}" for order_id in order_ids]
+            keys += [f"walker_proposal:{walker_id}" for walker_id in walker_ids]
+            values = await self.redis.mget(keys)
+            orders = {order_id for order_id, value in zip(order_ids, values) if value is not None}
+            walkers = {
+                walker_id for walker_id, value in zip(walker_ids, values[len(order_ids):])
+                if value is not None
+            }
+            return orders, walkers
+        except Exception as e:
+            logger.error(f"Error getting active match proposals: {e}")
+            return set(), set()
+
+    async def set_match_proposals(self, proposals: List[Tuple[str, str]], expire: int = 300):
+        """Сохранение предложений (order_id, walker_id) до подтверждения выгульщиком"""
+        if not proposals:
+            return True
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for order_id, walker_id in proposals:
+                    pipe.setex(f"pending_order:{walker_id}:{order_id}", expire, "1")
+                    pipe.setex(f"match_proposal:{order_id}", expire, walker_id)
+                    pipe.setex(f"walker_proposal:{walker_id}", expire, order_id)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error setting match proposals: {e}")
+            return False
+
+    async def get_match_proposals(self, order_ids: List[str]) -> Dict[str, str]:
+        """Выгульщики, которым предложены заказы: order_id -> walker_id (только активные)"""
+        if not order_ids:
+            return {}
+        try:
+            values = await self.redis.mget([f"match_proposal:{order_id}" for order_id in order_ids])
+            return {order_id: value for order_id, value in zip(order_ids, values) if value is not None}
+        except Exception as e:
+            logger.error(f"Error getting match proposals: {e}")
+            return {}
+
+    async def get_walker_proposal(self, walker_id: str) -> Optional[str]:
+        """Заказ, предложенный выгульщику пакетным подбором"""
+        try:
+            return await self.redis.get(f"walker_proposal:{walker_id}")
+        except Exception as e:
+            logger.error(f"Error getting match proposal for walker {walker_id}: {e}")
+            return None
+
+    async def remove_match_proposal(self, order_id: str):
+        """Удаление предложения по заказу (подтверждение или отмена)"""
+        try:
+            walker_id = await self.redis.get(f"match_proposal:{order_id}")
+            keys = [f"match_proposal:{order_id}"]
+            if walker_id:
+                keys += [f"pending_order:{walker_id}:{order_id}", f"walker_proposal:{walker_id}"]
+            await self.redis.delete(*keys)
             return True
         except Exception as e:
-            logger.error(f"Error caching nearby walkers for {location_key}: {e}")
+            logger.error(f"Error removing match proposal for order {order_id}: {e}")
             return False
 
-    async def get_cached_nearby_walkers(self, location_key: str) -> Optional[List[Dict[str, Any]]]:
-        """Получение кэшированного списка выгульщиков рядом по ключу местоположения."""
+    async def publish_order_availability(self, event: Dict[str, Any]):
+        """Публикация изменения занятости выгульщика для индексов других реплик"""
         try:
-            data = await self.redis.get(f"nearby_walkers:{location_key}")
+            await self.redis.publish(settings.availability_channel, json.dumps(event))
+            return True
+        except Exception as e:
+            logger.error(f"Error publishing availability for order {event.get('order_id')}: {e}")
+            return False
+
+    async def save_price_surface(self, snapshot: Dict[str, Any], expire: int):
+        """Снимок сетки базовых ставок для других реплик"""
+        try:
+            await self.redis.setex("price_surface", expire, json.dumps(snapshot))
+            return True
+        except Exception as e:
+            logger.error(f"Error saving price surface: {e}")
+            return False
+
+    async def get_price_surface(self) -> Optional[Dict[str, Any]]:
+        """Снимок сетки базовых ставок"""
+        try:
+            data = await self.redis.get("price_surface")
             if data:
                 return json.loads(data)
             return None
         except Exception as e:
-            logger.error(f"Error getting cached nearby walkers for {location_key}: {e}")
+            logger.error(f"Error getting price surface: {e}")
+            return None
+
+    async def acquire_lock(self, name: str, expire: int) -> Optional[str]:
+        """Блокировка между репликами (SET NX); токен владельца или None, если уже занята"""
+        token = uuid.uuid4().hex
+        try:
+            if await self.redis.set(f"lock:{name}", token, nx=True, ex=expire):
+                return token
+            return None
+        except Exception as e:
+            logger.error(f"Error acquiring lock {name}: {e}")
             return None
 
+    async def release_lock(self, name: str, token: str):
+        """Освобождение блокировки, только если она всё ещё принадлежит владельцу токена.
+
+        Если работа пережила TTL и блокировку взяла другая реплика, её блокировка не удаляется.
+        """
+        try:
+            return bool(await self.redis.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{name}", token))
+        except Exception as e:
+            logger.error(f"Error releasing lock {name}: {e}")
+            return False
+
+    async def get_walker_cells(self, cells: List[str]) -> Tuple[Dict[str, Optional[List[Dict[str, Any]]]], Dict[str, str]]:
+        """Выгульщики ячеек и поколения ячеек одним MGET.
+
+        Возвращает (данные ячеек — None для промаха, поколения ячеек — для `cache_walker_cells`).
+        """
+        try:
+            keys = [f"walker_cell:{cell}" for cell in cells] + [f"walker_cell_gen:{cell}" for cell in cells]
+            values = await self.redis.mget(keys)
+            cached = {
+                cell: json.loads(value) if value is not None else None
+                for cell, value in zip(cells, values[:len(cells)])
+            }
+            generations = {cell: value or "" for cell, value in zip(cells, values[len(cells):])}
+            return cached, generations
+        except Exception as e:
+            logger.error(f"Error getting walker cells: {e}")
+            return {cell: None for cell in cells}, {cell: "" for cell in cells}
+
+    async def cache_walker_cells(
+        self,
+        cells_data: Dict[str, List[Dict[str, Any]]],
+        generations: Dict[str, str],
+        expire: int
+    ):
+        """Запись ячеек, поколение которых не изменилось с момента чтения.
+
+        Если выгульщик переместился, пока ячейка загружалась из БД, инвалидация увеличит
+        поколение, и устаревший результат не будет записан.
+        """
+        if not cells_data:
+            return True
+        try:
+            keys = []
+            args = [expire]
+            for cell, walkers in cells_data.items():
+                keys.extend((f"walker_cell:{cell}", f"walker_cell_gen:{cell}"))
+                args.extend((generations.get(cell, ""), json.dumps(walkers)))
+            await self.redis.eval(_CACHE_WALKER_CELLS_SCRIPT, len(keys), *keys, *args)
+            return True
+        except Exception as e:
+            logger.error(f"Error caching walker cells: {e}")
+            return False
+
+    async def invalidate_walker_cells(self, cells: List[str]):
+        """Удаление ячеек и увеличение их поколений"""
+        if not cells:
+            return True
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for cell in cells:
+                    pipe.incr(f"walker_cell_gen:{cell}")
+                    pipe.expire(f"walker_cell_gen:{cell}", WALKER_CELL_GENERATION_TTL)
+                    pipe.delete(f"walker_cell:{cell}")
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error invalidating walker cells {cells}: {e}")
+            return False
+
+
+# Поколение ячейки живёт дольше самой ячейки, чтобы пережить загрузку из БД
+WALKER_CELL_GENERATION_TTL = 86400
+
+# KEYS: пары (ключ ячейки, ключ поколения); ARGV: TTL, затем пары (ожидаемое поколение, данные)
+_CACHE_WALKER_CELLS_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+for i = 1, #KEYS, 2 do
+    local generation = redis.call('GET', KEYS[i + 1]) or ''
+    local arg = i + 1
+    if generation == ARGV[arg] then
+        redis.call('SET', KEYS[i], ARGV[arg + 1], 'EX', ttl)
+    end
+end
+return 1
+"""
+
+# KEYS[1]: ключ блокировки; ARGV[1]: токен владельца
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
 # Глобальный экземпляр Redis сессии
 redis_session = RedisSession()
@@ -5,5 +5,6 @@
 from .order_service import OrderService
 from .matching_service import MatchingService
 from .pricing_service import PricingService
+from .batch_matcher import BatchMatcher
 
-__all__ = ["OrderService", "MatchingService", "PricingService"]
+__all__ = ["OrderService", "MatchingService", "PricingService", "BatchMatcher"]
@@ -0,0 +1,366 @@
+"""
+Индекс занятости выгульщиков.
+
+Назначение:
+- Хранит занятые интервалы каждого выгульщика на ближайшие дни в отсортированном виде
+- Отвечает «свободен ли выгульщик в [t, t+d)» и проверяет дневной лимит без запросов к БД,
+  в том числе пакетно для многих выгульщиков
+- Считает свободные окна для расписания выгульщика
+
+Загружается из `orders` одним запросом при старте и периодически перезагружается
+(`availability_reload_interval`). Между перезагрузками обновляется при создании,
+изменении, подтверждении, начале и завершении прогулки и отмене заказа; изменения
+публикуются в канал Redis (`availability_channel`), чтобы индекс других реплик
+оставался актуальным.
+Изменения, пришедшие во время перезагрузки, повторно применяются к новому индексу
+перед подменой и не теряются.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.connection import async_session
+from app.database.session import get_session
+from app.models.order import Order, OrderStatus
+
+logger = logging.getLogger(__name__)
+
+# Статусы, учитываемые в дневном лимите выгульщика
+BUSY_STATUSES = (OrderStatus.CONFIRMED, OrderStatus.IN_PROGRESS, OrderStatus.COMPLETED)
+
+# Статусы, занимающие время: завершённая (в том числе досрочно) прогулка интервал не занимает
+BLOCKING_STATUSES = (OrderStatus.CONFIRMED, OrderStatus.IN_PROGRESS)
+
+
+class WalkerSchedule:
+    """Интервалы заказов одного выгульщика, отсортированные по началу.
+
+    Все интервалы входят в дневной лимит; пересечения проверяются только с занимающими
+    (`blocking`). `max_ends[i]` — наибольший конец среди занимающих интервалов 0..i
+    (None, если таких нет): пересечение с [start, end) есть, если у интервалов,
+    начавшихся до `end`, наибольший конец больше `start`.
+    """
+
+    __slots__ = ("starts", "ends", "order_ids", "blocking", "max_ends")
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        self.order_ids: List[str] = []
+        self.blocking: List[bool] = []
+        self.max_ends: List[Optional[datetime]] = []
+
+    def add(self, order_id: str, start: datetime, end: datetime, blocking: bool = True):
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.order_ids.insert(position, order_id)
+        self.blocking.insert(position, blocking)
+        self.max_ends.insert(position, None)
+        self._rebuild_max_ends(position)
+
+    def append(self, order_id: str, start: datetime, end: datetime, blocking: bool):
+        """Добавление в конец (интервалы поступают по возрастанию начала)"""
+        previous = self.max_ends[-1] if self.max_ends else None
+        self.starts.append(start)
+        self.ends.append(end)
+        self.order_ids.append(order_id)
+        self.blocking.append(blocking)
+        self.max_ends.append(end if blocking and (previous is None or end > previous) else previous)
+
+    def remove(self, order_id: str) -> bool:
+        try:
+            position = self.order_ids.index(order_id)
+        except ValueError:
+            return False
+        del self.starts[position]
+        del self.ends[position]
+        del self.order_ids[position]
+        del self.blocking[position]
+        del self.max_ends[position]
+        self._rebuild_max_ends(position)
+        return True
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """Есть ли занимающий интервал, пересекающий [start, end)"""
+        count = bisect_left(self.starts, end)
+        if count == 0:
+            return False
+        max_end = self.max_ends[count - 1]
+        return max_end is not None and max_end > start
+
+    def count_starting(self, start: datetime, end: datetime) -> int:
+        """Число интервалов, начинающихся в [start, end)"""
+        return bisect_left(self.starts, end) - bisect_left(self.starts, start)
+
+    def busy_between(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime, str, bool]]:
+        """Интервалы, пересекающие [start, end), по возрастанию начала: (начало, конец, заказ, занимает)"""
+        count = bisect_left(self.starts, end)
+        return [
+            (self.starts[i], self.ends[i], self.order_ids[i], self.blocking[i])
+            for i in range(count)
+            if self.ends[i] > start
+        ]
+
+    def _rebuild_max_ends(self, position: int):
+        previous = self.max_ends[position - 1] if position > 0 else None
+        for i in range(position, len(self.ends)):
+            if self.blocking[i] and (previous is None or self.ends[i] > previous):
+                previous = self.ends[i]
+            self.max_ends[i] = previous
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class AvailabilityIndex:
+    """Занятость всех выгульщиков в окне [сегодня, сегодня + max_advance_booking_days]"""
+
+    def __init__(self):
+        self.schedules: Dict[str, WalkerSchedule] = {}
+        # order_id -> walker_id: перенос и отмена заказа без поиска по всем выгульщикам
+        self.order_walkers: Dict[str, str] = {}
+        self.loaded = False
+        self.loaded_at: Optional[datetime] = None
+        self.instance_id = uuid.uuid4().hex
+        # Изменения, применённые во время загрузки (None — загрузка не идёт)
+        self._pending_changes: Optional[List[Tuple[str, Optional[str], datetime, int, OrderStatus]]] = None
+
+    # Загрузка и обновление
+
+    async def load(self, db: AsyncSession):
+        """Полная загрузка окна одним запросом; индекс подменяется целиком.
+
+        Пока запрос выполняется, изменения применяются к текущему индексу и запоминаются;
+        после загрузки они повторяются на новом индексе (состояние заказа идемпотентно),
+        поэтому снимок не затирает изменения, которых ещё не было в выборке.
+        """
+        window_start, window_end = self._window()
+        self._pending_changes = []
+        try:
+            result = await db.execute(
+                select(Order.id, Order.walker_id, Order.scheduled_at, Order.duration_minutes, Order.status).where(
+                    and_(
+                        Order.walker_id.isnot(None),
+                        Order.status.in_(BUSY_STATUSES),
+                        Order.scheduled_at >= window_start,
+                        Order.scheduled_at < window_end
+                    )
+                ).order_by(Order.scheduled_at)
+            )
+            rows = result.fetchall()
+        except BaseException:
+            self._pending_changes = None
+            raise
+
+        schedules: Dict[str, WalkerSchedule] = {}
+        order_walkers: Dict[str, str] = {}
+        for order_id, walker_id, scheduled_at, duration_minutes, status in rows:
+            # Строки отсортированы по началу: добавление в конец без сдвигов
+            schedules.setdefault(walker_id, WalkerSchedule()).append(
+                order_id,
+                scheduled_at,
+                scheduled_at + timedelta(minutes=duration_minutes),
+                OrderStatus(status) in BLOCKING_STATUSES
+            )
+            order_walkers[order_id] = walker_id
+
+        # Между выборкой и подменой нет await: новые изменения сюда уже не попадут
+        pending_changes, self._pending_changes = self._pending_changes, None
+        self.schedules = schedules
+        self.order_walkers = order_walkers
+        for change in pending_changes:
+            self.apply(*change)
+        self.loaded = True
+        self.loaded_at = datetime.utcnow()
+        logger.info(f"Availability index loaded: {len(order_walkers)} bookings, {len(schedules)} walkers")
+
+    def apply(
+        self,
+        order_id: str,
+        walker_id: Optional[str],
+        scheduled_at: datetime,
+        duration_minutes: int,
+        status: OrderStatus
+    ):
+        """Актуальное состояние заказа: занятый интервал добавляется, переносится или удаляется"""
+        if self._pending_changes is not None:
+            self._pending_changes.append((order_id, walker_id, scheduled_at, duration_minutes, status))
+
+        self.remove(order_id)
+        status = OrderStatus(status)
+        if walker_id is None or status not in BUSY_STATUSES:
+            return
+
+        self.schedules.setdefault(walker_id, WalkerSchedule()).add(
+            order_id,
+            scheduled_at,
+            scheduled_at + timedelta(minutes=duration_minutes),
+            status in BLOCKING_STATUSES
+        )
+        self.order_walkers[order_id] = walker_id
+
+    def remove(self, order_id: str):
+        walker_id = self.order_walkers.pop(order_id, None)
+        if walker_id is None:
+            return
+        schedule = self.schedules.get(walker_id)
+        if schedule is not None:
+            schedule.remove(order_id)
+            if not schedule:
+                del self.schedules[walker_id]
+
+    async def order_changed(self, order: Order):
+        """Применение изменения заказа и публикация для других реплик"""
+        self.apply(order.id, order.walker_id, order.scheduled_at, order.duration_minutes, order.status)
+
+        redis_session = await get_session()
+        await redis_session.publish_order_availability({
+            "source": self.instance_id,
+            "order_id": order.id,
+            "walker_id": order.walker_id,
+            "scheduled_at": order.scheduled_at.isoformat(),
+            "duration_minutes": order.duration_minutes,
+            "status": OrderStatus(order.status).value
+        })
+
+    # Запросы
+
+    def is_free(self, walker_id: str, start: datetime, duration_minutes: int) -> bool:
+        """Свободен ли выгульщик в [start, start + duration) с учётом дневного лимита.
+
+        Как и запрос `MatchingService.check_walker_availability`: пересечения — с подтверждёнными
+        и идущими прогулками, дневной лимит — вместе с завершёнными.
+        """
+        schedule = self.schedules.get(walker_id)
+        if schedule is None:
+            return True
+
+        end = start + timedelta(minutes=duration_minutes)
+        if schedule.overlaps(start, end):
+            return False
+
+        day_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        return schedule.count_starting(day_start, day_start + timedelta(days=1)) < settings.max_orders_per_day
+
+    def free_walkers(self, walker_ids: Iterable[str], start: datetime, duration_minutes: int) -> Dict[str, bool]:
+        """Пакетная проверка одного интервала для многих выгульщиков"""
+        return {walker_id: self.is_free(walker_id, start, duration_minutes) for walker_id in walker_ids}
+
+    def busy_intervals(
+        self,
+        walker_ids: Iterable[str],
+        start: datetime,
+        end: datetime
+    ) -> List[Tuple[str, datetime, datetime, bool]]:
+        """Интервалы заказов выгульщиков в [start, end): (walker_id, начало, конец, занимает)"""
+        intervals = []
+        for walker_id in walker_ids:
+            schedule = self.schedules.get(walker_id)
+            if schedule is None:
+                continue
+            for interval_start, interval_end, _, blocking in schedule.busy_between(start, end):
+                intervals.append((walker_id, interval_start, interval_end, blocking))
+        return intervals
+
+    def free_slots(
+        self,
+        walker_id: str,
+        start: datetime,
+        end: datetime,
+        min_duration_minutes: int
+    ) -> List[Tuple[datetime, datetime]]:
+        """Свободные окна в [start, end) не короче min_duration_minutes"""
+        min_duration = timedelta(minutes=min_duration_minutes)
+        schedule = self.schedules.get(walker_id)
+        busy = schedule.busy_between(start, end) if schedule is not None else []
+
+        slots = []
+        cursor = start
+        for busy_start, busy_end, _, blocking in busy:
+            if not blocking:
+                continue
+            if busy_start - cursor >= min_duration:
+                slots.append((cursor, busy_start))
+            if busy_end > cursor:
+                cursor = busy_end
+        if end - cursor >= min_duration:
+            slots.append((cursor, end))
+        return slots
+
+    # Фоновые задачи
+
+    async def start(self):
+        """Первичная загрузка и периодическая перезагрузка (страховка от пропущенных событий)"""
+        while True:
+            try:
+                async with async_session() as db:
+                    await self.load(db)
+                await asyncio.sleep(settings.availability_reload_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Availability index load failed: {e}")
+                await asyncio.sleep(10)
+
+    async def listen(self):
+        """Применение изменений заказов, опубликованных другими репликами"""
+        redis_session = await get_session()
+
+        while True:
+            pubsub = redis_session.redis.pubsub()
+            try:
+                await pubsub.subscribe(settings.availability_channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        event = json.loads(message["data"])
+                        if event.get("source") == self.instance_id:
+                            continue
+                        self.apply(
+                            event["order_id"],
+                            event.get("walker_id"),
+                            datetime.fromisoformat(event["scheduled_at"]),
+                            int(event["duration_minutes"]),
+                            OrderStatus(event["status"])
+                        )
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning(f"Invalid availability event: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Availability listener error: {e}")
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "walkers": len(self.schedules),
+            "bookings": len(self.order_walkers)
+        }
+
+    @staticmethod
+    def _window() -> Tuple[datetime, datetime]:
+        # Заказы, начатые вчера, могут занимать начало сегодняшнего дня
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        return today - timedelta(days=1), today + timedelta(days=settings.max_advance_booking_days + 1)
+
+
+# Глобальный индекс процесса
+availability_index = AvailabilityIndex()
@@ -0,0 +1,348 @@
+"""
+Пакетный подбор выгульщиков для ожидающих заказов.
+
+Назначение:
+- Периодически (`batch_matching_interval`) или по запросу собирает ожидающие заказы
+  и выгульщиков из ячеек вокруг них
+- Строит матрицу стоимости назначений в NumPy (расстояние, рейтинг, занятость, опоздание)
+- Решает задачу о назначениях глобально (венгерский алгоритм, `linear_sum_assignment`)
+- Сохраняет предложения в Redis до подтверждения выгульщиком (`confirm_order`)
+
+В отличие от `MatchingService.match_order_to_walker` заказы не конкурируют за одного
+выгульщика: за запуск выполняется один запрос заказов, занятость берётся из индекса
+(`AvailabilityIndex`), выгульщики — из кэша ячеек. Запуск между репликами исключается
+блокировкой в Redis.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+from scipy.optimize import linear_sum_assignment
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.connection import async_session
+from app.database.session import get_session
+from app.models.order import Order, OrderStatus
+from app.services import geohash
+from app.services.availability_index import BLOCKING_STATUSES, BUSY_STATUSES, availability_index
+from app.services.matching_service import MatchingService
+from app.utils import geodesy
+
+logger = logging.getLogger(__name__)
+
+MATCHING_DURATION = Histogram(
+    "order_matching_duration_seconds",
+    "Длительность пакетного подбора по этапам: total, solve",
+    ["stage"],
+)
+MATCHING_ORDERS = Counter(
+    "order_matching_orders_total",
+    "Заказы пакетного подбора по результату: proposed, unmatched",
+    ["result"],
+)
+MATCHING_FILL_RATE = Gauge(
+    "order_matching_fill_rate",
+    "Доля заказов последнего запуска, получивших предложение",
+)
+MATCHING_MEAN_DISTANCE = Gauge(
+    "order_matching_mean_distance_meters",
+    "Среднее расстояние до выгульщика в предложениях последнего запуска",
+)
+MATCHING_MEAN_COST = Gauge(
+    "order_matching_mean_cost",
+    "Средняя стоимость назначения в последнем запуске",
+)
+
+LOCK_NAME = "batch_matching"
+
+# Средняя скорость выгульщика пешком, км/ч
+WALKING_SPEED_KMH = 5.0
+
+# Стоимость недопустимой пары: больше любой допустимой, но конечна для решателя
+INFEASIBLE_COST = 1e6
+
+
+class BatchMatcher:
+    """Глобальное назначение выгульщиков ожидающим заказам"""
+
+    def __init__(self):
+        self.runs = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._run_lock = asyncio.Lock()
+
+    async def start(self):
+        """Периодический запуск подбора"""
+        while True:
+            try:
+                await asyncio.sleep(settings.batch_matching_interval)
+                async with async_session() as db:
+                    await self.run(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Batch matching failed: {e}")
+
+    async def run(self, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """Один запуск подбора; None, если подбор уже выполняется этой или другой репликой"""
+        if self._run_lock.locked():
+            return None
+
+        async with self._run_lock:
+            redis_session = await get_session()
+            lock_ttl = max(int(settings.batch_matching_interval * 2), 30)
+            lock_token = await redis_session.acquire_lock(LOCK_NAME, lock_ttl)
+            if lock_token is None:
+                return None
+            try:
+                return await self._run(db)
+            finally:
+                await redis_session.release_lock(LOCK_NAME, lock_token)
+
+    async def _run(self, db: AsyncSession) -> Dict[str, Any]:
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        redis_session = await get_session()
+
+        orders = await self._load_pending_orders(db, now)
+        walkers = await self._load_candidate_walkers(db, orders)
+
+        proposed_orders, proposed_walkers = await redis_session.get_active_match_proposals(
+            [order.id for order in orders], [walker["id"] for walker in walkers]
+        )
+        orders = [order for order in orders if order.id not in proposed_orders]
+        walkers = [walker for walker in walkers if walker["id"] not in proposed_walkers]
+
+        proposals: List[Dict[str, Any]] = []
+        solve_seconds = 0.0
+        if orders and walkers:
+            busy = await self._load_busy_intervals(db, orders, walkers, now)
+            cost, feasible, distance_km = self._build_cost_matrix(orders, walkers, busy, now)
+
+            solve_started = time.perf_counter()
+            rows, cols = await asyncio.to_thread(self._solve, cost, feasible)
+            solve_seconds = time.perf_counter() - solve_started
+
+            for row, col in zip(rows, cols):
+                distance_meters = float(distance_km[row, col]) * 1000
+                proposals.append({
+                    "order_id": orders[row].id,
+                    "walker_id": walkers[col]["id"],
+                    "distance": distance_meters,
+                    "estimated_arrival_minutes": int(distance_meters / 1000 / WALKING_SPEED_KMH * 60),
+                    "cost": float(cost[row, col])
+                })
+
+            await redis_session.set_match_proposals(
+                [(proposal["order_id"], proposal["walker_id"]) for proposal in proposals],
+                expire=settings.order_confirmation_timeout
+            )
+
+        total_seconds = time.perf_counter() - started
+        result = self._record(orders, walkers, proposals, total_seconds, solve_seconds, now)
+        if proposals:
+            logger.info(
+                f"Batch matching proposed {len(proposals)} of {len(orders)} orders "
+                f"in {total_seconds * 1000:.1f} ms"
+            )
+        return result
+
+    async def _load_pending_orders(self, db: AsyncSession, now: datetime) -> List[Order]:
+        """Ожидающие заказы без выгульщика, начинающиеся в пределах горизонта"""
+        result = await db.execute(
+            select(Order).where(
+                and_(
+                    Order.status == OrderStatus.PENDING,
+                    Order.walker_id.is_(None),
+                    Order.scheduled_at > now,
+                    Order.scheduled_at <= now + timedelta(minutes=settings.batch_matching_horizon)
+                )
+            ).order_by(Order.scheduled_at).limit(settings.batch_matching_max_orders)
+        )
+        return list(result.scalars().all())
+
+    async def _load_candidate_walkers(self, db: AsyncSession, orders: List[Order]) -> List[Dict[str, Any]]:
+        """Выгульщики из ячеек, покрывающих радиус поиска вокруг каждого заказа"""
+        if not orders:
+            return []
+
+        cells = set()
+        for order in orders:
+            cells.update(geohash.covering_cells(
+                order.latitude, order.longitude,
+                settings.default_search_radius, settings.walker_cell_precision
+            ))
+
+        cells_data = await MatchingService.get_walkers_in_cells(db, sorted(cells))
+
+        walkers: Dict[str, Dict[str, Any]] = {}
+        for cell_walkers in cells_data.values():
+            for walker in cell_walkers:
+                walkers[walker["id"]] = walker
+        return list(walkers.values())
+
+    async def _load_busy_intervals(
+        self,
+        db: AsyncSession,
+        orders: List[Order],
+        walkers: List[Dict[str, Any]],
+        now: datetime
+    ) -> List[Tuple[str, datetime, datetime, bool]]:
+        """Заказы кандидатов за дни пакета: (walker_id, начало, конец, занимает время)"""
+        first_day = min(order.scheduled_at for order in orders).replace(hour=0, minute=0, second=0, microsecond=0)
+        window_start = min(first_day, now - timedelta(minutes=settings.max_order_duration))
+        window_end = max(order.scheduled_at for order in orders).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) + timedelta(days=1)
+        walker_ids = [walker["id"] for walker in walkers]
+
+        if availability_index.loaded:
+            return availability_index.busy_intervals(walker_ids, window_start, window_end)
+
+        result = await db.execute(
+            select(Order.walker_id, Order.scheduled_at, Order.duration_minutes, Order.status).where(
+                and_(
+                    Order.walker_id.in_(walker_ids),
+                    Order.status.in_(BUSY_STATUSES),
+                    Order.scheduled_at >= window_start,
+                    Order.scheduled_at < window_end
+                )
+            )
+        )
+        return [
+            (
+                walker_id,
+                scheduled_at,
+                scheduled_at + timedelta(minutes=duration_minutes),
+                OrderStatus(status) in BLOCKING_STATUSES
+            )
+            for walker_id, scheduled_at, duration_minutes, status in result.fetchall()
+        ]
+
+    def _build_cost_matrix(
+        self,
+        orders: List[Order],
+        walkers: List[Dict[str, Any]],
+        busy: List[Tuple[str, datetime, datetime, bool]],
+        now: datetime
+    ):
+        """Матрица стоимости (заказы x выгульщики), маска допустимых пар и расстояния в км"""
+        order_lat = np.array([order.latitude for order in orders], dtype=np.float64)
+        order_lon = np.array([order.longitude for order in orders], dtype=np.float64)
+        order_start = np.array([order.scheduled_at.timestamp() for order in orders], dtype=np.float64)
+        order_end = order_start + np.array([order.duration_minutes for order in orders], dtype=np.float64) * 60
+        order_day = np.array([order.scheduled_at.date().toordinal() for order in orders], dtype=np.int64)
+
+        walker_lat = np.array([walker["latitude"] for walker in walkers], dtype=np.float64)
+        walker_lon = np.array([walker["longitude"] for walker in walkers], dtype=np.float64)
+        walker_rating = np.array([walker["rating"] for walker in walkers], dtype=np.float64)
+
+        radius_km = settings.default_search_radius / 1000
+        distance_km = geodesy.pairwise(order_lat, order_lon, walker_lat, walker_lon) / 1000
+
+        # Занятость: пересечение с подтверждёнными заказами и дневной лимит
+        available = np.ones(distance_km.shape, dtype=bool)
+        if busy:
+            walker_index = {walker["id"]: index for index, walker in enumerate(walkers)}
+            busy_walker = np.array([walker_index[walker_id] for walker_id, _, _, _ in busy], dtype=np.int64)
+            busy_start = np.array([start.timestamp() for _, start, _, _ in busy], dtype=np.float64)
+            busy_end = np.array([end.timestamp() for _, _, end, _ in busy], dtype=np.float64)
+            busy_day = np.array([start.date().toordinal() for _, start, _, _ in busy], dtype=np.int64)
+            # Завершённые прогулки входят в дневной лимит, но время не занимают
+            busy_blocking = np.array([blocking for _, _, _, blocking in busy], dtype=bool)
+
+            # Принадлежность занятого интервала выгульщику: (интервалы x выгульщики)
+            owner = np.zeros((len(busy), len(walkers)), dtype=np.int32)
+            owner[np.arange(len(busy)), busy_walker] = 1
+
+            overlap = (
+                busy_blocking[None, :]
+                & (busy_start[None, :] < order_end[:, None])
+                & (busy_end[None, :] > order_start[:, None])
+            )
+            same_day = order_day[:, None] == busy_day[None, :]
+
+            conflicts = overlap.astype(np.int32) @ owner
+            daily_orders = same_day.astype(np.int32) @ owner
+            available = (conflicts == 0) & (daily_orders < settings.max_orders_per_day)
+
+        # Опоздание к началу заказа, если выгульщик выйдет сейчас (в часах)
+        arrival = now.timestamp() + distance_km / WALKING_SPEED_KMH * 3600
+        lateness_hours = np.maximum(arrival - order_start[:, None], 0.0) / 3600
+
+        cost = (
+            settings.matching_rating_weight * ((5.0 - walker_rating) / 5.0)[None, :]
+            + settings.matching_distance_weight * (distance_km / radius_km)
+            + settings.matching_lateness_weight * lateness_hours
+        )
+
+        feasible = available & (distance_km <= radius_km)
+        cost = np.where(feasible, cost, INFEASIBLE_COST)
+        return cost, feasible, distance_km
+
+    @staticmethod
+    def _solve(cost: np.ndarray, feasible: np.ndarray):
+        """Назначение минимальной суммарной стоимости без недопустимых пар"""
+        # Строки и столбцы без допустимых пар только увеличивают матрицу
+        order_rows = np.flatnonzero(feasible.any(axis=1))
+        walker_cols = np.flatnonzero(feasible.any(axis=0))
+        if order_rows.size == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+        reduced = cost[np.ix_(order_rows, walker_cols)]
+        rows, cols = linear_sum_assignment(reduced)
+        rows, cols = order_rows[rows], walker_cols[cols]
+
+        keep = feasible[rows, cols]
+        return rows[keep], cols[keep]
+
+    def _record(
+        self,
+        orders: List[Order],
+        walkers: List[Dict[str, Any]],
+        proposals: List[Dict[str, Any]],
+        total_seconds: float,
+        solve_seconds: float,
+        now: datetime
+    ) -> Dict[str, Any]:
+        """Метрики и сводка запуска: только агрегаты, без идентификаторов заказов и выгульщиков"""
+        fill_rate = len(proposals) / len(orders) if orders else 0.0
+        mean_distance = float(np.mean([p["distance"] for p in proposals])) if proposals else 0.0
+        mean_cost = float(np.mean([p["cost"] for p in proposals])) if proposals else 0.0
+
+        MATCHING_DURATION.labels("total").observe(total_seconds)
+        MATCHING_DURATION.labels("solve").observe(solve_seconds)
+        MATCHING_ORDERS.labels("proposed").inc(len(proposals))
+        MATCHING_ORDERS.labels("unmatched").inc(len(orders) - len(proposals))
+        if orders:
+            MATCHING_FILL_RATE.set(fill_rate)
+            MATCHING_MEAN_DISTANCE.set(mean_distance)
+            MATCHING_MEAN_COST.set(mean_cost)
+
+        self.runs += 1
+        self.last_run = {
+            "started_at": now.isoformat(),
+            "orders": len(orders),
+            "walkers": len(walkers),
+            "proposed": len(proposals),
+            "fill_rate": fill_rate,
+            "mean_distance": mean_distance,
+            "mean_cost": mean_cost,
+            "duration_ms": total_seconds * 1000,
+            "solve_ms": solve_seconds * 1000
+        }
+        return self.last_run
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.batch_matching_enabled,
+            "interval": settings.batch_matching_interval,
+            "runs": self.runs,
+            "last_run": self.last_run
+        }
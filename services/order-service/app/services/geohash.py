@@ -0,0 +1,120 @@
+"""
+Geohash-ячейки для геопоиска выгульщиков.
+
+Назначение:
+- Кодирование координат в geohash заданной точности
+- Границы ячейки (для выборки выгульщиков ячейки из БД)
+- Набор ячеек, покрывающих круг поиска
+
+Используется `MatchingService` для кэша выгульщиков по ячейкам.
+"""
+
+import math
+from typing import List, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: index for index, char in enumerate(_BASE32)}
+
+# Метров в одном градусе широты
+_METERS_PER_DEGREE = 111_320.0
+
+
+def encode(latitude: float, longitude: float, precision: int) -> str:
+    """Geohash точки заданной длины"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Границы ячейки: (min_lat, min_lon, max_lat, max_lon)"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lon_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Размер ячейки в градусах: (высота по широте, ширина по долготе)"""
+    total_bits = precision * 5
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_cells(latitude: float, longitude: float, radius_meters: float, precision: int) -> List[str]:
+    """Ячейки, пересекающие ограничивающий прямоугольник круга поиска"""
+    lat_delta = radius_meters / _METERS_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    lon_delta = min(radius_meters / (_METERS_PER_DEGREE * cos_lat), 180.0)
+
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+    min_lon = longitude - lon_delta
+    max_lon = longitude + lon_delta
+
+    cell_height, cell_width = cell_size(precision)
+
+    # Сетка geohash выровнена по -90/-180: перебираем центры ячеек по индексам
+    first_row = math.floor((min_lat + 90.0) / cell_height)
+    last_row = min(math.floor((max_lat + 90.0) / cell_height), round(180.0 / cell_height) - 1)
+    first_col = math.floor((min_lon + 180.0) / cell_width)
+    last_col = math.floor((max_lon + 180.0) / cell_width)
+    columns_total = round(360.0 / cell_width)
+
+    cells = []
+    seen = set()
+    for row in range(first_row, last_row + 1):
+        center_lat = -90.0 + (row + 0.5) * cell_height
+        for col in range(first_col, last_col + 1):
+            # Переход через антимеридиан
+            center_lon = -180.0 + ((col % columns_total) + 0.5) * cell_width
+            cell = encode(center_lat, center_lon, precision)
+            if cell not in seen:
+                seen.add(cell)
+                cells.append(cell)
+
+    return cells
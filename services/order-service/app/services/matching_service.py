@@ -8,46 +8,47 @@
 
 Важные примечания:
 - Избегаем небезопасных SQL строк; используем параметризацию
-- Кэшируем результаты поиска по округлённым координатам
+- Кэшируем выгульщиков по geohash-ячейкам; ячейка сбрасывается, когда выгульщик
+  входит в неё или покидает её (события user-service в канале Redis)
 """
 
+import asyncio
+import json
 import logging
-import math
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, text
+from sqlalchemy import select, func, and_, text
 from geoalchemy2 import WKTElement
 
 from app.config import settings
 from app.database.session import get_session
+from app.services import geohash
+from app.services.availability_index import BLOCKING_STATUSES, BUSY_STATUSES, AvailabilityIndex, availability_index
+from app.utils import geodesy
 from app.models.order import Order, OrderStatus
 from app.schemas.order import NearbyWalker, OrderEstimateResponse
 
 logger = logging.getLogger(__name__)
 
 
+def _event_location(value: Any) -> Optional[Tuple[float, float]]:
+    """Координаты из события перемещения: [latitude, longitude] или None"""
+    if value is None:
+        return None
+    latitude, longitude = value
+    return float(latitude), float(longitude)
+
+
 class MatchingService:
     """Сервис для сопоставления заказов и выгульщиков"""
 
     @staticmethod
     def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Расчет расстояния между двумя точками по формуле гаверсинуса (в километрах)"""
-        R = 6371.0  # Радиус Земли в километрах
-
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-
-        a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-        return R * c
+        return geodesy.haversine(lat1, lon1, lat2, lon2) / 1000
 
     @staticmethod
     async def find_nearby_walkers(
@@ -57,97 +58,193 @@ class MatchingService:
         radius_km: float = None,
         limit: int = None
     ) -> List[NearbyWalker]:
-        """Поиск выгульщиков рядом с указанной точкой"""
+        """Поиск выгульщиков рядом с указанной точкой.
+
+        Выгульщики кэшируются по geohash-ячейкам, не зависящим от радиуса и лимита:
+        запрос объединяет покрывающие круг ячейки (промахи загружаются из БД одним
+        запросом), затем точно фильтрует по расстоянию, сортирует и ограничивает в процессе.
+        """
         try:
             if radius_km is None:
                 radius_km = settings.default_search_radius / 1000  # перевод в километры
             if limit is None:
                 limit = 10
+            radius_meters = radius_km * 1000
 
-            # Проверка кэша
-            redis_session = await get_session()
-            # Ключ кэша по округлённым координатам (2 знака после запятой ~1.1 км)
-            location_key = f"{latitude:.2f}:{longitude:.2f}:{radius_km or 0}:{limit or 0}"
-            cached_walkers = await redis_session.get_cached_nearby_walkers(location_key)
-
-            if cached_walkers:
-                return [NearbyWalker(**walker) for walker in cached_walkers]
-
-            # SQL запрос для поиска выгульщиков в радиусе
-            # Параметризованный запрос через text() для PostGIS функций
-            walkers_query = text(
-                """
-                SELECT
-                    u.id, u.first_name, u.last_name, u.avatar_url, u.rating,
-                    u.total_orders, u.completed_orders, u.latitude, u.longitude,
-                    u.hourly_rate, u.services_offered, u.bio,
-                    ST_Distance(u.location, ST_GeogFromText(:walker_point)) as distance_meters,
-                    EXTRACT(EPOCH FROM (NOW() - u.last_login_at))/60 as minutes_since_last_login
-                FROM users u
-                WHERE
-                    u.role = 'walker'
-                    AND u.is_active = true
-                    AND u.is_walker_verified = true
-                    AND u.location IS NOT NULL
-                    AND u.rating >= :min_rating
-                    AND ST_DWithin(
-                        u.location::geography,
-                        ST_GeogFromText(:walker_point),
-                        :radius_meters
-                    )
-                ORDER BY distance_meters
-                LIMIT :limit
-                """
+            cells = geohash.covering_cells(
+                latitude, longitude, radius_meters, settings.walker_cell_precision
             )
+            cells_data = await MatchingService.get_walkers_in_cells(db, cells)
 
-            walker_point_wkt = f"SRID=4326;POINT({longitude} {latitude})"
-            result = await db.execute(
-                walkers_query,
-                {
-                    "walker_point": walker_point_wkt,
-                    "min_rating": settings.min_rating_for_orders,
-                    "radius_meters": (radius_km * 1000),
-                    "limit": limit,
-                },
-            )
+            cell_walkers = [walker for walkers in cells_data.values() for walker in walkers]
+            if not cell_walkers or limit <= 0:
+                return []
 
-            rows = result.fetchall()
-            walkers = []
-
-            for row in rows:
-                # Расчет примерного времени прибытия (предполагаем скорость 5 км/ч пешком)
-                walking_speed_kmh = 5
-                distance_km = row.distance_meters / 1000
-                estimated_arrival_minutes = int((distance_km / walking_speed_kmh) * 60)
-
-                walker = NearbyWalker(
-                    id=row.id,
-                    first_name=row.first_name,
-                    last_name=row.last_name,
-                    avatar_url=row.avatar_url,
-                    rating=row.rating,
-                    total_orders=row.total_orders,
-                    completed_orders=row.completed_orders,
-                    latitude=row.latitude,
-                    longitude=row.longitude,
-                    distance=row.distance_meters,
-                    hourly_rate=row.hourly_rate,
-                    services_offered=row.services_offered,
-                    bio=row.bio,
-                    estimated_arrival_minutes=estimated_arrival_minutes
-                )
-                walkers.append(walker)
+            distances = geodesy.point_to_many(
+                latitude, longitude,
+                [walker["latitude"] for walker in cell_walkers],
+                [walker["longitude"] for walker in cell_walkers]
+            )
 
-            # Кэширование результатов
-            walkers_data = [walker.dict() for walker in walkers]
-            await redis_session.cache_nearby_walkers(location_key, walkers_data)
+            # Точный фильтр по радиусу, затем limit ближайших без полной сортировки
+            inside = np.flatnonzero(distances <= radius_meters)
+            if inside.size > limit:
+                inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+            nearest = inside[np.argsort(distances[inside], kind="stable")]
 
-            return walkers
+            return [
+                MatchingService._build_nearby_walker(cell_walkers[index], float(distances[index]))
+                for index in nearest
+            ]
 
         except Exception as e:
             logger.error(f"Error finding nearby walkers: {e}")
             return []
 
+    @staticmethod
+    async def get_walkers_in_cells(db: AsyncSession, cells: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Выгульщики указанных ячеек: из кэша, промахи — одним запросом к БД"""
+        redis_session = await get_session()
+        cells_data, generations = await redis_session.get_walker_cells(cells)
+
+        missing_cells = [cell for cell, walkers in cells_data.items() if walkers is None]
+        if missing_cells:
+            loaded = await MatchingService._load_walker_cells(db, missing_cells)
+            await redis_session.cache_walker_cells(
+                loaded, generations, settings.walker_cell_cache_ttl
+            )
+            cells_data.update(loaded)
+
+        return cells_data
+
+    @staticmethod
+    async def _load_walker_cells(db: AsyncSession, cells: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Загрузка выгульщиков указанных ячеек одним запросом по их общему прямоугольнику"""
+        cell_bounds = [geohash.bounds(cell) for cell in cells]
+
+        walkers_query = text(
+            """
+            SELECT
+                u.id, u.first_name, u.last_name, u.avatar_url, u.rating,
+                u.total_orders, u.completed_orders, u.latitude, u.longitude,
+                u.hourly_rate, u.services_offered, u.bio
+            FROM users u
+            WHERE
+                u.role = 'walker'
+                AND u.is_active = true
+                AND u.is_walker_verified = true
+                AND u.location IS NOT NULL
+                AND u.rating >= :min_rating
+                AND u.location::geometry && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)
+            """
+        )
+
+        result = await db.execute(
+            walkers_query,
+            {
+                "min_rating": settings.min_rating_for_orders,
+                "min_lat": min(b[0] for b in cell_bounds),
+                "min_lon": min(b[1] for b in cell_bounds),
+                "max_lat": max(b[2] for b in cell_bounds),
+                "max_lon": max(b[3] for b in cell_bounds),
+            },
+        )
+
+        # Пустые ячейки тоже кэшируются, иначе каждый поиск в них шёл бы в БД
+        loaded: Dict[str, List[Dict[str, Any]]] = {cell: [] for cell in cells}
+        for row in result.fetchall():
+            if row.latitude is None or row.longitude is None:
+                continue
+            cell = geohash.encode(row.latitude, row.longitude, settings.walker_cell_precision)
+            if cell not in loaded:
+                # Прямоугольник шире запрошенных ячеек: соседние ячейки уже в кэше
+                continue
+            loaded[cell].append({
+                "id": str(row.id),
+                "first_name": row.first_name,
+                "last_name": row.last_name,
+                "avatar_url": row.avatar_url,
+                "rating": float(row.rating or 0),
+                "total_orders": row.total_orders or 0,
+                "completed_orders": row.completed_orders or 0,
+                "latitude": float(row.latitude),
+                "longitude": float(row.longitude),
+                "hourly_rate": float(row.hourly_rate) if row.hourly_rate is not None else None,
+                "services_offered": row.services_offered,
+                "bio": row.bio,
+            })
+
+        return loaded
+
+    @staticmethod
+    def _build_nearby_walker(walker: Dict[str, Any], distance_meters: float) -> NearbyWalker:
+        """Выгульщик из ячейки кэша с расстоянием до точки поиска"""
+        # Расчет примерного времени прибытия (предполагаем скорость 5 км/ч пешком)
+        walking_speed_kmh = 5
+        distance_km = distance_meters / 1000
+        estimated_arrival_minutes = int((distance_km / walking_speed_kmh) * 60)
+
+        return NearbyWalker(
+            **walker,
+            distance=distance_meters,
+            estimated_arrival_minutes=estimated_arrival_minutes
+        )
+
+    @staticmethod
+    async def invalidate_walker_location(
+        walker_id: str,
+        old_location: Optional[Tuple[float, float]],
+        new_location: Optional[Tuple[float, float]]
+    ):
+        """Инвалидация ячеек, из которой и в которую переместился выгульщик.
+
+        Координаты передаются как (latitude, longitude); при изменении профиля без
+        перемещения обе точки совпадают и сбрасывается одна ячейка.
+        """
+        cells = {
+            geohash.encode(location[0], location[1], settings.walker_cell_precision)
+            for location in (old_location, new_location)
+            if location is not None
+        }
+        if not cells:
+            return
+
+        redis_session = await get_session()
+        await redis_session.invalidate_walker_cells(sorted(cells))
+        logger.debug(f"Invalidated walker cells {sorted(cells)} for walker {walker_id}")
+
+    @staticmethod
+    async def listen_walker_locations():
+        """Подписка на перемещения выгульщиков (публикует user-service) и инвалидация ячеек"""
+        redis_session = await get_session()
+
+        while True:
+            pubsub = redis_session.redis.pubsub()
+            try:
+                await pubsub.subscribe(settings.walker_location_channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        event = json.loads(message["data"])
+                        await MatchingService.invalidate_walker_location(
+                            event["walker_id"],
+                            _event_location(event.get("old_location")),
+                            _event_location(event.get("new_location"))
+                        )
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning(f"Invalid walker location event: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Walker location listener error: {e}")
+                await asyncio.sleep(5)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
     @staticmethod
     async def find_pending_orders_for_walker(db: AsyncSession, walker_id: str) -> List[Order]:
         """Поиск ожидающих заказов для выгульщика"""
@@ -251,6 +348,13 @@ class MatchingService:
                 limit=5
             )
 
+            # Только свободные на время заказа (индекс занятости, без запросов к БД)
+            if availability_index.loaded:
+                free = availability_index.free_walkers(
+                    [walker.id for walker in nearby_walkers], order.scheduled_at, order.duration_minutes
+                )
+                nearby_walkers = [walker for walker in nearby_walkers if free[walker.id]]
+
             if not nearby_walkers:
                 return None
 
@@ -274,51 +378,42 @@ class MatchingService:
     ) -> bool:
         """Проверка доступности выгульщика на указанное время"""
         try:
-            # Проверка количества заказов в день
+            if availability_index.loaded:
+                return availability_index.is_free(walker_id, scheduled_at, duration_minutes)
+
+            # Индекс ещё не загружен: дневной лимит и пересечения одним запросом
             start_of_day = scheduled_at.replace(hour=0, minute=0, second=0, microsecond=0)
             end_of_day = start_of_day + timedelta(days=1)
+            order_end_time = scheduled_at + timedelta(minutes=duration_minutes)
+            existing_end_time = Order.scheduled_at + func.make_interval(0, 0, 0, 0, 0, Order.duration_minutes)
 
-            daily_orders_count = await db.execute(
-                select(func.count()).where(
+            result = await db.execute(
+                select(
+                    func.count().filter(
+                        and_(Order.scheduled_at >= start_of_day, Order.scheduled_at < end_of_day)
+                    ),
+                    func.count().filter(
+                        and_(
+                            Order.status.in_(BLOCKING_STATUSES),
+                            Order.scheduled_at < order_end_time,
+                            existing_end_time > scheduled_at
+                        )
+                    )
+                ).where(
                     and_(
                         Order.walker_id == walker_id,
-                        Order.scheduled_at >= start_of_day,
-                        Order.scheduled_at < end_of_day,
-                        Order.status.in_([OrderStatus.CONFIRMED, OrderStatus.IN_PROGRESS, OrderStatus.COMPLETED])
+                        Order.status.in_(BUSY_STATUSES),
+                        Order.scheduled_at < max(end_of_day, order_end_time),
+                        Order.scheduled_at >= start_of_day - timedelta(minutes=settings.max_order_duration)
                     )
                 )
             )
+            daily_orders_count, overlapping_orders_count = result.one()
 
-            if daily_orders_count.scalar() >= settings.max_orders_per_day:
+            if daily_orders_count >= settings.max_orders_per_day:
                 return False
 
-            # Проверка пересечения времени с существующими заказами
-            order_end_time = scheduled_at + timedelta(minutes=duration_minutes)
-
-            overlapping_orders = await db.execute(
-                select(func.count()).where(
-                    and_(
-                        Order.walker_id == walker_id,
-                        Order.status.in_([OrderStatus.CONFIRMED, OrderStatus.IN_PROGRESS]),
-                        or_(
-                            and_(
-                                Order.scheduled_at <= scheduled_at,
-                                func.dateadd(Order.scheduled_at, text(f"interval '{Order.duration_minutes} minutes'")) > scheduled_at
-                            ),
-                            and_(
-                                Order.scheduled_at < order_end_time,
-                                func.dateadd(Order.scheduled_at, text(f"interval '{Order.duration_minutes} minutes'")) >= order_end_time
-                            ),
-                            and_(
-                                Order.scheduled_at >= scheduled_at,
-                                func.dateadd(Order.scheduled_at, text(f"interval '{Order.duration_minutes} minutes'")) <= order_end_time
-                            )
-                        )
-                    )
-                )
-            )
-
-            return overlapping_orders.scalar() == 0
+            return overlapping_orders_count == 0
 
         except Exception as e:
             logger.error(f"Error checking walker availability {walker_id}: {e}")
@@ -363,6 +458,8 @@ class MatchingService:
                 }
                 schedule["orders"].append(order_info)
 
+            schedule["available_slots"] = MatchingService._free_slots(walker_id, start_of_day, orders)
+
             return schedule
 
         except Exception as e:
@@ -373,3 +470,27 @@ class MatchingService:
                 "orders": [],
                 "available_slots": []
             }
+
+    @staticmethod
+    def _free_slots(walker_id: str, start_of_day: datetime, orders: List[Order]) -> List[Dict[str, str]]:
+        """Свободные окна рабочего дня не короче минимальной продолжительности заказа"""
+        work_start = start_of_day + timedelta(hours=settings.walker_work_day_start)
+        work_end = start_of_day + timedelta(hours=settings.walker_work_day_end)
+        # Прошедшее время сегодняшнего дня не предлагается
+        work_start = max(work_start, datetime.utcnow().replace(second=0, microsecond=0))
+        if work_start >= work_end:
+            return []
+
+        if availability_index.loaded:
+            slots = availability_index.free_slots(walker_id, work_start, work_end, settings.min_order_duration)
+        else:
+            # Индекс ещё не загружен: окна по заказам дня из того же запроса
+            day_index = AvailabilityIndex()
+            for order in orders:
+                day_index.apply(order.id, walker_id, order.scheduled_at, order.duration_minutes, order.status)
+            slots = day_index.free_slots(walker_id, work_start, work_end, settings.min_order_duration)
+
+        return [
+            {"start_time": slot_start.isoformat(), "end_time": slot_end.isoformat()}
+            for slot_start, slot_end in slots
+        ]
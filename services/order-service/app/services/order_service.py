@@ -21,6 +21,7 @@ from geoalchemy2 import WKTElement
 
 from app.config import settings
 from app.database.session import get_session
+from app.services.availability_index import availability_index
 from app.models.order import Order, OrderStatus, OrderType
 from app.models.order_review import OrderReview
 from app.schemas.order import (
@@ -75,6 +76,7 @@ class OrderService:
             db.add(order)
             await db.commit()
             await db.refresh(order)
+            await availability_index.order_changed(order)
 
             # Инвалидация кэша
             redis_session = await get_session()
@@ -140,7 +142,13 @@ class OrderService:
             await redis_session.invalidate_order_cache(order_id)
             await redis_session.invalidate_user_orders_cache(client_id)
 
-            return await OrderService.get_order_by_id(db, order_id, client_id)
+            # Перенос времени или продолжительности сдвигает занятость выгульщика
+            order = await OrderService.get_order_by_id(db, order_id, client_id)
+            if order:
+                await db.refresh(order)
+                await availability_index.order_changed(order)
+
+            return order
 
         except Exception as e:
             logger.error(f"Order update failed for {order_id}: {e}")
@@ -160,15 +168,34 @@ class OrderService:
             if order.scheduled_at < datetime.utcnow():
                 return False
 
+            # Заказ из пакетного подбора до истечения предложения закреплён за предложенным выгульщиком
+            redis_session = await get_session()
+            proposals = await redis_session.get_match_proposals([order_id])
+            proposed_walker_id = proposals.get(order_id)
+            if proposed_walker_id is not None and proposed_walker_id != walker_id:
+                return False
+
+            # Выгульщик не должен быть занят на это время (индекс занятости)
+            if availability_index.loaded and not availability_index.is_free(
+                walker_id, order.scheduled_at, order.duration_minutes
+            ):
+                return False
+
             # Подтверждение заказа
             order.confirm(walker_id)
             await db.commit()
+            await availability_index.order_changed(order)
 
             # Инвалидация кэша
-            redis_session = await get_session()
             await redis_session.invalidate_order_cache(order_id)
             await redis_session.invalidate_user_orders_cache(order.client_id)
             await redis_session.invalidate_user_orders_cache(walker_id)
+            await redis_session.remove_match_proposal(order_id)
+
+            # Выгульщик взял другой заказ: его предложение освобождается для следующего подбора
+            walker_proposal = await redis_session.get_walker_proposal(walker_id)
+            if walker_proposal is not None and walker_proposal != order_id:
+                await redis_session.remove_match_proposal(walker_proposal)
 
             logger.info(f"Order {order_id} confirmed by walker {walker_id}")
             return True
@@ -193,6 +220,7 @@ class OrderService:
 
             order.start_walk()
             await db.commit()
+            await availability_index.order_changed(order)
 
             # Инвалидация кэша
             redis_session = await get_session()
@@ -216,6 +244,8 @@ class OrderService:
 
             order.complete_walk()
             await db.commit()
+            # Завершённая прогулка освобождает остаток интервала (остаётся в дневном лимите)
+            await availability_index.order_changed(order)
 
             # Инвалидация кэша
             redis_session = await get_session()
@@ -255,6 +285,7 @@ class OrderService:
 
             order.cancel(cancelled_by, cancellation_data.reason)
             await db.commit()
+            await availability_index.order_changed(order)
 
             # Инвалидация кэша
             redis_session = await get_session()
@@ -262,6 +293,7 @@ class OrderService:
             await redis_session.invalidate_user_orders_cache(order.client_id)
             if order.walker_id:
                 await redis_session.invalidate_user_orders_cache(order.walker_id)
+            await redis_session.remove_match_proposal(order_id)
 
             logger.info(f"Order {order_id} cancelled by {cancelled_by}")
             return True
@@ -415,11 +447,34 @@ class OrderService:
 
     @staticmethod
     async def get_pending_orders_for_walker(db: AsyncSession, walker_id: str) -> List[Order]:
-        """Получение ожидающих заказов для выгульщика"""
+        """Получение ожидающих заказов для выгульщика.
+
+        Первым идёт заказ, предложенный выгульщику пакетным подбором; затем заказы в радиусе,
+        кроме предложенных другим выгульщикам (их подтверждение будет отклонено).
+        """
         try:
-            # Заказы в радиусе выгульщика, ожидающие подтверждения
             from app.services.matching_service import MatchingService
-            return await MatchingService.find_pending_orders_for_walker(db, walker_id)
+            redis_session = await get_session()
+
+            orders = []
+            proposed_order_id = await redis_session.get_walker_proposal(walker_id)
+            if proposed_order_id is not None:
+                proposed_order = await OrderService.get_order_by_id(db, proposed_order_id)
+                if (
+                    proposed_order is not None
+                    and proposed_order.status == OrderStatus.PENDING
+                    and proposed_order.scheduled_at > datetime.utcnow()
+                ):
+                    orders.append(proposed_order)
+
+            # Заказы в радиусе выгульщика, ожидающие подтверждения
+            nearby_orders = await MatchingService.find_pending_orders_for_walker(db, walker_id)
+            proposals = await redis_session.get_match_proposals([order.id for order in nearby_orders])
+            orders.extend(
+                order for order in nearby_orders
+                if order.id != proposed_order_id and proposals.get(order.id, walker_id) == walker_id
+            )
+            return orders
 
         except Exception as e:
             logger.error(f"Error getting pending orders for walker {walker_id}: {e}")
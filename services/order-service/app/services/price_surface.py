@@ -0,0 +1,298 @@
+"""
+Сетка базовых ставок по районам.
+
+Назначение:
+- Фоновая задача раз в `price_surface_interval` секунд строит по geohash-сетке
+  (`price_surface_precision`) базовую ставку, число выгульщиков и спрос
+- Источники: профили выгульщиков (ставка с весом по рейтингу) и заказы за последние
+  `price_surface_order_window_hours` часов (ставки завершённых и число заказов)
+- Значение ячейки — сумма по ячейкам, центры которых лежат в круге `price_surface_radius`
+  вокруг её центра (как прежний поиск в радиусе 5 км; ячейка точки не больше ~1.2 км)
+- Сетка хранится в памяти и снимком в Redis: сборку выполняет одна реплика
+  (блокировка), остальные читают снимок
+
+Оценка стоимости — поиск ячейки по координатам за O(1) вместо запроса к PostGIS.
+"""
+
+import asyncio
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.connection import async_session
+from app.database.session import get_session
+from app.models.order import Order, OrderStatus
+from app.services import geohash
+from app.utils import geodesy
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "price_surface"
+
+# Статусы, учитываемые в спросе района
+DEMAND_STATUSES = (OrderStatus.CONFIRMED, OrderStatus.IN_PROGRESS, OrderStatus.COMPLETED)
+
+# Вес выгульщика с нулевым рейтингом (как в прежнем расчёте по ближайшим)
+DEFAULT_RATING_WEIGHT = 3.0
+
+METERS_PER_DEGREE = geodesy.EARTH_RADIUS_METERS * math.pi / 180
+
+
+class PriceCell:
+    """Сглаженные показатели ячейки"""
+
+    __slots__ = ("base_rate", "walkers", "recent_orders")
+
+    def __init__(self, base_rate: float, walkers: int, recent_orders: int):
+        self.base_rate = base_rate
+        self.walkers = walkers
+        self.recent_orders = recent_orders
+
+
+class PriceSurface:
+    """Базовые ставки и плотность предложения по ячейкам сетки"""
+
+    def __init__(self):
+        self.cells: Dict[Tuple[int, int], PriceCell] = {}
+        self.precision = settings.price_surface_precision
+        self.built_at: Optional[datetime] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def lookup(self, latitude: float, longitude: float) -> Optional[PriceCell]:
+        """Ячейка точки; None, если рядом нет ни выгульщиков, ни заказов"""
+        return self.cells.get(self._cell_index(latitude, longitude, self.precision))
+
+    # Сборка
+
+    async def rebuild(self, db: AsyncSession):
+        """Сборка сетки двумя агрегирующими запросами и сохранение снимка"""
+        precision = settings.price_surface_precision
+        cell_height, cell_width = geohash.cell_size(precision)
+
+        walker_rows = await self._aggregate_walkers(db, cell_height, cell_width)
+        order_rows = await self._aggregate_orders(db, cell_height, cell_width)
+
+        # Окрестность — сотни ячеек на ячейку с данными: суммирование вне event loop
+        cells = await asyncio.to_thread(
+            self._build_cells, walker_rows, order_rows, cell_height, cell_width, settings.price_surface_radius
+        )
+
+        self.cells = cells
+        self.precision = precision
+        self.built_at = datetime.utcnow()
+        logger.info(f"Price surface built: {len(cells)} cells at precision {precision}")
+
+        redis_session = await get_session()
+        await redis_session.save_price_surface(self.to_snapshot(), expire=settings.price_surface_interval * 3)
+
+    async def _aggregate_walkers(self, db: AsyncSession, cell_height: float, cell_width: float):
+        """Выгульщики по ячейкам: число, сумма ставок с весом по рейтингу и сумма весов"""
+        result = await db.execute(
+            text(
+                """
+                SELECT
+                    floor((u.latitude + 90) / :cell_height)::int AS row,
+                    floor((u.longitude + 180) / :cell_width)::int AS col,
+                    count(*) AS walkers,
+                    sum(u.hourly_rate * CASE WHEN u.rating > 0 THEN u.rating ELSE :default_weight END)
+                        FILTER (WHERE u.hourly_rate > 0) AS weighted_rate,
+                    sum(CASE WHEN u.rating > 0 THEN u.rating ELSE :default_weight END)
+                        FILTER (WHERE u.hourly_rate > 0) AS rate_weight
+                FROM users u
+                WHERE
+                    u.role = 'walker'
+                    AND u.is_active = true
+                    AND u.is_walker_verified = true
+                    AND u.latitude IS NOT NULL
+                    AND u.longitude IS NOT NULL
+                    AND u.rating >= :min_rating
+                GROUP BY 1, 2
+                """
+            ),
+            {
+                "cell_height": cell_height,
+                "cell_width": cell_width,
+                "default_weight": DEFAULT_RATING_WEIGHT,
+                "min_rating": settings.min_rating_for_orders,
+            },
+        )
+        return result.fetchall()
+
+    async def _aggregate_orders(self, db: AsyncSession, cell_height: float, cell_width: float):
+        """Заказы окна по ячейкам: спрос, число завершённых и их средняя ставка"""
+        row = func.floor((Order.latitude + 90) / cell_height)
+        col = func.floor((Order.longitude + 180) / cell_width)
+        is_completed = Order.status == OrderStatus.COMPLETED
+        since = datetime.utcnow() - timedelta(hours=settings.price_surface_order_window_hours)
+
+        result = await db.execute(
+            select(
+                row,
+                col,
+                func.count(),
+                func.count().filter(is_completed),
+                func.avg(Order.walker_hourly_rate).filter(is_completed)
+            ).where(
+                and_(
+                    Order.created_at >= since,
+                    Order.status.in_(DEMAND_STATUSES)
+                )
+            ).group_by(row, col)
+        )
+        return [(int(r), int(c), *rest) for r, c, *rest in result.fetchall()]
+
+    @classmethod
+    def _build_cells(
+        cls,
+        walker_rows,
+        order_rows,
+        cell_height: float,
+        cell_width: float,
+        radius: float
+    ) -> Dict[Tuple[int, int], PriceCell]:
+        """Суммы показателей по кругу радиуса `radius` вокруг каждой ячейки"""
+        sums: Dict[Tuple[int, int], list] = {}
+        offsets_by_row: Dict[int, List[Tuple[int, int]]] = {}
+
+        def spread(row: int, col: int, values: Tuple):
+            offsets = offsets_by_row.get(row)
+            if offsets is None:
+                offsets = offsets_by_row[row] = cls._disk_offsets(row, cell_height, cell_width, radius)
+            for d_row, d_col in offsets:
+                acc = sums.setdefault((row + d_row, col + d_col), [0, 0.0, 0.0, 0, 0, 0.0])
+                for i, value in enumerate(values):
+                    acc[i] += float(value)
+
+        for row, col, walkers, weighted_rate, rate_weight in walker_rows:
+            spread(row, col, (walkers, weighted_rate or 0.0, rate_weight or 0.0, 0, 0, 0.0))
+        for row, col, recent_orders, completed_orders, completed_rate in order_rows:
+            completed_sum = (completed_rate or 0.0) * completed_orders
+            spread(row, col, (0, 0.0, 0.0, recent_orders, completed_orders, completed_sum))
+
+        return {
+            cell: PriceCell(
+                cls._base_rate(weighted_rate, rate_weight, completed_sum, completed_orders),
+                int(walkers),
+                int(recent_orders)
+            )
+            for cell, (walkers, weighted_rate, rate_weight, recent_orders, completed_orders, completed_sum)
+            in sums.items()
+        }
+
+    @staticmethod
+    def _disk_offsets(row: int, cell_height: float, cell_width: float, radius: float) -> List[Tuple[int, int]]:
+        """Смещения ячеек, центры которых не дальше `radius` от центра ячейки строки `row`"""
+        latitude = (row + 0.5) * cell_height - 90
+        height_meters = cell_height * METERS_PER_DEGREE
+        width_meters = cell_width * METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+
+        max_rows = int(radius // height_meters)
+        max_cols = int(radius // width_meters)
+        radius_squared = radius * radius
+        return [
+            (d_row, d_col)
+            for d_row in range(-max_rows, max_rows + 1)
+            for d_col in range(-max_cols, max_cols + 1)
+            if (d_row * height_meters) ** 2 + (d_col * width_meters) ** 2 <= radius_squared
+        ]
+
+    @staticmethod
+    def _base_rate(weighted_rate: float, rate_weight: float, completed_sum: float, completed_orders: float) -> float:
+        """Ставка профилей, смешанная со ставкой завершённых заказов, в допустимых пределах"""
+        profile_rate = weighted_rate / rate_weight if rate_weight > 0 else None
+        order_rate = completed_sum / completed_orders if completed_orders > 0 else None
+
+        if profile_rate is not None and order_rate is not None:
+            weight = settings.price_surface_order_weight
+            rate = profile_rate * (1 - weight) + order_rate * weight
+        elif profile_rate is not None:
+            rate = profile_rate
+        elif order_rate is not None:
+            rate = order_rate
+        else:
+            rate = settings.walker_hourly_rate_min
+
+        return max(settings.walker_hourly_rate_min, min(settings.walker_hourly_rate_max, rate))
+
+    @staticmethod
+    def _cell_index(latitude: float, longitude: float, precision: int) -> Tuple[int, int]:
+        cell_height, cell_width = geohash.cell_size(precision)
+        return math.floor((latitude + 90) / cell_height), math.floor((longitude + 180) / cell_width)
+
+    # Снимок
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        return {
+            "precision": self.precision,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "cells": {
+                f"{row}:{col}": [cell.base_rate, cell.walkers, cell.recent_orders]
+                for (row, col), cell in self.cells.items()
+            }
+        }
+
+    async def load_snapshot(self) -> bool:
+        """Загрузка снимка из Redis, если он новее текущей сетки"""
+        redis_session = await get_session()
+        snapshot = await redis_session.get_price_surface()
+        if not snapshot or not snapshot.get("built_at"):
+            return False
+
+        built_at = datetime.fromisoformat(snapshot["built_at"])
+        if self.built_at is not None and built_at <= self.built_at:
+            return False
+
+        cells = {}
+        for key, (base_rate, walkers, recent_orders) in snapshot["cells"].items():
+            row, col = key.split(":")
+            cells[(int(row), int(col))] = PriceCell(float(base_rate), int(walkers), int(recent_orders))
+
+        self.cells = cells
+        self.precision = int(snapshot["precision"])
+        self.built_at = built_at
+        return True
+
+    # Фоновая задача
+
+    async def start(self):
+        """Снимок при старте, затем сборка (одной репликой) или чтение снимка каждый интервал"""
+        try:
+            await self.load_snapshot()
+        except Exception as e:
+            logger.error(f"Price surface snapshot load failed: {e}")
+
+        while True:
+            try:
+                redis_session = await get_session()
+                # Блокировка не снимается: одна сборка на интервал для всех реплик
+                if await redis_session.acquire_lock(LOCK_NAME, int(settings.price_surface_interval)) is not None:
+                    async with async_session() as db:
+                        await self.rebuild(db)
+                else:
+                    await self.load_snapshot()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Price surface update failed: {e}")
+
+            await asyncio.sleep(settings.price_surface_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "precision": self.precision,
+            "cells": len(self.cells)
+        }
+
+
+# Глобальная сетка процесса
+price_surface = PriceSurface()
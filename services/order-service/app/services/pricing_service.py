@@ -2,7 +2,8 @@
 Сервис для расчёта стоимости заказов.
 
 Назначение:
-- Расчёт базовой ставки по району на основе ставок выгульщиков
+- Расчёт базовой ставки и спроса по району: поиск ячейки в сетке ставок (`price_surface`),
+  до её сборки — запросами к БД в том же радиусе (`price_surface_radius`)
 - Применение временных/дневных множителей
 - Возврат детализированной разбивки для UI/аналитики
 """
@@ -12,10 +13,11 @@ from typing import Dict, Any
 from datetime import datetime, time
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import text
 
 from app.config import settings
 from app.services.matching_service import MatchingService
+from app.services.price_surface import price_surface
 
 logger = logging.getLogger(__name__)
 
@@ -113,9 +115,14 @@ class PricingService:
     async def _get_base_hourly_rate(db: AsyncSession, latitude: float, longitude: float) -> float:
         """Получение базовой ставки в зависимости от района"""
         try:
-            # Поиск средней ставки выгульщиков в районе
+            # Ставка района из сетки: без запроса к БД
+            if price_surface.ready:
+                cell = price_surface.lookup(latitude, longitude)
+                return cell.base_rate if cell is not None else settings.walker_hourly_rate_min
+
+            # Сетка ещё не собрана: поиск средней ставки выгульщиков в районе
             nearby_walkers = await MatchingService.find_nearby_walkers(
-                db, latitude, longitude, radius_km=5, limit=10
+                db, latitude, longitude, radius_km=settings.price_surface_radius / 1000, limit=10
             )
 
             if nearby_walkers:
@@ -236,37 +243,56 @@ class PricingService:
     ) -> float:
         """Расчет множителя спроса"""
         try:
-            # Поиск заказов в районе за последние 24 часа
+            if price_surface.ready:
+                cell = price_surface.lookup(latitude, longitude)
+                return PricingService._demand_multiplier(cell.recent_orders if cell is not None else 0)
+
+            # Сетка ещё не собрана: тот же спрос (радиус и окно сетки) запросом к БД
             from datetime import timedelta
-            time_window = scheduled_at - timedelta(hours=24)
+            since = datetime.utcnow() - timedelta(hours=settings.price_surface_order_window_hours)
 
-            # Подсчет заказов в районе
             orders_count = await db.execute(
-                select(func.count()).select_from('orders').where(
-                    and_(
-                        func.ST_DWithin('location', f'ST_GeomFromText(\'POINT({longitude} {latitude})\', 4326)', 5000),
-                        'created_at >= time_window',
-                        'status IN (\'confirmed\', \'in_progress\', \'completed\')'
-                    )
-                )
+                text(
+                    """
+                    SELECT count(*) FROM orders o
+                    WHERE
+                        o.created_at >= :since
+                        AND o.status IN ('confirmed', 'in_progress', 'completed')
+                        AND ST_DWithin(
+                            o.location::geography,
+                            ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)::geography,
+                            :radius_meters
+                        )
+                    """
+                ),
+                {
+                    "since": since,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "radius_meters": settings.price_surface_radius,
+                },
             )
 
-            recent_orders = orders_count.scalar()
+            recent_orders = orders_count.scalar() or 0
 
-            # Расчет множителя на основе спроса
-            if recent_orders < 5:
-                return 0.9  # Низкий спрос - скидка
-            elif recent_orders < 15:
-                return 1.0  # Нормальный спрос
-            elif recent_orders < 25:
-                return 1.1  # Высокий спрос
-            else:
-                return 1.2  # Очень высокий спрос
+            return PricingService._demand_multiplier(recent_orders)
 
         except Exception as e:
             logger.error(f"Error calculating demand multiplier: {e}")
             return 1.0
 
+    @staticmethod
+    def _demand_multiplier(recent_orders: int) -> float:
+        """Множитель по числу заказов в районе за последние сутки"""
+        if recent_orders < 5:
+            return 0.9  # Низкий спрос - скидка
+        elif recent_orders < 15:
+            return 1.0  # Нормальный спрос
+        elif recent_orders < 25:
+            return 1.1  # Высокий спрос
+        else:
+            return 1.2  # Очень высокий спрос
+
     @staticmethod
     async def get_price_breakdown(
         db: AsyncSession,
@@ -0,0 +1,7 @@
+"""
+Утилиты для Order Service
+"""
+
+from . import geodesy
+
+__all__ = ["geodesy"]
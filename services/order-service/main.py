@@ -26,6 +26,10 @@ from prometheus_client import make_asgi_app
 from app.config import settings
 from app.database import create_tables
 from app.api.v1.api import api_router
+from app.services.matching_service import MatchingService
+from app.services.batch_matcher import BatchMatcher
+from app.services.availability_index import availability_index
+from app.services.price_surface import price_surface
 
 
 # Настройка структурированного логирования
@@ -69,12 +73,32 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Создание таблиц базы данных
     await create_tables()
 
+    # Инвалидация кэша выгульщиков по событиям перемещения из user-service
+    walker_location_listener = asyncio.create_task(MatchingService.listen_walker_locations())
+
+    # Пакетный подбор выгульщиков (также по запросу: POST /api/v1/orders/matching/run)
+    app.state.batch_matcher = BatchMatcher()
+    background_tasks = [walker_location_listener]
+
+    # Индекс занятости выгульщиков: загрузка из БД и изменения от других реплик
+    background_tasks.append(asyncio.create_task(availability_index.start()))
+    background_tasks.append(asyncio.create_task(availability_index.listen()))
+
+    # Сетка базовых ставок по районам для оценки стоимости
+    if settings.price_surface_enabled:
+        background_tasks.append(asyncio.create_task(price_surface.start()))
+    if settings.batch_matching_enabled:
+        background_tasks.append(asyncio.create_task(app.state.batch_matcher.start()))
+
     logger.info("Order Service started successfully")
 
     yield
 
     logger.info("Order Service shutting down...")
 
+    for task in background_tasks:
+        task.cancel()
+
 
 def create_application() -> FastAPI:
     """Создание FastAPI приложения и настройка middleware/роутов."""
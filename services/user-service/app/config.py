@@ -59,6 +59,7 @@ class Settings(BaseSettings):
     # Настройки для выгульщиков
     max_nearby_walkers: int = int(os.getenv("MAX_NEARBY_WALKERS", "20"))
     walker_search_radius: float = float(os.getenv("WALKER_SEARCH_RADIUS", "5000"))  # в метрах
+    walker_location_channel: str = os.getenv("WALKER_LOCATION_CHANNEL", "walker_location_updates")  # Канал Redis с изменениями выгульщиков (кэш order-service)
 
     # Email настройки
     smtp_server: Optional[str] = os.getenv("SMTP_SERVER")
@@ -4,7 +4,7 @@ Redis сессии для User Service
 
 import json
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import redis.asyncio as redis
 
 from app.config import settings
@@ -78,6 +78,25 @@ class RedisSession:
             logger.error(f"Error deleting refresh token for user {user_id}: {e}")
             return False
 
+    async def publish_walker_location(
+        self,
+        walker_id: str,
+        old_location: Optional[Tuple[float, float]],
+        new_location: Optional[Tuple[float, float]]
+    ):
+        """Публикация перемещения/изменения профиля выгульщика для инвалидации кэшей по ячейкам"""
+        try:
+            event = {
+                "walker_id": walker_id,
+                "old_location": list(old_location) if old_location else None,
+                "new_location": list(new_location) if new_location else None,
+            }
+            await self.redis.publish(settings.walker_location_channel, json.dumps(event))
+            return True
+        except Exception as e:
+            logger.error(f"Error publishing walker location for {walker_id}: {e}")
+            return False
+
 
 # Глобальный экземпляр Redis сессии
 redis_session = RedisSession()
@@ -20,6 +20,7 @@ from sqlalchemy.orm import selectinload
 from geoalchemy2 import WKTElement
 
 from app.config import settings
+from app.database.session import get_session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserProfile, NearbyWalkersResponse, NearbyWalker
 from app.services.auth_service import AuthService
@@ -92,6 +93,13 @@ class UserService:
             if not update_data:
                 return await UserService.get_user_by_id(db, user_id)
 
+            # Прежнее положение выгульщика: кэш поиска в order-service сбрасывается по ячейкам
+            current_user = await UserService.get_user_by_id(db, user_id)
+            is_walker = current_user is not None and current_user.role == "walker"
+            old_location = None
+            if is_walker and current_user.latitude is not None and current_user.longitude is not None:
+                old_location = (current_user.latitude, current_user.longitude)
+
             # Обновление геолокации
             if 'latitude' in update_data and 'longitude' in update_data:
                 latitude = update_data.pop('latitude')
@@ -109,6 +117,13 @@ class UserService:
             await db.execute(stmt)
             await db.commit()
 
+            if is_walker:
+                new_location = old_location
+                if 'latitude' in update_data and 'longitude' in update_data:
+                    new_location = (update_data['latitude'], update_data['longitude'])
+                redis_session = await get_session()
+                await redis_session.publish_walker_location(user_id, old_location, new_location)
+
             return await UserService.get_user_by_id(db, user_id)
 
         except Exception as e:
@@ -116,6 +131,17 @@ class UserService:
             await db.rollback()
             raise
 
+    @staticmethod
+    async def publish_walker_profile_changed(user: Optional[User]):
+        """Изменение полей выгульщика без перемещения (верификация, рейтинг):
+        order-service сбрасывает кэш ячейки его текущего положения"""
+        if user is None or user.role != "walker" or user.latitude is None or user.longitude is None:
+            return
+
+        location = (user.latitude, user.longitude)
+        redis_session = await get_session()
+        await redis_session.publish_walker_location(user.id, location, location)
+
     @staticmethod
     async def get_nearby_walkers(
         db: AsyncSession,
@@ -248,6 +274,9 @@ class UserService:
             user.update_rating(new_rating)
             await db.commit()
 
+            # Рейтинг хранится в кэше ячеек order-service и влияет на отбор выгульщиков
+            await UserService.publish_walker_profile_changed(user)
+
             logger.info(f"Rating updated for user {user_id}: {user.rating}")
             return True
 
@@ -137,6 +137,10 @@ class WalkerService:
 
             await db.commit()
 
+            # Верифицированный выгульщик должен сразу появиться в поиске order-service
+            user = await UserService.get_user_by_id(db, verification.user_id)
+            await UserService.publish_walker_profile_changed(user)
+
             logger.info(f"Verification {verification_id} approved by admin {admin_id}")
             return True
 
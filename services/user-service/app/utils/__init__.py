@@ -2,6 +2,7 @@
 Утилиты для User Service
 """
 
+from . import geodesy
 from .distance import calculate_distance, haversine_distance
 
-__all__ = ["calculate_distance", "haversine_distance"]
+__all__ = ["calculate_distance", "haversine_distance", "geodesy"]